@@ -37,6 +37,7 @@ def read_packet(rx_cnt, tx_cnt, adc_samples):
     missed_cnt = 1
 
     last_packet_num = -1
+    next_byte_count = 0
     num_frames = 1
     # for _j in range(num_frames):
         #print(f"row is {_j}")
@@ -51,16 +52,18 @@ def read_packet(rx_cnt, tx_cnt, adc_samples):
         #end_t = time.time()
         #print(f"read packet in {(end_t - start_t) * 1000} ms")
         packet_num = struct.unpack('<1l', data[:4])[0]
+        byte_count = struct.unpack('<1Q', data[4:10] + b'\x00\x00')[0]
+        packet_data = np.frombuffer(data[10:], dtype=np.int16)
         #print(f"seq no {packet_num}")
         if packet_num != last_packet_num + 1 and last_packet_num != -1:
             missed_cnt += 1
             print(f"[WARNING]: Missed packet (total missed: {missed_cnt})")
-            packet_data = np.zeros((728, ), dtype=np.int16)
-        else:
-            byte_count = struct.unpack('<1Q', data[4:10] + b'\x00\x00')[0]
-            packet_data = np.frombuffer(data[10:], dtype=np.int16)
+            # zero-fill exactly the bytes the missing packets carried, then keep this packet
+            if byte_count > next_byte_count:
+                buffer = np.concatenate((buffer, np.zeros((byte_count - next_byte_count) // 2, dtype=np.int16)))
 
         last_packet_num = packet_num
+        next_byte_count = byte_count + len(packet_data) * 2
         buffer = np.concatenate((buffer, packet_data))
 
     # if timeout:
@@ -13,10 +13,15 @@
 import codecs
 import socket
 import struct
+import threading
 from enum import Enum
 
 import numpy as np
 
+from .assembler import FrameAssembler
+from .batch_recv import BatchReceiver
+from .ring import FrameRing
+
 
 class CMD(Enum):
     RESET_FPGA_CMD_CODE = '0100'
@@ -69,9 +74,20 @@ class DCA1000:
         >>> adc_data = dca.read(timeout=.001)
         >>> frame = dca.organize(adc_data, 128, 4, 256)
 
+        Draining many packets per system call:
+
+        >>> adc_data = dca.read_batched(timeout=.001)
+
+        Capturing in a background thread:
+
+        >>> dca.polling(num_slots=8)
+        >>> adc_data = dca.latest_frame(timeout=1)
+        >>> dca.close()
+
     """
 
-    def __init__(self, static_ip='192.168.33.30', adc_ip='192.168.33.180', data_port=4098, config_port=4096):
+    def __init__(self, static_ip='192.168.33.30', adc_ip='192.168.33.180', data_port=4098, config_port=4096,
+                 batch_size=64):
         # Create configuration and data destinations
         self.cfg_dest = (adc_ip, config_port)
         self.cfg_recv = (static_ip, config_port)
@@ -84,13 +100,24 @@ class DCA1000:
         self.data_socket = socket.socket(socket.AF_INET,
                                          socket.SOCK_DGRAM,
                                          socket.IPPROTO_UDP)
+        # Room for bursts while the capture thread is descheduled
+        self.data_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 2**25)
 
         self.data_socket.bind(self.data_recv)
 
         # Bind config socket to fpga
         self.config_socket.bind(self.cfg_recv)
 
-        self.lost_packets = None
+        # Batched receive path
+        self.batch_size = batch_size
+        self._receiver = None
+
+        # Frame assembly and capture thread
+        self.ring = None
+        self.assembler = None
+        self.poll_thread = None
+        self.frame_info = None
+        self._stop_event = threading.Event()
 
         # Sensor configuration
         self._bytes_in_frame = None
@@ -99,14 +126,13 @@ class DCA1000:
         self._packets_in_frame_clipped = None
         self._int16_in_packet = None
         self._int16_in_frame = None
-        self.next_frame = None
-        self.last_packet = None
-        self.frame_ready = False
+        self._num_chirps = None
+        self._policy = None
 
         # Will be removed in a later release
         self.sensor_config(128, 3, 4, 128)
 
-    def sensor_config(self, chirps, chirp_loops, num_rx, num_samples, iq=2, num_bytes=2):
+    def sensor_config(self, chirps, chirp_loops, num_rx, num_samples, iq=2, num_bytes=2, policy='zero'):
         """Adjusts the size of the frame returned from realtime reading.
 
         Args:
@@ -116,6 +142,8 @@ class DCA1000:
             num_samples (int): Number of samples per chirp.
             iq (int): Number of parts per samples (complex + real).
             num_bytes (int): Number of bytes per part (int16).
+            policy (str): How frames with missing packets are handled, one of 'zero', 'drop' or 'repeat' (see
+                FrameAssembler).
 
         Returns:
             None
@@ -129,14 +157,40 @@ class DCA1000:
         self._packets_in_frame_clipped = self._bytes_in_frame // max_bytes_in_packet
         self._int16_in_packet = max_bytes_in_packet // 2
         self._int16_in_frame = self._bytes_in_frame // 2
+        self._num_chirps = chirps * chirp_loops
+        self._policy = policy
 
-        self.next_frame = None
-        self.last_packet = -100
-        self.frame_ready = False
-        self.curr_frame = None
+        # Enough slots for every frame a single batch of packets can complete
+        self._reset_assembler(num_slots=3 + -(-self.batch_size * max_bytes_in_packet // self._bytes_in_frame))
 
         print(self._int16_in_frame)
 
+    @property
+    def stats(self):
+        """dict: Packet and frame loss counters of the frame assembler, plus the frames the reader missed."""
+        stats = dict(self.assembler.stats)
+        stats['overwritten_frames'] = self.ring.overwritten
+        stats['skipped_frames'] = self.ring.skipped
+        return stats
+
+    @property
+    def lost_packets(self):
+        """int: Number of packets that never arrived."""
+        return self.assembler.stats['dropped_packets']
+
+    def _reset_assembler(self, num_slots):
+        """Helper function to allocate a new frame ring and start assembling from the next frame boundary.
+
+        Args:
+            num_slots (int): Number of frames held by the ring.
+
+        Returns:
+            None
+
+        """
+        self.ring = FrameRing(num_slots, self._int16_in_frame, self._bytes_in_frame // 4)
+        self.assembler = FrameAssembler(self.ring, self._bytes_in_frame, self._num_chirps, self._policy)
+
     def configure(self):
         """Initializes and connects to the FPGA.
 
@@ -161,13 +215,13 @@ class DCA1000:
         print(self._send_command(CMD.CONFIG_PACKET_DATA_CMD_CODE, '0600', 'c005350c0000'))
 
     def close(self):
-        """Closes the sockets that are used for receiving and sending data.
+        """Stops the capture thread and closes the sockets that are used for receiving and sending data.
 
         Returns:
             None
 
         """
-        self.poll_thread.join()
+        self.stop()
         self.data_socket.close()
         self.config_socket.close()
 
@@ -185,55 +239,109 @@ class DCA1000:
             except socket.timeout as e:
                 return
 
-    def polling(self):
-        import threading
-        self.poll_thread = threading.Thread(target=self._poll)
+    def polling(self, num_slots=8):
+        """Starts a daemon thread that drains the data socket into a ring of preallocated frames.
+
+        The thread assembles every frame in place in a slot of the ring, marks it with its frame number,
+        completeness bitmap and receive timestamp, and keeps going regardless of how fast frames are consumed, so
+        the kernel receive buffer never overflows while the caller is busy. Frames are read back with get_frame
+        or latest_frame.
+
+        Args:
+            num_slots (int): Number of frames held by the ring.
+
+        Returns:
+            None
+
+        """
+        self.stop()
+        self._reset_assembler(num_slots)
+        self._stop_event.clear()
+        self.poll_thread = threading.Thread(target=self._poll, name='dca1000-capture', daemon=True)
         self.poll_thread.start()
 
+    def stop(self):
+        """Stops the capture thread started by polling and wakes up blocked readers.
+
+        Returns:
+            None
+
+        """
+        self._stop_event.set()
+        if self.ring is not None:
+            self.ring.stop()
+        if self.poll_thread is not None:
+            self.poll_thread.join()
+            self.poll_thread = None
 
     def _poll(self):
-        self.data_socket.settimeout(1)
-        ret_frame = np.zeros(self._int16_in_frame, dtype=np.int16)
+        """Capture thread body, see polling."""
+        while not self._stop_event.is_set():
+            try:
+                self._receive(timeout=0.1)
+            except socket.timeout:
+                continue
+            except OSError:
+                # Socket closed underneath us
+                break
 
-        num_packets = 0
-        while True:
-            packet_num, byte_count, packet_data = self._read_data_packet()
-            buff_pointer = ((byte_count >> 1) % self._int16_in_frame)
-            packet_len = len(packet_data)
+    def get_frame(self, timeout=None):
+        """Returns the next captured frame in order, blocking until it is available.
 
-            end_pointer = buff_pointer + packet_len
-            num_packets += 1
+        Args:
+            timeout (float): Time in seconds to wait, None to wait forever.
 
-            # Normal packet
-            if end_pointer < self._int16_in_frame:
-                ret_frame[buff_pointer:end_pointer] = packet_data
+        Returns:
+            ~numpy.ndarray: Copy of the frame, or None on timeout or after stop. Metadata of the frame is kept in
+            frame_info.
 
-            # Overflow packet
-            else:
-                print(num_packets)
-                num_packets = 0
-                overflow = end_pointer % self._int16_in_frame
-                carry = packet_len - overflow
-                ret_frame[buff_pointer:buff_pointer+carry] = packet_data[:carry]
+        """
+        ret = self.ring.get(timeout)
+        if ret is None:
+            return None
+        frame, self.frame_info = ret
+        return frame
 
-                self.curr_frame = ret_frame
-                self.frame_ready = True
+    def _receive(self, timeout, batched=True):
+        """Helper function to receive packets and hand them to the frame assembler.
 
-                ret_frame = np.zeros(self._int16_in_frame, dtype=np.int16)
-                ret_frame[:overflow] = packet_data[carry:]
+        Args:
+            timeout (float): Time to wait for packets before moving on.
+            batched (bool): Drain a whole batch of packets instead of a single one.
 
+        Returns:
+            int: Number of frames published to the ring.
 
-    def get_frame(self):
+        """
+        if not batched:
+            self.data_socket.settimeout(timeout)
+            packet_num, byte_count, packet_data = self._read_data_packet()
+            return self.assembler.add(packet_num, byte_count, packet_data.view(np.uint8))
 
-        while not self.frame_ready:
-            pass
+        if self._receiver is None:
+            self._receiver = BatchReceiver(self.data_socket, batch_size=self.batch_size)
+        self._receiver.recv(timeout)
+        return self.assembler.add_batch(self._receiver)
 
-        self.frame_ready = False
-        return self.curr_frame.copy()
+    def latest_frame(self, timeout=None):
+        """Returns the newest captured frame, dropping every older unread one.
 
+        Args:
+            timeout (float): Time in seconds to wait for a new frame, None to wait forever.
+
+        Returns:
+            ~numpy.ndarray: Copy of the frame, or None on timeout or after stop. Metadata of the frame is kept in
+            frame_info.
+
+        """
+        ret = self.ring.latest(timeout)
+        if ret is None:
+            return None
+        frame, self.frame_info = ret
+        return frame
 
     def read(self, timeout=1):
-        """Read in a single packet via UDP.
+        """Read in a single frame via UDP, one packet at a time.
 
         Args:
             timeout (float): Time to wait for packet before moving on.
@@ -242,66 +350,43 @@ class DCA1000:
             ~numpy.ndarray: Array containing a full frame of data based on current sensor config.
 
         """
-        # Configure
-        self.data_socket.settimeout(timeout)
+        return self._read_frame(timeout, None, batched=False)
 
-        # Check if this is the first call
-        if self.next_frame is not None:
-            ret_frame = self.next_frame
-        else:
-            ret_frame = np.zeros(self._int16_in_frame, dtype=np.int16)
-        self.next_frame = np.zeros(self._int16_in_frame, dtype=np.int16)
+    def read_batched(self, timeout=1, out=None):
+        """Read in a single frame, draining many UDP packets per system call.
 
-        # Wait for the start of a new frame
-        state = -1
-        num_packets = 0
-        while True:
-            packet_num, byte_count, packet_data = self._read_data_packet()
-            buff_pointer = ((byte_count >> 1) % self._int16_in_frame)
-            packet_len = len(packet_data)
-            
-            # Don't lose progress
-            if self.last_packet < packet_num and packet_num < self.last_packet + 10:
-                self.last_packet = -100
-                ret_frame[buff_pointer:buff_pointer+packet_len] = packet_data
-                num_packets += 1
-                break
+        Packets are received in batches into a preallocated arena and every payload is copied straight to its
+        place in the frame using the DCA1000 byte counter. Frames completed by the same batch are kept in order
+        for the next calls.
 
-            # Start from scratch
-            else:
-                self.last_packet = -100
-                end_pointer = buff_pointer + packet_len
-                if end_pointer > self._int16_in_frame:             
-                    overflow = end_pointer % self._int16_in_frame
-                    carry = packet_len - overflow
-                    ret_frame = np.zeros(self._int16_in_frame, dtype=np.int16)
-                    ret_frame[:overflow] = packet_data[carry:]
-                    num_packets += 1
-                    break
-
-        # Get the rest of the packets
-        while True:
-            packet_num, byte_count, packet_data = self._read_data_packet()
-            buff_pointer = ((byte_count >> 1) % self._int16_in_frame)
-            packet_len = len(packet_data)
+        Args:
+            timeout (float): Time to wait for packets before moving on.
+            out (~numpy.ndarray): Optional int16 array of the frame size to fill instead of allocating one.
 
-            # print(byte_count)
-            end_pointer = buff_pointer + packet_len
-            num_packets += 1
+        Returns:
+            ~numpy.ndarray: Array containing a full frame of data based on current sensor config.
+
+        """
+        return self._read_frame(timeout, out, batched=True)
 
-            # Normal packet
-            if end_pointer < self._int16_in_frame:
-                ret_frame[buff_pointer:end_pointer] = packet_data
+    def _read_frame(self, timeout, out, batched):
+        """Helper function to receive packets until the next frame is published.
 
-            # Overflow packet
-            else:
-                overflow = end_pointer % self._int16_in_frame
-                carry = packet_len - overflow
-                ret_frame[buff_pointer:buff_pointer+carry] = packet_data[:carry]
-                self.next_frame[:overflow] = packet_data[carry:]
-                self.last_packet = -100
-                return ret_frame
+        Args:
+            timeout (float): Time to wait for packets before moving on.
+            out (~numpy.ndarray): Optional int16 array of the frame size to fill.
+            batched (bool): Drain whole batches of packets instead of single ones.
 
+        Returns:
+            ~numpy.ndarray: The frame. Metadata of the frame is kept in frame_info.
+
+        """
+        while True:
+            ret = self.ring.get(timeout=0, out=out)
+            if ret is not None:
+                frame, self.frame_info = ret
+                return frame
+            self._receive(timeout, batched)
 
     def _send_command(self, cmd, length='0000', body='', timeout=1):
         """Helper function to send a single commmand to the FPGA
@@ -367,7 +452,7 @@ class DCA1000:
         return self._send_command(CMD.RECORD_STOP_CMD_CODE)
 
     @staticmethod
-    def organize(raw_frame, num_chirps, num_rx, num_samples, num_frames=1, model='1642'):
+    def organize(raw_frame, num_chirps, num_rx, num_samples, num_frames=1, model='1642', out=None):
         """Reorganizes raw ADC data into a full frame
 
         Args:
@@ -377,27 +462,97 @@ class DCA1000:
             num_samples (int): Number of ADC samples included in each chirp.
             num_frames (int): Number of frames encoded within the data.
             model (str): Model of the radar chip being used.
+            out (~numpy.ndarray): Optional complex64 array of the output shape to write into.
 
         Returns:
             ~numpy.ndarray: Reformatted frame of raw data of shape (num_chirps, num_rx, num_samples).
 
         """
-        ret = np.zeros(len(raw_frame) // 2, dtype=np.complex64)
+        shape = (num_chirps, num_rx, num_samples) if num_frames == 1 else (num_frames, num_chirps, num_rx, num_samples)
+        iq, order = DCA1000._iq_view(raw_frame, model, num_rx, num_samples)
+        iq = iq.reshape(shape[:-2] + iq.shape[1:])
+        return DCA1000._deinterleave(iq, order, shape, out)
+
+    @staticmethod
+    def organize_tdm(raw_frame, num_tx, num_loops, num_rx, num_samples, model='1843', out=None):
+        """Reorganizes raw ADC data of a TDM-MIMO frame into (tx, rx, loops, samples) in a single pass
+
+        Chirps arrive loop by loop and transmitter by transmitter. The int16 buffer is reinterpreted with a
+        strided view in the final layout and cast straight into the output, so no intermediate complex arrays or
+        reshape copies are made.
+
+        Args:
+            raw_frame (~numpy.ndarray): int16 data of one frame.
+            num_tx (int): Number of transmitters used in the frame.
+            num_loops (int): Number of chirp loops in the frame.
+            num_rx (int): Number of receivers used in the frame.
+            num_samples (int): Number of ADC samples included in each chirp.
+            model (str): Model of the radar chip being used.
+            out (~numpy.ndarray): Optional preallocated complex64 array of shape (num_tx, num_rx, num_loops,
+                num_samples) to write into.
+
+        Returns:
+            ~numpy.ndarray: Frame of shape (num_tx, num_rx, num_loops, num_samples).
+
+        """
+        iq, order = DCA1000._iq_view(raw_frame, model, num_rx, num_samples)
+        # (loops * tx, rx, ...) -> (tx, rx, loops, ...)
+        iq = iq.reshape((num_loops, num_tx) + iq.shape[1:]).transpose(1, 2, 0, 3, 4)
+        return DCA1000._deinterleave(iq, order, (num_tx, num_rx, num_loops, num_samples), out)
+
+    @staticmethod
+    def _iq_view(raw_frame, model, num_rx, num_samples):
+        """Helper function to view raw int16 data as (chirps, rx, groups, group) without copying.
+
+        Args:
+            raw_frame (~numpy.ndarray): Data to format.
+            model (str): Model of the radar chip being used.
+            num_rx (int): Number of receivers used in the frame.
+            num_samples (int): Number of ADC samples included in each chirp.
 
+        Returns:
+            Tuple [~numpy.ndarray, tuple]
+                1. int16 view. 1642-style chips send samples in groups of I0 I1 Q0 Q1, 1243-style chips as I Q.
+                #. Index into each group of the values for the interleaved real/imag output.
+
+        """
+        raw_frame = np.asarray(raw_frame)
         if model in ['1642', '1843', '6843']:
-            # Separate IQ data
-            ret[0::2] = raw_frame[0::4] + 1j * raw_frame[2::4]
-            ret[1::2] = raw_frame[1::4] + 1j * raw_frame[3::4]
-            ret = ret.reshape((num_chirps, num_rx, num_samples)) if num_frames == 1 else ret.reshape(
-                (num_frames, num_chirps, num_rx, num_samples))
+            # (chirps, rx, pair, I0 I1 Q0 Q1) -> I0 Q0 I1 Q1
+            return raw_frame.reshape(-1, num_rx, num_samples // 2, 4), (0, 2, 1, 3)
 
         elif model in ['1243', '1443']:
-            for rx in range(num_rx):
-                ret[rx::num_rx] = raw_frame[rx::num_rx * 2] + 1j * raw_frame[rx + num_rx::num_rx * 2]
-            ret = ret.reshape((num_chirps, num_samples, num_rx)).swapaxes(1, 2) if num_frames == 1 else ret.reshape(
-                (num_frames, num_chirps, num_samples, num_rx)).swapaxes(2, 3)
+            # (chirps, samples, I/Q, rx) -> (chirps, rx, samples, I/Q)
+            iq = raw_frame.reshape(-1, num_samples, 2, num_rx)
+            return iq.transpose(0, 3, 1, 2), (0, 1)
 
         else:
             raise ValueError(f'Model {model} is not a supported model')
 
-        return ret
+    @staticmethod
+    def _deinterleave(iq, order, shape, out):
+        """Helper function to cast an I/Q view into complex64 output.
+
+        Every output value is written exactly once, straight from the int16 view, one strided pass per position
+        in the group.
+
+        Args:
+            iq (~numpy.ndarray): int16 view from _iq_view, already in the output axis order.
+            order (tuple): Group index of each output value, from _iq_view.
+            shape (tuple): Output shape.
+            out (~numpy.ndarray): Optional complex64 output array.
+
+        Returns:
+            ~numpy.ndarray: The output array.
+
+        """
+        if out is None:
+            out = np.empty(shape, dtype=np.complex64)
+        elif out.shape != shape or out.dtype != np.complex64 or not out.flags.c_contiguous:
+            raise ValueError(f'out must be a contiguous complex64 array of shape {shape}')
+
+        # Real and imaginary parts of the output as float32, grouped like the I/Q view
+        out_iq = out.view(np.float32).reshape(iq.shape)
+        for dst, src in enumerate(order):
+            out_iq[..., dst] = iq[..., src]
+        return out
@@ -0,0 +1,256 @@
+# Copyright 2019 The OpenRadar Authors. All Rights Reserved.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+import numpy as np
+
+# What to do with a frame that is still missing data when it has to be published
+POLICIES = ('zero', 'drop', 'repeat')
+
+
+class FrameAssembler:
+    """Places DCA1000 payloads into frames using the byte counter of every packet.
+
+    The byte counter gives the exact stream offset of every payload, so packets are written to their place
+    regardless of arrival order and a payload that straddles two frames is split between them. Two frames are
+    kept open at once, so late packets can still fill the older one. Frames are assembled in place in the slots of
+    a FrameRing together with a bitmap of the bytes received (one flag per 4 bytes), and published in order as
+    soon as they are complete, or when a packet of a newer frame forces them out.
+
+    Frames still missing data when published are handled according to policy:
+        * 'zero': publish them with zeros where data is missing.
+        * 'drop': do not publish them.
+        * 'repeat': replace every incomplete chirp with the same chirp of the last frame where it was complete.
+
+    Attributes:
+        ring (FrameRing): Ring the frames are assembled in.
+        bytes_in_frame (int): Number of bytes of ADC data per frame.
+        num_chirps (int): Number of chirps per frame, used by the 'repeat' policy.
+        policy (str): One of POLICIES.
+        stats (dict): Packet and frame counters:
+            packets: packets received.
+            dropped_packets: packets missing from the sequence numbers and never received.
+            out_of_order_packets: packets received after a packet with a higher sequence number.
+            duplicate_packets: packets whose data was already received.
+            late_packets: packets that arrived after their frame was published.
+            complete_frames: frames published with all of their data.
+            partial_frames: frames published or dropped with missing data.
+            dropped_frames: frames not published at all.
+
+    Examples:
+        >>> ring = FrameRing(8, 393216, 196608)
+        >>> assembler = FrameAssembler(ring, 786432, 384, policy='repeat')
+        >>> assembler.add(packet_num, byte_count, payload)
+        >>> frame, info = ring.get(timeout=0)
+
+    """
+
+    def __init__(self, ring, bytes_in_frame, num_chirps, policy='zero'):
+        if policy not in POLICIES:
+            raise ValueError(f'Policy {policy} is not one of {POLICIES}')
+        if bytes_in_frame % (4 * num_chirps):
+            raise ValueError('Frame size must be a multiple of 4 bytes per chirp')
+
+        self.ring = ring
+        self.bytes_in_frame = bytes_in_frame
+        self.num_chirps = num_chirps
+        self.policy = policy
+        self.stats = {'packets': 0,
+                      'dropped_packets': 0,
+                      'out_of_order_packets': 0,
+                      'duplicate_packets': 0,
+                      'late_packets': 0,
+                      'complete_frames': 0,
+                      'partial_frames': 0,
+                      'dropped_frames': 0}
+
+        self._words_in_frame = bytes_in_frame // 4
+        # Oldest frame number still accepted, None until the first packet
+        self._base = None
+        # Open frames: frame number -> [slot, number of 4 byte words received]
+        self._open = {}
+        self._last_packet = None
+        self._last_good = np.zeros(bytes_in_frame // 2, dtype=np.int16) if policy == 'repeat' else None
+
+    def add(self, packet_num, byte_count, payload):
+        """Places a single packet.
+
+        Args:
+            packet_num (int): Sequence number of the packet.
+            byte_count (int): Byte count of data sent before the packet (exclusive).
+            payload (~numpy.ndarray): ADC data of the packet as uint8.
+
+        Returns:
+            int: Number of frames published to the ring.
+
+        """
+        stats = self.stats
+        stats['packets'] += 1
+        bytes_in_frame = self.bytes_in_frame
+
+        reordered = self._last_packet is not None and packet_num <= self._last_packet
+        if not reordered:
+            if self._last_packet is not None:
+                stats['dropped_packets'] += packet_num - self._last_packet - 1
+            self._last_packet = packet_num
+
+        start = byte_count
+        end = start + len(payload)
+        first = start // bytes_in_frame
+        last = (end - 1) // bytes_in_frame
+
+        # Start at the first frame boundary seen
+        if self._base is None:
+            self._base = -(-start // bytes_in_frame)
+
+        # Keep at most two frames open: the newest one this packet touches and the one before
+        published = 0
+        if last - 1 > self._base:
+            published += self._advance(last - 1)
+
+        placed = False
+        duplicate = False
+        for frame_num in range(max(first, self._base), last + 1):
+            entry = self._open.get(frame_num)
+            if entry is None:
+                entry = self._start(frame_num)
+            slot = entry[0]
+
+            frame_start = frame_num * bytes_in_frame
+            lo = max(start, frame_start) - frame_start
+            hi = min(end, frame_start + bytes_in_frame) - frame_start
+            mask = self.ring.masks[slot][lo // 4:-(-hi // 4)]
+            missing = len(mask) - np.count_nonzero(mask)
+            if missing == 0:
+                duplicate = True
+                continue
+
+            frame_bytes = self.ring.frames[slot].view(np.uint8)
+            frame_bytes[lo:hi] = payload[lo + frame_start - start:hi + frame_start - start]
+            mask[:] = True
+            entry[1] += missing
+            placed = True
+
+        if placed:
+            if reordered:
+                # It was counted as dropped when the sequence skipped it
+                stats['out_of_order_packets'] += 1
+                stats['dropped_packets'] -= 1
+        elif duplicate:
+            stats['duplicate_packets'] += 1
+        else:
+            stats['late_packets'] += 1
+
+        # Publish in order as soon as the oldest frame is complete
+        while self._base in self._open and self._open[self._base][1] == self._words_in_frame:
+            published += self._publish()
+        return published
+
+    def add_batch(self, receiver):
+        """Places every packet held by a BatchReceiver.
+
+        Args:
+            receiver (BatchReceiver): Receiver holding the current batch.
+
+        Returns:
+            int: Number of frames published to the ring.
+
+        """
+        packet_num, byte_count, payload_len = receiver.decode()
+        published = 0
+        for idx, (num, count, length) in enumerate(zip(packet_num.tolist(), byte_count.tolist(),
+                                                      payload_len.tolist())):
+            published += self.add(num, count, receiver.payload(idx, length))
+        return published
+
+    def flush(self):
+        """Publishes every open frame according to the policy.
+
+        Returns:
+            int: Number of frames published to the ring.
+
+        """
+        published = 0
+        while self._open:
+            published += self._publish()
+        return published
+
+    def _start(self, frame_num):
+        """Helper function to open a frame in a fresh ring slot.
+
+        Args:
+            frame_num (int): Frame number to open.
+
+        Returns:
+            list: [slot, number of 4 byte words received] entry of the open frame.
+
+        """
+        slot = self.ring.acquire()
+        self.ring.frames[slot][:] = 0
+        self.ring.masks[slot][:] = False
+        entry = self._open[frame_num] = [slot, 0]
+        return entry
+
+    def _advance(self, frame_num):
+        """Helper function to close every frame older than frame_num.
+
+        Args:
+            frame_num (int): New oldest accepted frame number.
+
+        Returns:
+            int: Number of frames published to the ring.
+
+        """
+        published = 0
+        while self._base < frame_num:
+            if self._open:
+                published += self._publish()
+            else:
+                # Whole frames without a single packet
+                self.stats['dropped_frames'] += frame_num - self._base
+                self._base = frame_num
+        return published
+
+    def _publish(self):
+        """Helper function to close the oldest accepted frame.
+
+        Returns:
+            int: 1 if the frame was published to the ring, 0 otherwise.
+
+        """
+        entry = self._open.pop(self._base, None)
+        frame_num = self._base
+        self._base += 1
+        if entry is None:
+            self.stats['dropped_frames'] += 1
+            return 0
+
+        slot, received = entry
+        frame = self.ring.frames[slot]
+        if received == self._words_in_frame:
+            self.stats['complete_frames'] += 1
+            if self._last_good is not None:
+                self._last_good[:] = frame
+        else:
+            self.stats['partial_frames'] += 1
+            if self.policy == 'drop':
+                self.stats['dropped_frames'] += 1
+                self.ring.release(slot)
+                return 0
+            if self.policy == 'repeat':
+                chirps = frame.reshape(self.num_chirps, -1)
+                last_good = self._last_good.reshape(self.num_chirps, -1)
+                good = self.ring.masks[slot].reshape(self.num_chirps, -1).all(axis=1)
+                chirps[~good] = last_good[~good]
+                last_good[good] = chirps[good]
+
+        self.ring.commit(slot, frame_num)
+        return 1
@@ -0,0 +1,192 @@
+# Copyright 2019 The OpenRadar Authors. All Rights Reserved.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+import ctypes
+import ctypes.util
+import errno
+import select
+import socket
+import sys
+
+import numpy as np
+
+# DCA1000 data packet: 4 byte sequence number, 6 byte byte counter, then up to 1456 bytes of ADC data
+HEADER_SIZE = 10
+# One packet per slot, rounded up so every slot starts on a cache line
+SLOT_SIZE = 1536
+# Linux flag for a non-blocking recvmmsg call
+MSG_DONTWAIT = 0x40
+
+# Vectorized view of the header of every slot in the receive arena
+PACKET_HEADER = np.dtype({'names': ['packet_num', 'byte_count_lo', 'byte_count_hi'],
+                          'formats': ['<i4', '<u4', '<u2'],
+                          'offsets': [0, 4, 8],
+                          'itemsize': SLOT_SIZE})
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p),
+                ('iov_len', ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p),
+                ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.POINTER(_IOVec)),
+                ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p),
+                ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', _MsgHdr),
+                ('msg_len', ctypes.c_uint)]
+
+
+def _load_recvmmsg():
+    """Looks up recvmmsg(2) in the C library.
+
+    Returns:
+        Callable or None: The foreign function, or None when it is not available (Windows, macOS).
+
+    """
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        recvmmsg = libc.recvmmsg
+    except (OSError, AttributeError):
+        return None
+    recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    recvmmsg.restype = ctypes.c_int
+    return recvmmsg
+
+
+class BatchReceiver:
+    """Pulls many UDP datagrams per call into a preallocated receive arena.
+
+    Every datagram lands in its own fixed-size slot of a single uint8 arena, so receiving a batch allocates
+    nothing. On Linux the whole batch is drained with one recvmmsg(2) system call, elsewhere it falls back to
+    recv_into on the arena slots. Headers of the whole batch are decoded with a single structured NumPy view.
+
+    Attributes:
+        sock (socket.socket): Bound UDP socket to receive from.
+        batch_size (int): Maximum number of datagrams pulled per call.
+        arena (~numpy.ndarray): Receive arena of batch_size * SLOT_SIZE bytes.
+        count (int): Number of datagrams held by the arena after the last call to recv.
+
+    Examples:
+        >>> receiver = BatchReceiver(dca.data_socket, batch_size=64)
+        >>> n = receiver.recv(timeout=1)
+        >>> packet_num, byte_count, payload_len = receiver.decode()
+        >>> first = receiver.payload(0, payload_len[0])
+
+    """
+
+    def __init__(self, sock, batch_size=64, use_recvmmsg=True):
+        self.sock = sock
+        self.batch_size = batch_size
+        self.arena = np.zeros(batch_size * SLOT_SIZE, dtype=np.uint8)
+        self.count = 0
+
+        self._headers = self.arena.view(PACKET_HEADER)
+        self._nbytes = np.zeros(batch_size, dtype=np.int64)
+        self._slots = [memoryview(self.arena[i * SLOT_SIZE:(i + 1) * SLOT_SIZE]) for i in range(batch_size)]
+
+        self._recvmmsg = _load_recvmmsg() if use_recvmmsg else None
+        if self._recvmmsg is not None:
+            base = self.arena.ctypes.data
+            self._iovecs = (_IOVec * batch_size)()
+            self._msgs = (_MMsgHdr * batch_size)()
+            for i in range(batch_size):
+                self._iovecs[i].iov_base = base + i * SLOT_SIZE
+                self._iovecs[i].iov_len = SLOT_SIZE
+                self._msgs[i].msg_hdr.msg_iov = ctypes.pointer(self._iovecs[i])
+                self._msgs[i].msg_hdr.msg_iovlen = 1
+            # Datagram lengths written by the kernel, viewed in place
+            msg_len = np.dtype({'names': ['msg_len'], 'formats': [np.uint32],
+                                'offsets': [_MMsgHdr.msg_len.offset], 'itemsize': ctypes.sizeof(_MMsgHdr)})
+            self._msg_len = np.frombuffer(self._msgs, dtype=msg_len)['msg_len']
+
+    def recv(self, timeout=None):
+        """Waits for data and pulls every queued datagram up to batch_size.
+
+        Args:
+            timeout (float): Time in seconds to wait for the first datagram, None to wait forever.
+
+        Returns:
+            int: Number of datagrams received.
+
+        Raises:
+            socket.timeout: No datagram arrived within timeout.
+
+        """
+        self.count = 0
+        ready, _, _ = select.select([self.sock], [], [], timeout)
+        if not ready:
+            raise socket.timeout('timed out')
+
+        if self._recvmmsg is not None:
+            n = self._recvmmsg(self.sock.fileno(), self._msgs, self.batch_size, MSG_DONTWAIT, None)
+            if n < 0:
+                err = ctypes.get_errno()
+                if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                    return 0
+                raise OSError(err, 'recvmmsg failed')
+            self._nbytes[:n] = self._msg_len[:n]
+        else:
+            n = 0
+            timeout = self.sock.gettimeout()
+            self.sock.settimeout(0.0)
+            try:
+                while n < self.batch_size:
+                    try:
+                        self._nbytes[n] = self.sock.recv_into(self._slots[n], SLOT_SIZE)
+                    except (BlockingIOError, InterruptedError, socket.timeout):
+                        break
+                    n += 1
+            finally:
+                self.sock.settimeout(timeout)
+
+        self.count = n
+        return n
+
+    def decode(self):
+        """Decodes the headers of every datagram in the current batch at once.
+
+        Returns:
+            Tuple [~numpy.ndarray, ~numpy.ndarray, ~numpy.ndarray]
+                1. Packet numbers.
+                #. Byte count of data sent before each packet (exclusive).
+                #. Number of ADC data bytes carried by each packet.
+
+        """
+        headers = self._headers[:self.count]
+        packet_num = headers['packet_num']
+        byte_count = headers['byte_count_lo'].astype(np.int64) | (headers['byte_count_hi'].astype(np.int64) << 32)
+        payload_len = self._nbytes[:self.count] - HEADER_SIZE
+        return packet_num, byte_count, payload_len
+
+    def payload(self, idx, length):
+        """Returns the ADC data of one datagram as a view into the arena.
+
+        Args:
+            idx (int): Index of the datagram in the current batch.
+            length (int): Number of payload bytes, as returned by decode.
+
+        Returns:
+            ~numpy.ndarray: uint8 view of the payload, only valid until the next call to recv.
+
+        """
+        start = idx * SLOT_SIZE + HEADER_SIZE
+        return self.arena[start:start + length]
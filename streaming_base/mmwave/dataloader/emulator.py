@@ -0,0 +1,408 @@
+# Copyright 2019 The OpenRadar Authors. All Rights Reserved.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+import argparse
+import codecs
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from .adcv3 import CMD, CONFIG_FOOTER, CONFIG_HEADER, CONFIG_STATUS, MAX_PACKET_SIZE
+from .batch_recv import HEADER_SIZE
+
+# Status returned for READ_FPGA_VERSION_CMD_CODE, the version sits in place of the status field
+FPGA_VERSION = '0602'
+
+
+def load_frames(path, bytes_in_frame):
+    """Maps a recorded *_Raw_0.bin capture as frames without reading it into memory.
+
+    Args:
+        path (str): Path to the capture.
+        bytes_in_frame (int): Number of bytes of ADC data per frame.
+
+    Returns:
+        ~numpy.ndarray: int16 memmap of shape (num_frames, bytes_in_frame // 2). A trailing partial frame is
+        ignored.
+
+    """
+    data = np.memmap(path, dtype=np.int16, mode='r')
+    num_frames = data.size * 2 // bytes_in_frame
+    if num_frames == 0:
+        raise ValueError(f'{path} holds less than one frame of {bytes_in_frame} bytes')
+    return data[:num_frames * bytes_in_frame // 2].reshape(num_frames, -1)
+
+
+def synthetic_frames(num_frames, num_chirps, num_rx, num_samples, num_targets=3, noise=8., seed=None):
+    """Generates frames of point targets in the DCA1000 1843 lane layout.
+
+    Every target is a complex tone in fast time (its range bin) with a random phase per receiver and a phase ramp
+    over chirps, which is all the real-time path needs to produce a sensible picture.
+
+    Args:
+        num_frames (int): Number of frames to generate.
+        num_chirps (int): Number of chirps per frame (chirp loops times transmitters).
+        num_rx (int): Number of receivers.
+        num_samples (int): Number of ADC samples per chirp.
+        num_targets (int): Number of point targets.
+        noise (float): Standard deviation of the added noise in ADC counts.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        ~numpy.ndarray: int16 frames of shape (num_frames, num_chirps * num_rx * num_samples * 2).
+
+    """
+    rng = np.random.default_rng(seed)
+    bins = rng.uniform(4, num_samples // 2, num_targets)
+    amps = rng.uniform(200, 1000, num_targets)
+    doppler = rng.uniform(-0.2, 0.2, num_targets)
+    rx_phase = rng.uniform(0, 2 * np.pi, (num_targets, num_rx))
+
+    n = np.arange(num_samples)
+    chirp = np.arange(num_frames * num_chirps).reshape(num_frames, num_chirps)
+    cube = np.zeros((num_frames, num_chirps, num_rx, num_samples), dtype=np.complex64)
+    for b, a, d, p in zip(bins, amps, doppler, rx_phase):
+        slow = np.exp(1j * d * chirp)[:, :, None, None]
+        fast = np.exp(2j * np.pi * b * n / num_samples)[None, None, None, :]
+        cube += a * slow * np.exp(1j * p)[None, None, :, None] * fast
+    cube += noise * (rng.standard_normal(cube.shape) + 1j * rng.standard_normal(cube.shape))
+    return interleave(cube)
+
+
+def interleave(cube):
+    """Packs complex samples into the int16 lane layout of the DCA1000 (the inverse of DCA1000.organize).
+
+    Args:
+        cube (~numpy.ndarray): Complex samples whose last axis is the ADC samples of one chirp.
+
+    Returns:
+        ~numpy.ndarray: int16 array of shape cube.shape[:-3] + (-1,) holding I0 I1 Q0 Q1 groups, one row per
+        frame of (chirps, rx, samples).
+
+    """
+    pairs = cube.reshape(cube.shape[:-1] + (-1, 2))
+    raw = np.empty(pairs.shape[:-1] + (4,), dtype=np.int16)
+    raw[..., 0:2] = np.clip(np.round(pairs.real), -32768, 32767)
+    raw[..., 2:4] = np.clip(np.round(pairs.imag), -32768, 32767)
+    return raw.reshape(cube.shape[:-3] + (-1,))
+
+
+class DCA1000Emulator:
+    """Software DCA1000 that answers configuration commands and streams frames over UDP.
+
+    The emulator binds the board side of the two DCA1000 ports: it answers every command of the CMD protocol on
+    the configuration port and streams data packets with the real header (sequence number and 48 bit byte count)
+    to the host data port. Frames are cut into packets as one continuous byte stream, so packets straddle frame
+    boundaries exactly like on the board.
+
+    On a single machine run the board and the host on two loopback addresses (127.0.0.2 and 127.0.0.1 by
+    default), since both sides bind the same configuration port.
+
+    Attributes:
+        frames (~numpy.ndarray): int16 frames to stream, of shape (num_frames, int16 per frame), sent in a loop.
+        host (tuple): Address data packets are sent to.
+        frame_rate (float): Frames per second, ignored in max speed mode.
+        packet_delay (float): Seconds between packets of a frame, 0 to send every frame as a burst.
+        loss (float): Probability of dropping every packet.
+        reorder (float): Probability of swapping every packet with the next one.
+        max_speed (bool): Send as fast as possible instead of pacing frames.
+        streaming (bool): True while data packets are being sent.
+        stats (dict): Counters of frames_sent, packets_sent, dropped_packets, reordered_packets and bytes_sent.
+
+    Examples:
+        >>> frames = load_frames('data/task3_gt_Raw_0.bin', 6144)
+        >>> emulator = DCA1000Emulator(frames, frame_rate=50)
+        >>> emulator.start()
+        >>> dca = DCA1000(static_ip='127.0.0.1', adc_ip='127.0.0.2')
+        >>> emulator.close()
+
+    """
+
+    def __init__(self, frames, host_ip='127.0.0.1', board_ip='127.0.0.2', data_port=4098, config_port=4096,
+                 frame_rate=50., packet_size=1456, packet_delay=0., loss=0., reorder=0., max_speed=False,
+                 autostart=True, seed=None):
+        self.frames = frames
+        self.host = (host_ip, data_port)
+        self.frame_rate = frame_rate
+        self.packet_size = packet_size
+        self.packet_delay = packet_delay
+        self.loss = loss
+        self.reorder = reorder
+        self.max_speed = max_speed
+        self.autostart = autostart
+        self.streaming = False
+        self.stats = {'frames_sent': 0,
+                      'packets_sent': 0,
+                      'dropped_packets': 0,
+                      'reordered_packets': 0,
+                      'bytes_sent': 0}
+
+        self.config_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self.config_socket.bind((board_ip, config_port))
+        self.config_socket.settimeout(0.1)
+        self.data_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self.data_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 2**22)
+        self.data_socket.bind((board_ip, 0))
+
+        self._rng = np.random.default_rng(seed)
+        self._packet = bytearray(HEADER_SIZE + packet_size)
+        self._stream_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Starts answering commands, and streaming if autostart is set.
+
+        Returns:
+            None
+
+        """
+        self._stop_event.clear()
+        if self.autostart:
+            self._set_streaming(True)
+        self._threads = [threading.Thread(target=self._serve_config, name='dca1000-emulator-config', daemon=True),
+                         threading.Thread(target=self._stream, name='dca1000-emulator-data', daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def close(self):
+        """Stops both threads and closes the sockets.
+
+        Returns:
+            None
+
+        """
+        self._stop_event.set()
+        self._stream_event.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.config_socket.close()
+        self.data_socket.close()
+
+    def _set_streaming(self, on):
+        """Helper function to start or pause the data stream."""
+        self.streaming = on
+        if on:
+            self._stream_event.set()
+        else:
+            self._stream_event.clear()
+
+    def _serve_config(self):
+        """Configuration thread body: answers every command with its code and a success status."""
+        while not self._stop_event.is_set():
+            try:
+                msg, addr = self.config_socket.recvfrom(MAX_PACKET_SIZE)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            resp = self._handle_command(codecs.encode(msg, 'hex').decode())
+            if resp is not None:
+                self.config_socket.sendto(codecs.decode(resp, 'hex'), addr)
+
+    def _handle_command(self, msg):
+        """Helper function to answer one command.
+
+        Args:
+            msg (str): Command as a hex string.
+
+        Returns:
+            str: Response as a hex string, None if the message is not a command.
+
+        """
+        if not (msg.startswith(CONFIG_HEADER) and msg.endswith(CONFIG_FOOTER)) or len(msg) < 16:
+            return None
+        code = msg[4:8]
+        try:
+            cmd = CMD(code)
+        except ValueError:
+            return None
+
+        status = CONFIG_STATUS
+        if cmd == CMD.RECORD_START_CMD_CODE:
+            self._set_streaming(True)
+        elif cmd == CMD.RECORD_STOP_CMD_CODE:
+            self._set_streaming(False)
+        elif cmd == CMD.READ_FPGA_VERSION_CMD_CODE:
+            status = FPGA_VERSION
+        return ''.join((CONFIG_HEADER, code, status, CONFIG_FOOTER))
+
+    def _stream(self):
+        """Data thread body: sends the frames in a loop as one continuous byte stream."""
+        frames = self.frames.view(np.uint8).reshape(len(self.frames), -1)
+        carry = np.zeros(0, dtype=np.uint8)
+        packet_num = 1
+        byte_count = 0
+        held = None
+        idx = 0
+        next_frame = time.perf_counter()
+
+        while not self._stop_event.is_set():
+            if not self._stream_event.is_set():
+                self._stream_event.wait()
+                next_frame = time.perf_counter()
+                continue
+
+            if not self.max_speed:
+                _sleep_until(next_frame)
+                next_frame = max(next_frame + 1 / self.frame_rate, time.perf_counter() - 1)
+
+            data = np.concatenate((carry, frames[idx])) if len(carry) else frames[idx]
+            idx = (idx + 1) % len(frames)
+            num_packets = len(data) // self.packet_size
+
+            for i in range(num_packets):
+                payload = data[i * self.packet_size:(i + 1) * self.packet_size]
+                held = self._send(packet_num, byte_count, payload, held)
+                packet_num += 1
+                byte_count += self.packet_size
+                if self.packet_delay and not self.max_speed:
+                    _sleep_until(time.perf_counter() + self.packet_delay)
+
+            carry = data[num_packets * self.packet_size:].copy()
+            self.stats['frames_sent'] += 1
+
+        if held is not None:
+            self._sendto(held)
+
+    def _send(self, packet_num, byte_count, payload, held):
+        """Helper function to send one packet, applying the injected loss and reordering.
+
+        Args:
+            packet_num (int): Sequence number of the packet.
+            byte_count (int): Byte count of data sent before the packet (exclusive).
+            payload (~numpy.ndarray): uint8 ADC data of the packet.
+            held (bytes): Packet held back to be sent after this one, or None.
+
+        Returns:
+            bytes: Packet to hold back until the next call, or None.
+
+        """
+        if self.loss and self._rng.random() < self.loss:
+            self.stats['dropped_packets'] += 1
+            return held
+
+        packet = self._packet
+        struct.pack_into('<I', packet, 0, packet_num)
+        packet[4:HEADER_SIZE] = byte_count.to_bytes(8, 'little')[:6]
+        packet[HEADER_SIZE:HEADER_SIZE + len(payload)] = payload.data
+        packet = memoryview(packet)[:HEADER_SIZE + len(payload)]
+
+        if held is None and self.reorder and self._rng.random() < self.reorder:
+            self.stats['reordered_packets'] += 1
+            return bytes(packet)
+
+        self._sendto(packet)
+        if held is not None:
+            self._sendto(held)
+        return None
+
+    def _sendto(self, packet):
+        """Helper function to send a datagram to the host, waiting for room in the send buffer."""
+        while True:
+            try:
+                self.data_socket.sendto(packet, self.host)
+                break
+            except (BlockingIOError, InterruptedError):
+                time.sleep(0)
+        self.stats['packets_sent'] += 1
+        self.stats['bytes_sent'] += len(packet) - HEADER_SIZE
+
+
+def _sleep_until(deadline):
+    """Sleeps until a time.perf_counter() deadline, spinning for the last millisecond."""
+    remaining = deadline - time.perf_counter()
+    if remaining > 2e-3:
+        time.sleep(remaining - 1e-3)
+    while time.perf_counter() < deadline:
+        pass
+
+
+def spawn(chirp_dict, bin_path=None, *args):
+    """Runs the emulator in a child process for the frame format of a lua configuration.
+
+    Args:
+        chirp_dict (dict): Radar parameters as returned by utils.utility.read_radar_params.
+        bin_path (str): Recorded capture to stream, synthetic frames if None.
+        *args (str): Extra command line arguments of the emulator.
+
+    Returns:
+        subprocess.Popen: The emulator process, terminate it when done.
+
+    """
+    cmd = [sys.executable, '-m', __name__,
+           '--chirps', str(chirp_dict['num_tx']),
+           '--chirp-loops', str(chirp_dict['chirp_loops']),
+           '--num-rx', str(chirp_dict['num_rx']),
+           '--num-samples', str(chirp_dict['samples_per_chirp']),
+           '--frame-rate', str(1000 / chirp_dict['periodicity'])]
+    if bin_path:
+        cmd += ['--bin', bin_path]
+    return subprocess.Popen(cmd + list(args))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulates a DCA1000 streaming a capture or synthetic frames.")
+    parser.add_argument("--bin", help="Recorded *_Raw_0.bin capture to stream, synthetic frames if not given.")
+    parser.add_argument("--chirps", type=int, default=3, help="Chirps (transmitters) per chirp loop.")
+    parser.add_argument("--chirp-loops", type=int, default=1, help="Chirp loops per frame.")
+    parser.add_argument("--num-rx", type=int, default=4, help="Number of receivers.")
+    parser.add_argument("--num-samples", type=int, default=128, help="ADC samples per chirp.")
+    parser.add_argument("--frame-rate", type=float, default=50., help="Frames per second.")
+    parser.add_argument("--packet-delay", type=float, default=0., help="Seconds between packets of a frame.")
+    parser.add_argument("--loss", type=float, default=0., help="Probability of dropping a packet.")
+    parser.add_argument("--reorder", type=float, default=0., help="Probability of swapping a packet with the next.")
+    parser.add_argument("--max-speed", action="store_true", help="Send frames as fast as possible.")
+    parser.add_argument("--host-ip", default='127.0.0.1', help="IP the host DCA1000 class receives on.")
+    parser.add_argument("--board-ip", default='127.0.0.2', help="IP the emulated board sends from.")
+    parser.add_argument("--data-port", type=int, default=4098)
+    parser.add_argument("--config-port", type=int, default=4096)
+    parser.add_argument("--wait-start", action="store_true", help="Stream only after RECORD_START_CMD_CODE.")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    num_chirps = args.chirps * args.chirp_loops
+    bytes_in_frame = num_chirps * args.num_rx * args.num_samples * 4
+    if args.bin:
+        frames = load_frames(args.bin, bytes_in_frame)
+    else:
+        frames = synthetic_frames(100, num_chirps, args.num_rx, args.num_samples, seed=args.seed)
+
+    emulator = DCA1000Emulator(frames, host_ip=args.host_ip, board_ip=args.board_ip, data_port=args.data_port,
+                               config_port=args.config_port, frame_rate=args.frame_rate,
+                               packet_delay=args.packet_delay, loss=args.loss, reorder=args.reorder,
+                               max_speed=args.max_speed, autostart=not args.wait_start, seed=args.seed)
+    print(f"Emulating DCA1000 on {args.board_ip}, sending {len(frames)} frames of {bytes_in_frame} bytes to "
+          f"{args.host_ip}:{args.data_port}")
+    emulator.start()
+    try:
+        last = dict(emulator.stats)
+        while True:
+            time.sleep(1)
+            stats = dict(emulator.stats)
+            print(f"{stats['frames_sent'] - last['frames_sent']} frames/s, "
+                  f"{(stats['bytes_sent'] - last['bytes_sent']) / 1e6:.1f} MB/s, {stats}")
+            last = stats
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# Copyright 2019 The OpenRadar Authors. All Rights Reserved.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+import threading
+import time
+
+import numpy as np
+
+
+class FrameRing:
+    """Ring of preallocated frames handed from one writer thread to one reader thread.
+
+    The writer fills a slot in place and publishes it with a sequence number. Readers copy a slot out and then
+    check that its sequence number did not change while copying (a seqlock), so frame data is never guarded by a
+    lock and a slow reader can never stall the writer: old frames are simply overwritten. A condition variable is
+    only used to wake up blocked readers.
+
+    Attributes:
+        num_slots (int): Number of frames held by the ring.
+        frames (~numpy.ndarray): Frame storage of shape (num_slots, frame_len).
+        masks (~numpy.ndarray): Completeness bitmap of every slot, one flag per 4 bytes of frame data.
+        frame_num (~numpy.ndarray): DCA1000 frame number stored in every slot.
+        timestamp (~numpy.ndarray): time.perf_counter() at which every slot was published.
+        write_count (int): Number of frames published so far.
+        read_count (int): Sequence number of the next frame get will return.
+        overwritten (int): Frames that were overwritten before get could return them.
+        skipped (int): Frames skipped by latest.
+
+    Examples:
+        >>> ring = FrameRing(8, 393216, 196608)
+        >>> slot = ring.acquire()       # writer
+        >>> ring.commit(slot, frame_num=0)
+        >>> frame, info = ring.get(timeout=1)   # reader
+
+    """
+
+    def __init__(self, num_slots, frame_len, mask_len, dtype=np.int16):
+        if num_slots < 3:
+            raise ValueError('FrameRing needs at least 3 slots')
+
+        self.num_slots = num_slots
+        self.frames = np.zeros((num_slots, frame_len), dtype=dtype)
+        self.masks = np.zeros((num_slots, mask_len), dtype=bool)
+        self.frame_num = np.full(num_slots, -1, dtype=np.int64)
+        self.timestamp = np.zeros(num_slots, dtype=np.float64)
+
+        # Sequence number published in every slot, -1 while the writer owns it
+        self._seq = np.full(num_slots, -1, dtype=np.int64)
+        # Slot holding every sequence number, indexed by seq % num_slots
+        self._order = np.zeros(num_slots, dtype=np.int64)
+        self._held = []
+
+        self.write_count = 0
+        self.read_count = 0
+        self.overwritten = 0
+        self.skipped = 0
+
+        self._cond = threading.Condition()
+        self._stopped = False
+
+    def acquire(self):
+        """Hands the oldest slot to the writer, invalidating the frame it held.
+
+        Returns:
+            int: Index of the slot to fill.
+
+        """
+        seq = np.where(np.isin(np.arange(self.num_slots), self._held), np.iinfo(np.int64).max, self._seq)
+        slot = int(np.argmin(seq))
+        self._seq[slot] = -1
+        self._held.append(slot)
+        return slot
+
+    def commit(self, slot, frame_num=-1, timestamp=None):
+        """Publishes a filled slot as the newest frame.
+
+        Args:
+            slot (int): Slot returned by acquire.
+            frame_num (int): DCA1000 frame number of the data.
+            timestamp (float): Receive time, defaults to now.
+
+        Returns:
+            None
+
+        """
+        self.frame_num[slot] = frame_num
+        self.timestamp[slot] = timestamp if timestamp is not None else time.perf_counter()
+        self._order[self.write_count % self.num_slots] = slot
+        self._seq[slot] = self.write_count
+        self._held.remove(slot)
+        self.write_count += 1
+        with self._cond:
+            self._cond.notify_all()
+
+    def release(self, slot):
+        """Gives a slot back to the ring without publishing it.
+
+        Args:
+            slot (int): Slot returned by acquire.
+
+        Returns:
+            None
+
+        """
+        self._held.remove(slot)
+
+    def get(self, timeout=None, out=None):
+        """Returns the next frame in order, blocking until one is published.
+
+        Args:
+            timeout (float): Time in seconds to wait, None to wait forever.
+            out (~numpy.ndarray): Optional array to copy the frame into.
+
+        Returns:
+            Tuple [~numpy.ndarray, dict] or None: The frame and its metadata, None on timeout or stop.
+
+        """
+        while self._wait(timeout):
+            # Frames older than the ring size are gone
+            oldest = self.write_count - self.num_slots + 1
+            if self.read_count < oldest:
+                self.overwritten += oldest - self.read_count
+                self.read_count = oldest
+
+            seq = self.read_count
+            self.read_count += 1
+            ret = self._copy(seq, out)
+            if ret is not None:
+                return ret
+            self.overwritten += 1
+        return None
+
+    def latest(self, timeout=None, out=None):
+        """Returns the newest frame, dropping every older unread one.
+
+        Args:
+            timeout (float): Time in seconds to wait for a frame newer than the last one returned.
+            out (~numpy.ndarray): Optional array to copy the frame into.
+
+        Returns:
+            Tuple [~numpy.ndarray, dict] or None: The frame and its metadata, None on timeout or stop.
+
+        """
+        while self._wait(timeout):
+            seq = self.write_count - 1
+            self.skipped += seq - self.read_count
+            self.read_count = seq + 1
+            ret = self._copy(seq, out)
+            if ret is not None:
+                return ret
+        return None
+
+    def stop(self):
+        """Wakes up every blocked reader and makes further waits return immediately.
+
+        Returns:
+            None
+
+        """
+        self._stopped = True
+        with self._cond:
+            self._cond.notify_all()
+
+    def _wait(self, timeout):
+        """Helper function to block until an unread frame exists.
+
+        Args:
+            timeout (float): Time in seconds to wait, None to wait forever.
+
+        Returns:
+            bool: True if a frame is available.
+
+        """
+        if self.write_count > self.read_count:
+            return True
+        with self._cond:
+            self._cond.wait_for(lambda: self._stopped or self.write_count > self.read_count, timeout)
+        return not self._stopped and self.write_count > self.read_count
+
+    def _copy(self, seq, out):
+        """Helper function to copy a published frame out of the ring.
+
+        Args:
+            seq (int): Sequence number of the frame.
+            out (~numpy.ndarray): Optional array to copy the frame into.
+
+        Returns:
+            Tuple [~numpy.ndarray, dict] or None: The frame and its metadata, None if it was overwritten.
+
+        """
+        slot = self._order[seq % self.num_slots]
+        if self._seq[slot] != seq:
+            return None
+
+        if out is None:
+            out = self.frames[slot].copy()
+        else:
+            np.copyto(out, self.frames[slot])
+        info = {'seq': seq,
+                'frame_num': int(self.frame_num[slot]),
+                'timestamp': float(self.timestamp[slot]),
+                'complete': bool(self.masks[slot].all())}
+
+        # The writer took the slot back while it was being copied
+        if self._seq[slot] != seq:
+            return None
+        return out, info
@@ -0,0 +1,342 @@
+import time
+from functools import lru_cache
+
+import numpy as np
+
+
+def steering_matrix(phi, x_locs, lm):
+    """
+    Steering matrix h_phi = exp(j 2pi/lm d_n cos(phi)) of every angle and antenna (see the README), computed once
+    per configuration and cached.
+
+    Parameters
+    ----------
+    phi : np.ndarray
+        Azimuth angles in radians (90 degrees is boresight).
+    x_locs : np.ndarray
+        x positions of the antennas.
+    lm : float
+        Wavelength.
+
+    Returns
+    -------
+    steering : np.ndarray
+        Read-only complex64 array of shape (num_phi, num_antennas).
+    """
+    phi = np.ascontiguousarray(phi, dtype=np.float64).ravel()
+    x_locs = np.ascontiguousarray(x_locs, dtype=np.float64).ravel()
+    return _steering_matrix(phi.tobytes(), x_locs.tobytes(), float(lm))
+
+
+@lru_cache(maxsize=16)
+def _steering_matrix(phi_bytes, x_bytes, lm):
+    """
+    Helper function of steering_matrix, cached on the bytes of the angles and positions.
+    """
+    phi = np.frombuffer(phi_bytes, dtype=np.float64)
+    x_locs = np.frombuffer(x_bytes, dtype=np.float64)
+    steering = np.exp(1j * 2 * np.pi / lm * np.outer(np.cos(phi), x_locs)).astype(np.complex64)
+    steering.flags.writeable = False
+    return steering
+
+
+def beamform(beat_freq_data, radar_params, x_locs, out=None):
+    """
+    Delay-and-sum beamforming along azimuth, as beamform_2d of task 3, but for all range bins at once: the image is
+    the magnitude of one complex64 matrix product of the cached steering matrix with the antenna data.
+
+    Parameters
+    ----------
+    beat_freq_data : np.ndarray
+        The range FFT data, of shape (num_antennas, num_range) or with leading frame axes.
+    radar_params : dict
+        A dictionary containing the radar parameters phi, lm and range_idx.
+    x_locs : np.ndarray
+        The x-coordinates of the antennas.
+    out : np.ndarray
+        Optional complex64 array of shape (..., num_phi, num_range) to write the image into.
+
+    Returns
+    -------
+    sph_pwr : np.ndarray
+        The magnitude of the beamformed signal (as complex64 like beamform_2d), shape (..., num_phi, num_range).
+    """
+    steering = steering_matrix(radar_params["phi"], x_locs, radar_params["lm"])
+    num_range = len(radar_params["range_idx"])
+    data = np.asarray(beat_freq_data[..., :num_range], dtype=np.complex64)
+
+    out = np.matmul(steering, data, out=out)
+    np.abs(out, out=out)
+    return out
+
+
+def beamform_sparse(beat_freq_data, radar_params, x_locs, range_bins, out=None):
+    """
+    Beamforms only the given range bins (e.g. those with CFAR detections) and scatters them into the full
+    (num_phi, num_range) image, the other range bins are zero.
+
+    Parameters
+    ----------
+    beat_freq_data : np.ndarray
+        The range FFT data, of shape (num_antennas, num_range).
+    radar_params : dict
+        A dictionary containing the radar parameters phi, lm and range_idx.
+    x_locs : np.ndarray
+        The x-coordinates of the antennas.
+    range_bins : np.ndarray
+        Indices of the range bins to beamform.
+    out : np.ndarray
+        Optional complex64 array of shape (num_phi, num_range) to write the image into.
+
+    Returns
+    -------
+    sph_pwr : np.ndarray
+        The magnitude of the beamformed signal, shape (num_phi, num_range).
+    """
+    steering = steering_matrix(radar_params["phi"], x_locs, radar_params["lm"])
+    if out is None:
+        out = np.empty((len(steering), len(radar_params["range_idx"])), dtype=np.complex64)
+    out[...] = 0
+
+    range_bins = np.asarray(range_bins, dtype=int)
+    if len(range_bins):
+        data = np.asarray(beat_freq_data[:, range_bins], dtype=np.complex64)
+        out[:, range_bins] = np.abs(steering @ data)
+    return out
+
+
+def beamform_cells(rd_cube, radar_params, x_locs, cells, out=None):
+    """
+    Beamforms only the given range-Doppler cells (e.g. the CFAR detections), so targets at the same range but
+    different velocities get their own angle spectrum. The image keeps, for every range bin, the strongest
+    spectrum over its detected Doppler bins.
+
+    Parameters
+    ----------
+    rd_cube : np.ndarray
+        The range-Doppler data, of shape (num_antennas, num_doppler, num_range).
+    radar_params : dict
+        A dictionary containing the radar parameters phi, lm and range_idx.
+    x_locs : np.ndarray
+        The x-coordinates of the antennas.
+    cells : tuple of np.ndarray
+        Doppler and range indices of the cells, as returned by np.nonzero of a (Doppler, range) detection map.
+    out : np.ndarray
+        Optional complex64 array of shape (num_phi, num_range) to write the image into.
+
+    Returns
+    -------
+    sph_pwr : np.ndarray
+        The magnitude of the beamformed signal, shape (num_phi, num_range).
+    """
+    steering = steering_matrix(radar_params["phi"], x_locs, radar_params["lm"])
+    if out is None:
+        out = np.empty((len(steering), len(radar_params["range_idx"])), dtype=np.complex64)
+    out[...] = 0
+
+    doppler_idx, range_idx = (np.asarray(idx, dtype=int) for idx in cells)
+    if len(range_idx):
+        data = np.asarray(rd_cube[:, doppler_idx, range_idx], dtype=np.complex64)
+        spectra = np.abs(steering @ data).astype(np.complex64)
+        # Rows of the transposed image are range bins, several cells can hit the same one
+        np.maximum.at(out.T, range_idx, spectra.T)
+    return out
+
+
+@lru_cache(maxsize=16)
+def _fft_geometry(x_bytes, lm, nfft, phi_bytes):
+    """
+    Helper function of fft_beamform: grid position of every antenna and interpolation of the FFT bins onto phi.
+    """
+    x_locs = np.frombuffer(x_bytes, dtype=np.float64)
+    positions = np.unique(np.round(x_locs, 12))
+    spacing = np.diff(positions).min() if len(positions) > 1 else lm / 2
+    grid = (x_locs - x_locs.min()) / spacing
+    if not np.allclose(grid, np.round(grid), atol=1e-6):
+        raise ValueError("fft_beamform needs antennas on a uniform grid, use beamform instead")
+    grid = np.round(grid).astype(int)
+    if grid.max() >= nfft:
+        raise ValueError(f"nfft={nfft} is smaller than the {grid.max() + 1} positions of the array")
+
+    # Bin k (after fftshift) looks at cos(phi) = (k - nfft/2) lm / (nfft spacing), linear interpolation onto phi
+    u = np.cos(np.frombuffer(phi_bytes, dtype=np.float64)) * nfft * spacing / lm + nfft // 2
+    lo = np.clip(np.floor(u).astype(int), 0, nfft - 2)
+    weight = np.clip(u - lo, 0, 1).astype(np.float32)
+    return grid, lo, weight
+
+
+def fft_beamform(beat_freq_data, radar_params, x_locs, nfft=64, out=None):
+    """
+    Angle spectrum of a uniform linear array with a zero-padded FFT over the antennas, O(nfft log nfft) per range
+    bin instead of a product with the steering matrix.
+
+    Antennas are placed on the grid of the smallest spacing of x_locs (virtual antennas at the same position
+    are summed, as the steering matrix does) and the FFT bins are interpolated onto the phi of radar_params, so
+    the output is a drop-in for beamform. The FFT bins are uniform in cos(phi), so the resolution is coarser near
+    endfire, increase nfft to compensate.
+
+    Parameters
+    ----------
+    beat_freq_data : np.ndarray
+        The range FFT data, of shape (num_antennas, num_range) or with leading frame axes.
+    radar_params : dict
+        A dictionary containing the radar parameters phi, lm and range_idx.
+    x_locs : np.ndarray
+        The x-coordinates of the antennas, on a uniform grid.
+    nfft : int
+        Size of the zero-padded FFT.
+    out : np.ndarray
+        Optional complex64 array of shape (..., num_phi, num_range) to write the image into.
+
+    Returns
+    -------
+    sph_pwr : np.ndarray
+        The magnitude of the spectrum, shape (..., num_phi, num_range).
+    """
+    phi = np.ascontiguousarray(radar_params["phi"], dtype=np.float64).ravel()
+    x_locs = np.ascontiguousarray(x_locs, dtype=np.float64).ravel()
+    grid, lo, weight = _fft_geometry(x_locs.tobytes(), float(radar_params["lm"]), nfft, phi.tobytes())
+
+    num_range = len(radar_params["range_idx"])
+    data = np.asarray(beat_freq_data[..., :num_range], dtype=np.complex64)
+    aperture = np.zeros(data.shape[:-2] + (nfft, num_range), dtype=np.complex64)
+    for n, position in enumerate(grid):
+        aperture[..., position, :] += data[..., n, :]
+
+    # ifft has the + sign of the steering vector, the scaling by nfft gives the same magnitude as beamform
+    spectrum = np.abs(np.fft.fftshift(np.fft.ifft(aperture, axis=-2), axes=-2)) * nfft
+    interp = spectrum[..., lo, :] * (1 - weight[:, None]) + spectrum[..., lo + 1, :] * weight[:, None]
+
+    if out is None:
+        out = np.empty(interp.shape, dtype=np.complex64)
+    out[...] = interp
+    return out
+
+
+class AdaptiveBeamformer():
+    """
+    Capon (MVDR) and MUSIC angle spectra from spatial covariance matrices tracked over frames.
+
+    The covariance of every range bin is updated incrementally with exponential averaging,
+    R <- (1 - alpha) R + alpha x x^H, instead of being estimated again from a window of frames. The spectra
+    invert (MVDR) or eigendecompose (MUSIC) the covariances of all range bins in one batched call, after diagonal
+    loading, which also keeps them invertible when virtual antennas share a position. The wall time of the last
+    update and spectrum is kept in timings to decide which range bins are worth it.
+
+    Examples
+    --------
+    >>> capon = AdaptiveBeamformer(cfg_radar["phi"], x_locs, cfg_radar["lm"], num_range=128)
+    >>> capon.update(range_fft_s)          # (antennas, chirps, range), every chirp is a snapshot
+    >>> image = capon.spectrum()           # (phi, range)
+    """
+
+    def __init__(self, phi, x_locs, lm, num_range, method='mvdr', alpha=0.1, loading=1e-2, num_sources=2):
+        """
+        Parameters
+        ----------
+        phi : np.ndarray
+            Azimuth angles in radians (90 degrees is boresight).
+        x_locs : np.ndarray
+            x positions of the antennas.
+        lm : float
+            Wavelength.
+        num_range : int
+            Number of range bins.
+        method : str
+            'mvdr' or 'music'.
+        alpha : float
+            Weight of the newest frame in the exponential average of the covariances.
+        loading : float
+            Diagonal loading, as a fraction of the mean power of the antennas.
+        num_sources : int
+            Dimension of the signal subspace of MUSIC.
+        """
+        if method not in ('mvdr', 'music'):
+            raise ValueError(f"Unknown method {method}, use 'mvdr' or 'music'")
+        self.steering = steering_matrix(phi, x_locs, lm)
+        self.method = method
+        self.alpha = alpha
+        self.loading = loading
+        self.num_sources = num_sources
+        num_ant = self.steering.shape[1]
+        self.covariance = np.zeros((num_range, num_ant, num_ant), dtype=np.complex64)
+        self.num_updates = 0
+        self.timings = {'update': 0., 'spectrum': 0.}
+
+    def update(self, snapshots):
+        """
+        Adds a frame to the covariance of every range bin.
+
+        Parameters
+        ----------
+        snapshots : np.ndarray
+            The range FFT data of shape (num_antennas, num_range), or (num_antennas, num_snapshots, num_range)
+            with e.g. the chirps as snapshots.
+        """
+        start = time.perf_counter()
+        x = np.asarray(snapshots, dtype=np.complex64)
+        if x.ndim == 2:
+            x = x[:, None, :]
+        # Sample covariance of the frame, (range, antennas, antennas)
+        x = np.ascontiguousarray(x.transpose(2, 0, 1))
+        frame_cov = np.matmul(x, x.conj().transpose(0, 2, 1)) / x.shape[-1]
+
+        # The first frame initializes the average so it does not start from zero
+        alpha = 1. if self.num_updates == 0 else self.alpha
+        self.covariance *= 1 - alpha
+        self.covariance += alpha * frame_cov
+        self.num_updates += 1
+        self.timings['update'] = time.perf_counter() - start
+
+    def spectrum(self, range_bins=None, out=None):
+        """
+        Angle spectrum of every range bin.
+
+        Parameters
+        ----------
+        range_bins : np.ndarray
+            Indices of the range bins to compute, the others are zero. All of them if None.
+        out : np.ndarray
+            Optional complex64 array of shape (num_phi, num_range) to write the image into.
+
+        Returns
+        -------
+        sph_pwr : np.ndarray
+            The spectrum (as complex64 like beamform), shape (num_phi, num_range).
+        """
+        start = time.perf_counter()
+        if out is None:
+            out = np.empty((len(self.steering), len(self.covariance)), dtype=np.complex64)
+        cov = self.covariance if range_bins is None else self.covariance[range_bins]
+
+        num_ant = cov.shape[-1]
+        power = np.trace(cov, axis1=-2, axis2=-1).real / num_ant
+        loaded = cov + (self.loading * power + np.finfo(np.float32).tiny)[:, None, None] * np.eye(num_ant)
+
+        steering_t = self.steering.T
+        if self.method == 'mvdr':
+            # 1 / (a^H R^-1 a) for all angles: R^-1 A, then the sum over antennas of conj(A) * (R^-1 A)
+            weighted = np.matmul(np.linalg.inv(loaded), steering_t)
+            denominator = np.einsum('ap,rap->rp', steering_t.conj(), weighted).real
+        else:
+            # 1 / |En^H a|^2, with the noise subspace En of the smallest eigenvalues (eigh sorts them ascending)
+            _, vectors = np.linalg.eigh(loaded)
+            noise = vectors[..., :num_ant - self.num_sources]
+            projection = np.matmul(noise.conj().transpose(0, 2, 1), steering_t)
+            denominator = np.sum(np.abs(projection) ** 2, axis=1)
+        spectrum = 1 / np.maximum(denominator, np.finfo(np.float32).tiny)
+
+        if range_bins is None:
+            out[...] = spectrum.T
+        else:
+            out[...] = 0
+            out[:, range_bins] = spectrum.T
+        self.timings['spectrum'] = time.perf_counter() - start
+        return out
+
+
+# Beamformers selected by cfg_radar["bf_mode"], 'loop' is beamform_2d of task 3
+BEAMFORMERS = {
+    'matmul': beamform,
+    'fft': fft_beamform,
+}
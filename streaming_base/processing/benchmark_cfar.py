@@ -0,0 +1,121 @@
+import argparse
+import time
+
+import numpy as np
+
+from streaming_base.processing.cfar import DETECTORS
+from streaming_base.processing.processing import process_frame_2d
+
+'''
+    Measures the CFAR throughput in maps per second on synthetic power maps, one map per call like the real-time
+    producer and a whole stack per call like the offline replay, then compares the cost and detections of the CFAR
+    methods on scenes with a clutter band. Run from the root of the repo, e.g.
+        python -m streaming_base.processing.benchmark_cfar --maps 500 --shape 180 128 --chunk 64
+'''
+
+
+def synthetic_maps(num_maps, shape, num_targets=5, snr=30., clutter=0., seed=None):
+    """
+    Generates power maps of exponential noise (the power of complex Gaussian noise) with point targets, and
+    optionally a band of clutter over a quarter of the range bins, like the walls of an indoor scene.
+
+    Parameters
+    ----------
+    num_maps : int
+        Number of maps.
+    shape : tuple of int
+        Shape (range, Doppler) of a map.
+    num_targets : int
+        Number of targets per map.
+    snr : float
+        Power of the targets over the mean noise power, in dB.
+    clutter : float
+        Power of the clutter band over the mean noise power, in dB, 0 for no clutter.
+    seed : int
+        Seed of the noise and target positions.
+
+    Returns
+    -------
+    maps : np.ndarray
+        float32 maps of shape (num_maps, range, Doppler).
+    targets : np.ndarray
+        int indices (map, range, Doppler) of the targets, shape (num_maps * num_targets, 3).
+    """
+    rng = np.random.default_rng(seed)
+    maps = rng.exponential(1., (num_maps,) + tuple(shape)).astype(np.float32)
+    targets = np.stack([np.repeat(np.arange(num_maps), num_targets),
+                        rng.integers(0, shape[0], num_maps * num_targets),
+                        rng.integers(0, shape[1], num_maps * num_targets)], axis=-1)
+    if clutter:
+        band = slice(shape[0] // 2, shape[0] // 2 + shape[0] // 4)
+        maps[:, band] *= 10 ** (clutter / 10)
+    maps[tuple(targets.T)] += 10 ** (snr / 10)
+    return maps, targets
+
+
+def measure(func, repeat=3):
+    """
+    Best wall time of a few calls.
+
+    Parameters
+    ----------
+    func : callable
+        Function to time, called without arguments.
+    repeat : int
+        Number of calls.
+
+    Returns
+    -------
+    seconds : float
+        Shortest call.
+    """
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the CFAR throughput on synthetic power maps.")
+    parser.add_argument("--maps", type=int, default=500, help="Number of maps.")
+    parser.add_argument("--shape", type=int, nargs=2, default=(180, 128), help="Shape of a map.")
+    parser.add_argument("--chunk", type=int, default=64, help="Maps per call of the batched CFAR.")
+    parser.add_argument("--clutter", type=float, default=20., help="Clutter power over noise of the method comparison, dB.")
+    args = parser.parse_args()
+
+    cfg_cfar = {
+        "num_train_r": 10,
+        "num_train_d": 10,
+        "num_guard_r": 4,
+        "num_guard_d": 2,
+        "threshold_scale": 1e-3
+    }
+    maps, _ = synthetic_maps(args.maps, args.shape, seed=0)
+
+    def per_map():
+        for power_map in maps:
+            process_frame_2d(power_map, cfg_cfar)
+
+    seconds = measure(per_map)
+    print(f"One map per call:    {args.maps / seconds:8.1f} maps/s")
+    seconds = measure(lambda: process_frame_2d(maps, cfg_cfar, chunk=args.chunk))
+    print(f"{args.chunk} maps per call: {args.maps / seconds:8.1f} maps/s")
+
+    # Detections of every method on cluttered scenes, hits are detections on a target cell
+    maps, targets = synthetic_maps(args.maps, args.shape, clutter=args.clutter, seed=1)
+    print(f"\n{'method':>6} {'maps/s':>8} {'ms/map':>7} {'dets/map':>9} {'hits':>6} {'false/map':>10}")
+    for method in DETECTORS:
+        cfg = dict(cfg_cfar, method=method)
+        start = time.perf_counter()
+        dets = process_frame_2d(maps, cfg, chunk=args.chunk)
+        seconds = time.perf_counter() - start
+        num_dets = np.count_nonzero(dets)
+        hits = np.count_nonzero(dets[tuple(targets.T)]) / len(targets)
+        print(f"{method:>6} {args.maps / seconds:8.1f} {seconds / args.maps * 1e3:7.2f} {num_dets / args.maps:9.1f} "
+              f"{hits:6.1%} {(num_dets - hits * len(targets)) / args.maps:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import numpy as np
+
+
+class SlowTimeBuffer():
+    """
+    Circular history of the last frames (slow time), with O(1) appends and zero-copy views.
+
+    Every frame is written twice, at the write index and num_frames further, in a buffer of twice the length. The
+    last n frames, oldest first, are then always the contiguous slice ending num_frames after the write index, so
+    they are returned as a view instead of shifting the whole history every frame.
+
+    Examples
+    --------
+    >>> history = SlowTimeBuffer(1000, (128,))
+    >>> history.append(range_fft)
+    >>> history.view().shape               # all frames, oldest first
+    (1000, 128)
+    >>> phase = np.angle(history.column(max_idx))
+    """
+
+    def __init__(self, num_frames, frame_shape, dtype=np.complex64):
+        """
+        Parameters
+        ----------
+        num_frames : int
+            Number of frames kept.
+        frame_shape : tuple of int
+            Shape of a frame, e.g. (samples,) or (antennas, chirps, samples).
+        dtype : np.dtype
+            Data type of the history.
+        """
+        self.num_frames = num_frames
+        self.frame_shape = tuple(frame_shape)
+        self._data = np.zeros((2 * num_frames,) + self.frame_shape, dtype=dtype)
+        # Slot of the next frame, in [0, num_frames)
+        self.index = 0
+        # Number of frames appended since the start
+        self.count = 0
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    def __len__(self):
+        """Number of valid frames, the history is zero before the first num_frames appends."""
+        return min(self.count, self.num_frames)
+
+    def append(self, frame):
+        """
+        Appends a frame, overwriting the oldest one once the history is full.
+
+        Parameters
+        ----------
+        frame : np.ndarray
+            Frame of shape frame_shape (or broadcastable to it).
+        """
+        self._data[self.index] = frame
+        self._data[self.index + self.num_frames] = frame
+        self.index = (self.index + 1) % self.num_frames
+        self.count += 1
+
+    def view(self, n=None):
+        """
+        Last frames, oldest first, as a contiguous view valid until the next append.
+
+        Parameters
+        ----------
+        n : int
+            Number of frames, defaults to num_frames.
+
+        Returns
+        -------
+        frames : np.ndarray
+            View of shape (n,) + frame_shape.
+        """
+        n = self.num_frames if n is None else n
+        if not 0 <= n <= self.num_frames:
+            raise ValueError(f"Cannot view {n} frames of a history of {self.num_frames}")
+        end = self.index + self.num_frames
+        return self._data[end - n:end]
+
+    def column(self, idx, n=None):
+        """
+        Slow-time signal of one cell of the frames (e.g. a range bin) over the last frames, oldest first.
+
+        Parameters
+        ----------
+        idx : int or tuple
+            Index within a frame.
+        n : int
+            Number of frames, defaults to num_frames.
+
+        Returns
+        -------
+        column : np.ndarray
+            Strided view of shape (n,) (plus the remaining frame axes for partial indices).
+        """
+        idx = idx if isinstance(idx, tuple) else (idx,)
+        return self.view(n)[(slice(None),) + idx]
@@ -0,0 +1,647 @@
+from functools import lru_cache
+from math import lgamma, log
+
+import numpy as np
+from scipy import ndimage
+
+# Range of power below the strongest cell resolved by the rank levels of OS-CFAR
+OS_DYNAMIC_RANGE = 1e8
+
+
+@lru_cache(maxsize=64)
+def ca_params(num_train_range, num_train_doppler, num_guard_range, num_guard_doppler, rate_fa):
+    """
+    Window geometry and threshold multiplier of a cell-averaging CFAR, computed once per parameter set.
+
+    Parameters
+    ----------
+    num_train_range : int
+        # of training cells on each side in range
+    num_train_doppler : int
+        # of training cells on each side in Doppler
+    num_guard_range : int
+        # of guard cells on each side in range
+    num_guard_doppler : int
+        # of guard cells on each side in Doppler
+    rate_fa : float
+        Desired probability of false alarm
+
+    Returns
+    -------
+    win : tuple of int
+        Half sizes (range, Doppler) of the full window.
+    guard : tuple of int
+        Half sizes (range, Doppler) of the guard region, which includes the CUT.
+    num_train : int
+        Number of training cells.
+    alpha : float
+        Threshold multiplier of the noise level.
+    """
+    win = (num_train_range + num_guard_range, num_train_doppler + num_guard_doppler)
+    guard = (num_guard_range, num_guard_doppler)
+    num_train = (2*win[0]+1)*(2*win[1]+1) - (2*guard[0]+1)*(2*guard[1]+1)
+    alpha = num_train * (rate_fa**(-1.0/num_train) - 1.0)
+    return win, guard, num_train, alpha
+
+
+def _solve_alpha(pfa, rate_fa):
+    """
+    Solves pfa(alpha) = rate_fa by bisection, pfa decreasing from 1 at alpha = 0.
+
+    Parameters
+    ----------
+    pfa : callable
+        Probability of false alarm as a function of the threshold multiplier.
+    rate_fa : float
+        Desired probability of false alarm
+
+    Returns
+    -------
+    alpha : float
+        Threshold multiplier.
+    """
+    lo, hi = 0., 1.
+    while pfa(hi) > rate_fa:
+        lo, hi = hi, hi * 2
+    for _ in range(100):
+        mid = (lo + hi) / 2
+        if pfa(mid) > rate_fa:
+            lo = mid
+        else:
+            hi = mid
+    return hi
+
+
+@lru_cache(maxsize=64)
+def go_so_params(num_train_range, num_train_doppler, num_guard_range, num_guard_doppler, rate_fa, method):
+    """
+    Window geometry and threshold multiplier of a greatest-of or smallest-of CFAR, computed once per parameter set.
+
+    The training cells are split into the half before and the half after the cell under test in range. The
+    threshold is alpha times the greater (GO) or smaller (SO) sum of the two halves, with alpha from the false alarm
+    probability of exponential noise (Gandhi and Kassam, 1988).
+
+    Parameters
+    ----------
+    num_train_range : int
+        # of training cells on each side in range
+    num_train_doppler : int
+        # of training cells on each side in Doppler
+    num_guard_range : int
+        # of guard cells on each side in range
+    num_guard_doppler : int
+        # of guard cells on each side in Doppler
+    rate_fa : float
+        Desired probability of false alarm
+    method : str
+        'go' or 'so'.
+
+    Returns
+    -------
+    win : tuple of int
+        Half sizes (range, Doppler) of the full window.
+    guard : tuple of int
+        Half sizes (range, Doppler) of the guard region, which includes the CUT.
+    num_half : int
+        Number of training cells of each half.
+    alpha : float
+        Threshold multiplier of the sum of a half.
+    """
+    win = (num_train_range + num_guard_range, num_train_doppler + num_guard_doppler)
+    guard = (num_guard_range, num_guard_doppler)
+    n = win[0]*(2*win[1]+1) - guard[0]*(2*guard[1]+1)
+
+    def pfa_so(alpha):
+        k = np.arange(n)
+        log_terms = (np.array([lgamma(n + i) - lgamma(i + 1) for i in k]) - lgamma(n)
+                     - (n + k) * log(2 + alpha))
+        return 2 * np.exp(log_terms).sum()
+
+    if method == 'so':
+        pfa = pfa_so
+    else:
+        def pfa(alpha):
+            return 2 * (1 + alpha) ** -n - pfa_so(alpha)
+    return win, guard, n, _solve_alpha(pfa, rate_fa)
+
+
+@lru_cache(maxsize=64)
+def os_params(num_train_range, num_train_doppler, num_guard_range, num_guard_doppler, rate_fa, rank):
+    """
+    Window geometry and threshold multiplier of an ordered-statistic CFAR, computed once per parameter set.
+
+    Parameters
+    ----------
+    num_train_range : int
+        # of training cells on each side in range
+    num_train_doppler : int
+        # of training cells on each side in Doppler
+    num_guard_range : int
+        # of guard cells on each side in range
+    num_guard_doppler : int
+        # of guard cells on each side in Doppler
+    rate_fa : float
+        Desired probability of false alarm
+    rank : float
+        Order statistic used as noise level, as a fraction of the number of training cells.
+
+    Returns
+    -------
+    win : tuple of int
+        Half sizes (range, Doppler) of the full window.
+    guard : tuple of int
+        Half sizes (range, Doppler) of the guard region, which includes the CUT.
+    k : int
+        Rank (1 is the smallest) of the training cell used as noise level.
+    alpha : float
+        Threshold multiplier of that cell.
+    """
+    win, guard, num_train, _ = ca_params(num_train_range, num_train_doppler, num_guard_range, num_guard_doppler,
+                                         rate_fa)
+    k = min(max(int(round(rank * num_train)), 1), num_train)
+    i = np.arange(k)
+
+    def pfa(alpha):
+        return np.prod((num_train - i) / (num_train - i + alpha))
+    return win, guard, k, _solve_alpha(pfa, rate_fa)
+
+
+def box_sum(x, half, axis, wrap=False):
+    """
+    Sum over a sliding window along one axis with a cumulative sum, O(1) per cell.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        float64 data.
+    half : int or tuple of int
+        Half size of a centered window of 2*half+1 cells, or the (first, last) offsets of the window from the cell.
+        An empty window (first > last) sums to zero.
+    axis : int
+        Axis to sum along.
+    wrap : bool
+        Wrap the window around the edges (circular), instead of filling with zeros.
+
+    Returns
+    -------
+    sums : np.ndarray
+        Window sums, same shape as x.
+    """
+    first, last = (-half, half) if np.ndim(half) == 0 else half
+    before, after = max(-first, 0), max(last, 0)
+
+    x = np.moveaxis(x, axis, -1)
+    n = x.shape[-1]
+    pad = [(0, 0)] * (x.ndim - 1)
+    if wrap:
+        x = np.pad(x, pad + [(before, after)], mode='wrap')
+        padded = np.pad(x, pad + [(1, 0)])
+    else:
+        padded = np.pad(x, pad + [(before + 1, after)])
+    c = np.cumsum(padded, axis=-1)
+    # x[i] is padded[i + before + 1], c[j] sums padded[:j + 1]
+    sums = c[..., last + before + 1:last + before + 1 + n] - c[..., first + before:first + before + n]
+    return np.moveaxis(sums, -1, axis)
+
+
+def window_sum(power_map, half, wrap_doppler=False):
+    """
+    Sum over a (2*half[0]+1) x (2*half[1]+1) window around every cell of the last two axes, i.e. an integral image
+    lookup done one axis at a time. Cells outside the map count as zero, or wrap around on the Doppler axis.
+
+    Parameters
+    ----------
+    power_map : np.ndarray
+        Map of shape (..., range, Doppler).
+    half : tuple
+        Half sizes (range, Doppler) of the window, each an int or a (first, last) pair of offsets, see box_sum.
+    wrap_doppler : bool
+        Wrap the window around the Doppler axis.
+
+    Returns
+    -------
+    sums : np.ndarray
+        float64 window sums, same shape as power_map.
+    """
+    sums = box_sum(np.asarray(power_map, dtype=np.float64), half[0], -2)
+    return box_sum(sums, half[1], -1, wrap=wrap_doppler)
+
+
+def cfar_ca(power_map,
+            num_train_range: int = 10,
+            num_train_doppler: int = 8,
+            num_guard_range: int = 2,
+            num_guard_doppler: int = 2,
+            rate_fa: float = 1e-5,
+            wrap_doppler: bool = False,
+            return_noise: bool = False,
+            edge_counts: bool = False):
+    """
+    2D Cell-Averaging CFAR on a (range × Doppler) power map, or a stack of them, with summed-area window sums.
+
+    The cost does not depend on the window size. On the zero-fill boundary the detections are the same as with
+    two convolve2d passes of the full and guard windows.
+
+    Parameters
+    ----------
+    power_map : np.ndarray
+        The incoherent power map |X|^2 over (range, Doppler), optionally with leading batch axes.
+    num_train_range : int
+        # of training cells on each side in range
+    num_train_doppler : int
+        # of training cells on each side in Doppler
+    num_guard_range : int
+        # of guard cells on each side in range
+    num_guard_doppler : int
+        # of guard cells on each side in Doppler
+    rate_fa : float
+        Desired probability of false alarm
+    wrap_doppler : bool
+        Wrap the windows around the Doppler axis, whose edges are adjacent after the FFT.
+    return_noise : bool
+        Also return the noise level estimated around every cell, e.g. for the SNR of the detections.
+    edge_counts : bool
+        Average over the training cells inside the map, with the threshold multiplier of their number, instead
+        of counting the cells outside the map as zeros.
+
+    Returns
+    -------
+    detection_map : np.ndarray
+        power_map where it exceeds the CFAR threshold, 0 elsewhere.
+    noise_level : np.ndarray
+        Mean noise power around every cell, only if return_noise is set.
+    """
+    win, guard, num_train, alpha = ca_params(num_train_range, num_train_doppler,
+                                             num_guard_range, num_guard_doppler, rate_fa)
+
+    # training‐cell sum = window minus guard (which includes the CUT)
+    sum_train = window_sum(power_map, win, wrap_doppler) - window_sum(power_map, guard, wrap_doppler)
+    if edge_counts:
+        ones = np.ones(np.shape(power_map)[-2:])
+        num_train = np.maximum(window_sum(ones, win, wrap_doppler) - window_sum(ones, guard, wrap_doppler), 1)
+        alpha = num_train * (rate_fa**(-1.0/num_train) - 1.0)
+    noise_level = sum_train / num_train
+    threshold = alpha * noise_level
+
+    detection_map = np.where(power_map > threshold, power_map, 0)
+    return (detection_map, noise_level) if return_noise else detection_map
+
+
+def cfar_go(power_map,
+            num_train_range: int = 10,
+            num_train_doppler: int = 8,
+            num_guard_range: int = 2,
+            num_guard_doppler: int = 2,
+            rate_fa: float = 1e-5,
+            wrap_doppler: bool = False,
+            return_noise: bool = False,
+            edge_counts: bool = False):
+    """
+    2D Greatest-Of CFAR: the noise level is the greater of the training halves before and after the cell in
+    range, which avoids false alarms at clutter edges. Same arguments, zero-fill boundary and outputs as cfar_ca;
+    with edge_counts the halves are averaged over their cells inside the map, and a half entirely outside the map
+    is replaced by the other one.
+    """
+    return _cfar_go_so(power_map, num_train_range, num_train_doppler, num_guard_range, num_guard_doppler, rate_fa,
+                       wrap_doppler, 'go', return_noise, edge_counts)
+
+
+def cfar_so(power_map,
+            num_train_range: int = 10,
+            num_train_doppler: int = 8,
+            num_guard_range: int = 2,
+            num_guard_doppler: int = 2,
+            rate_fa: float = 1e-5,
+            wrap_doppler: bool = False,
+            return_noise: bool = False,
+            edge_counts: bool = False):
+    """
+    2D Smallest-Of CFAR: the noise level is the smaller of the training halves before and after the cell in
+    range, which keeps closely spaced targets from masking each other. Same arguments, zero-fill boundary and
+    outputs as cfar_ca; edge_counts as cfar_go.
+    """
+    return _cfar_go_so(power_map, num_train_range, num_train_doppler, num_guard_range, num_guard_doppler, rate_fa,
+                       wrap_doppler, 'so', return_noise, edge_counts)
+
+
+def _cfar_go_so(power_map, num_train_range, num_train_doppler, num_guard_range, num_guard_doppler, rate_fa,
+                wrap_doppler, method, return_noise, edge_counts=False):
+    """
+    Helper function of cfar_go and cfar_so.
+    """
+    win, guard, num_half, alpha = go_so_params(num_train_range, num_train_doppler, num_guard_range, num_guard_doppler,
+                                        rate_fa, method)
+
+    # Window minus guard, restricted to negative and positive range offsets
+    sum_before = (window_sum(power_map, ((-win[0], -1), win[1]), wrap_doppler)
+                  - window_sum(power_map, ((-guard[0], -1), guard[1]), wrap_doppler))
+    sum_after = (window_sum(power_map, ((1, win[0]), win[1]), wrap_doppler)
+                 - window_sum(power_map, ((1, guard[0]), guard[1]), wrap_doppler))
+    if edge_counts:
+        # Sums of full halves from the mean of their cells inside the map, the other half if none is inside
+        ones = np.ones(np.shape(power_map)[-2:])
+        count_before = (window_sum(ones, ((-win[0], -1), win[1]), wrap_doppler)
+                        - window_sum(ones, ((-guard[0], -1), guard[1]), wrap_doppler))
+        count_after = (window_sum(ones, ((1, win[0]), win[1]), wrap_doppler)
+                       - window_sum(ones, ((1, guard[0]), guard[1]), wrap_doppler))
+        sum_before = num_half * sum_before / np.maximum(count_before, 1)
+        sum_after = num_half * sum_after / np.maximum(count_after, 1)
+        sum_before, sum_after = (np.where(count_before > 0, sum_before, sum_after),
+                                 np.where(count_after > 0, sum_after, sum_before))
+    noise_sum = np.maximum(sum_before, sum_after) if method == 'go' else np.minimum(sum_before, sum_after)
+    threshold = alpha * noise_sum
+
+    detection_map = np.where(power_map > threshold, power_map, 0)
+    return (detection_map, noise_sum / num_half) if return_noise else detection_map
+
+
+def sliding_rank(power_map, win, guard, k, wrap_doppler=False, levels=32, exact=False):
+    """
+    k-th smallest value of the training ring (window minus guard) around every cell of the last two axes.
+
+    Instead of sorting the ring of every cell, the power is quantized on log-spaced levels and the number of ring
+    cells below every level is counted with integral images, so the cost is O(cells * levels) whatever the window
+    size. The value is interpolated within the level where the count reaches k, which is accurate to a fraction of
+    the level spacing (about 0.3 dB with 32 levels over the OS_DYNAMIC_RANGE below the strongest cell).
+    The maps are extended by mirroring in range, and in Doppler unless wrap_doppler is set, since zeros outside
+    the map would drag the order statistic down.
+
+    Parameters
+    ----------
+    power_map : np.ndarray
+        Maps of shape (..., range, Doppler).
+    win : tuple of int
+        Half sizes (range, Doppler) of the full window.
+    guard : tuple of int
+        Half sizes (range, Doppler) of the guard region.
+    k : int
+        Rank, 1 is the smallest.
+    wrap_doppler : bool
+        Wrap the window around the Doppler axis.
+    levels : int
+        Number of quantization levels, memory is about 2 bytes per cell and level.
+    exact : bool
+        Use scipy.ndimage.rank_filter instead, exact but about 15x slower with the default window.
+
+    Returns
+    -------
+    ranked : np.ndarray
+        float64 k-th smallest ring value, same shape as power_map.
+    """
+    power_map = np.asarray(power_map)
+    num_range, num_doppler = power_map.shape[-2:]
+    pad = [(0, 0)] * (power_map.ndim - 2) + [(win[0], win[0]), (win[1], win[1])]
+    padded = np.pad(power_map, pad[:-1] + [(0, 0)], mode='symmetric')
+    padded = np.pad(padded, [(0, 0)] * (power_map.ndim - 1) + [pad[-1]], mode='wrap' if wrap_doppler else 'symmetric')
+
+    if exact:
+        footprint = np.ones((2*win[0]+1, 2*win[1]+1), dtype=bool)
+        footprint[win[0]-guard[0]:win[0]+guard[0]+1, win[1]-guard[1]:win[1]+guard[1]+1] = False
+        footprint = footprint.reshape((1,) * (power_map.ndim - 2) + footprint.shape)
+        ranked = ndimage.rank_filter(padded.astype(np.float64), k - 1, footprint=footprint, mode='constant')
+        return ranked[..., win[0]:win[0]+num_range, win[1]:win[1]+num_doppler]
+
+    # Level of every cell, per map: cell i is counted at all levels >= q[i], -1 below the lowest
+    log_power = np.log(np.maximum(padded, np.finfo(np.float32).tiny))
+    top = log_power.max(axis=(-2, -1), keepdims=True)
+    bottom = np.maximum(log_power.min(axis=(-2, -1), keepdims=True), top - np.log(OS_DYNAMIC_RANGE))
+    step = np.maximum(top - bottom, 1e-12) / levels
+    q = np.clip(np.floor((log_power - bottom) / step), -1, levels - 1).astype(np.int16)
+
+    # Integral images of the indicators q <= level. uint16 wraps around, but differences of it are exact as long
+    # as the counts of a rectangle fit, i.e. windows below 65536 cells
+    below = q[..., None, :, :] <= np.arange(levels, dtype=np.int16)[:, None, None]
+    integral = np.zeros(below.shape[:-2] + (below.shape[-2] + 1, below.shape[-1] + 1), dtype=np.uint16)
+    np.cumsum(below, axis=-2, dtype=np.uint16, out=integral[..., 1:, 1:])
+    np.cumsum(integral[..., 1:, 1:], axis=-1, dtype=np.uint16, out=integral[..., 1:, 1:])
+
+    def rect(half):
+        r0, r1 = win[0] - half[0], win[0] + half[0] + 1
+        d0, d1 = win[1] - half[1], win[1] + half[1] + 1
+        return (integral[..., r1:r1+num_range, d1:d1+num_doppler] - integral[..., r0:r0+num_range, d1:d1+num_doppler]
+                - integral[..., r1:r1+num_range, d0:d0+num_doppler] + integral[..., r0:r0+num_range, d0:d0+num_doppler])
+    counts = (rect(win) - rect(guard)).astype(np.int32)
+
+    # First level where the count reaches k, interpolated between its count and the count of the level below
+    level = np.minimum((counts < k).sum(axis=-3), levels - 1)
+    count_hi = np.take_along_axis(counts, level[..., None, :, :], axis=-3)[..., 0, :, :]
+    count_lo = np.take_along_axis(counts, np.maximum(level - 1, 0)[..., None, :, :], axis=-3)[..., 0, :, :]
+    count_lo = np.where(level > 0, count_lo, 0)
+    frac = np.clip((k - count_lo) / np.maximum(count_hi - count_lo, 1), 0, 1)
+    return np.exp(bottom + (level + frac) * step)
+
+
+def cfar_os(power_map,
+            num_train_range: int = 10,
+            num_train_doppler: int = 8,
+            num_guard_range: int = 2,
+            num_guard_doppler: int = 2,
+            rate_fa: float = 1e-5,
+            wrap_doppler: bool = False,
+            rank: float = 0.75,
+            levels: int = 32,
+            exact: bool = False,
+            return_noise: bool = False):
+    """
+    2D Ordered-Statistic CFAR: the noise level is the k-th smallest training cell, which is robust to clutter and
+    to other targets in the window. Arguments as cfar_ca, plus
+
+    Parameters
+    ----------
+    rank : float
+        Order statistic used as noise level, as a fraction of the number of training cells.
+    levels : int
+        Number of quantization levels of the rank selection, see sliding_rank.
+    exact : bool
+        Select the rank exactly with scipy.ndimage.rank_filter, much slower.
+    return_noise : bool
+        Also return the noise level estimated around every cell.
+
+    Returns
+    -------
+    detection_map : np.ndarray
+        power_map where it exceeds the CFAR threshold, 0 elsewhere.
+    noise_level : np.ndarray
+        Mean noise power around every cell, only if return_noise is set.
+    """
+    win, guard, k, alpha = os_params(num_train_range, num_train_doppler, num_guard_range, num_guard_doppler,
+                                     rate_fa, rank)
+    ranked = sliding_rank(power_map, win, guard, k, wrap_doppler, levels, exact)
+    threshold = alpha * ranked
+
+    detection_map = np.where(power_map > threshold, power_map, 0)
+    if not return_noise:
+        return detection_map
+    # Expected k-th smallest of num_train exponential cells, in units of their mean
+    num_train = ca_params(num_train_range, num_train_doppler, num_guard_range, num_guard_doppler, rate_fa)[2]
+    return detection_map, ranked / np.sum(1 / np.arange(num_train - k + 1, num_train + 1))
+
+
+# Detectors selected by cfg_cfar['method'], they share the arguments of cfar_ca
+DETECTORS = {
+    'ca': cfar_ca,
+    'go': cfar_go,
+    'so': cfar_so,
+    'os': cfar_os,
+}
+
+
+def apply_chunked(detector, power_maps, chunk=None, **kwargs):
+    """
+    Runs a detector on a stack of maps, chunk by chunk along the flattened leading axes to bound the memory of
+    its intermediate arrays.
+
+    Parameters
+    ----------
+    detector : callable
+        Detector taking maps of shape (..., range, Doppler) as first argument, e.g. cfar_ca.
+    power_maps : np.ndarray
+        Maps of shape (..., range, Doppler).
+    chunk : int
+        Number of maps per call, all at once if None.
+    kwargs : dict
+        Extra arguments of the detector.
+
+    Returns
+    -------
+    detection_maps : np.ndarray
+        Output of the detector for every map, same shape as power_maps.
+    """
+    power_maps = np.asarray(power_maps)
+    if chunk is None or power_maps.ndim < 3:
+        return detector(power_maps, **kwargs)
+
+    maps = power_maps.reshape((-1,) + power_maps.shape[-2:])
+    out = None
+    for start in range(0, len(maps), chunk):
+        dets = detector(maps[start:start + chunk], **kwargs)
+        if out is None:
+            out = np.empty(maps.shape, dtype=dets.dtype)
+        out[start:start + chunk] = dets
+    return out.reshape(power_maps.shape)
+
+
+@lru_cache(maxsize=16)
+def detection_dtype(axes=('range', 'doppler')):
+    """
+    Structured dtype of the detections of detect_points.
+
+    Parameters
+    ----------
+    axes : tuple of str
+        Names of the two axes of the maps.
+
+    Returns
+    -------
+    dtype : np.dtype
+        Fields frame (index of the map in the stack), the bin along each axis, power, snr (dB) and the bin along
+        each axis interpolated between cells (<axis>_interp).
+    """
+    return np.dtype([('frame', np.int32), (axes[0], np.int32), (axes[1], np.int32),
+                     ('power', np.float32), ('snr', np.float32),
+                     (axes[0] + '_interp', np.float32), (axes[1] + '_interp', np.float32)])
+
+
+def extract_detections(power_map, detection_map, noise_level, axes=('range', 'doppler'), peak_size=3,
+                       wrap_doppler=False):
+    """
+    Turns dense detection maps into a list of detections, keeping only the local maxima of the power.
+
+    A detected cell is kept if it is the strongest of the peak_size x peak_size cells around it, so a target
+    spread over a few cells is reported once. Its position is refined by fitting a parabola to the log power of
+    the cell and its two neighbours along every axis (a Gaussian peak).
+
+    Parameters
+    ----------
+    power_map : np.ndarray
+        Maps of shape (..., range, Doppler).
+    detection_map : np.ndarray
+        Output of a detector, non zero on detected cells.
+    noise_level : np.ndarray
+        Noise level around every cell, see the return_noise option of the detectors.
+    axes : tuple of str
+        Names of the two axes of the maps, used as field names.
+    peak_size : int
+        Size of the neighbourhood of the local maxima, 1 keeps every detected cell.
+    wrap_doppler : bool
+        The Doppler axis wraps around, for the local maxima and the interpolation.
+
+    Returns
+    -------
+    detections : np.ndarray
+        Structured array of dtype detection_dtype(axes), ordered by frame then bin.
+    """
+    power_map = np.asarray(power_map)
+    shape = power_map.shape[-2:]
+    power = power_map.reshape((-1,) + shape)
+    mask = (detection_map != 0).reshape(power.shape)
+
+    if peak_size > 1:
+        modes = ['nearest', 'nearest', 'wrap' if wrap_doppler else 'nearest']
+        mask &= power >= ndimage.maximum_filter(power, size=(1, peak_size, peak_size), mode=modes)
+
+    frame, idx0, idx1 = np.nonzero(mask)
+    detections = np.empty(len(frame), dtype=detection_dtype(tuple(axes)))
+    detections['frame'] = frame
+    detections[axes[0]] = idx0
+    detections[axes[1]] = idx1
+    detections['power'] = power[frame, idx0, idx1]
+    noise = np.asarray(noise_level).reshape(power.shape)[frame, idx0, idx1]
+    detections['snr'] = 10 * np.log10(detections['power'] / np.maximum(noise, np.finfo(np.float32).tiny))
+
+    log_power = np.log(np.maximum(power, np.finfo(np.float32).tiny))
+    center = log_power[frame, idx0, idx1]
+    for axis, idx, wrap in ((0, idx0, False), (1, idx1, wrap_doppler)):
+        n = shape[axis]
+        if wrap:
+            lo, hi, valid = (idx - 1) % n, (idx + 1) % n, np.ones(len(idx), dtype=bool)
+        else:
+            lo, hi = np.maximum(idx - 1, 0), np.minimum(idx + 1, n - 1)
+            valid = (idx > 0) & (idx < n - 1)
+        neighbours = [(frame, lo, idx1) if axis == 0 else (frame, idx0, lo),
+                      (frame, hi, idx1) if axis == 0 else (frame, idx0, hi)]
+        before, after = log_power[neighbours[0]], log_power[neighbours[1]]
+        curvature = before - 2 * center + after
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = np.where(valid & (curvature < 0), 0.5 * (before - after) / curvature, 0)
+        detections[axes[axis] + '_interp'] = idx + np.clip(delta, -0.5, 0.5)
+    return detections
+
+
+def detect_points(detector, power_maps, chunk=None, axes=('range', 'doppler'), peak_size=3, **kwargs):
+    """
+    Runs a detector on a map, or a stack of maps chunk by chunk, and returns the list of detections instead of
+    dense maps, see extract_detections.
+
+    Parameters
+    ----------
+    detector : callable
+        Detector of DETECTORS.
+    power_maps : np.ndarray
+        Maps of shape (..., range, Doppler).
+    chunk : int
+        Number of maps per call, all at once if None.
+    axes : tuple of str
+        Names of the two axes of the maps, used as field names.
+    peak_size : int
+        Size of the neighbourhood of the local maxima, 1 keeps every detected cell.
+    kwargs : dict
+        Extra arguments of the detector.
+
+    Returns
+    -------
+    detections : np.ndarray
+        Structured array of dtype detection_dtype(axes), frame indexes the flattened leading axes.
+    """
+    power_maps = np.asarray(power_maps)
+    maps = power_maps.reshape((-1,) + power_maps.shape[-2:])
+    chunk = chunk or len(maps)
+
+    detections = []
+    for start in range(0, len(maps), chunk):
+        dets, noise_level = detector(maps[start:start + chunk], return_noise=True, **kwargs)
+        points = extract_detections(maps[start:start + chunk], dets, noise_level, axes, peak_size,
+                                    kwargs.get('wrap_doppler', False))
+        points['frame'] += start
+        detections.append(points)
+    return np.concatenate(detections) if detections else np.empty(0, dtype=detection_dtype(tuple(axes)))
@@ -0,0 +1,166 @@
+from functools import lru_cache
+from itertools import product
+
+import numpy as np
+
+# Fields of the points returned by point_cloud
+POINT_DTYPE = np.dtype([('x', np.float32), ('y', np.float32), ('z', np.float32), ('intensity', np.float32),
+                        ('range', np.int32), ('azimuth', np.int32), ('elevation', np.int32)])
+
+
+def steering_tensor(az, el, x_pos, z_pos, lm):
+    """
+    Steering vectors of every (azimuth, elevation) pair for a planar virtual array, computed once per
+    configuration and cached. They undo the phase exp(-j 2pi/lm (x cos(az) cos(el) + z sin(el))) of a target,
+    the 2D extension of the h_phi of the README.
+
+    Parameters
+    ----------
+    az : np.ndarray
+        Azimuth angles in radians (90 degrees is boresight).
+    el : np.ndarray
+        Elevation angles in radians (0 is the horizon).
+    x_pos : np.ndarray
+        x positions of the virtual antennas, e.g. from streaming_base.utils.utils.get_ant_static_2d.
+    z_pos : np.ndarray
+        z (vertical) positions of the virtual antennas.
+    lm : float
+        Wavelength.
+
+    Returns
+    -------
+    steering : np.ndarray
+        Read-only complex64 array of shape (num_antennas, num_az * num_el), transposed for the product with
+        (range, antennas) data.
+    """
+    arrays = [np.ascontiguousarray(a, dtype=np.float64).ravel() for a in (az, el, x_pos, z_pos)]
+    return _steering_tensor(*(a.tobytes() for a in arrays), float(lm))
+
+
+@lru_cache(maxsize=8)
+def _steering_tensor(az_bytes, el_bytes, x_bytes, z_bytes, lm):
+    """
+    Helper function of steering_tensor, cached on the bytes of the angles and positions.
+    """
+    az, el, x_pos, z_pos = (np.frombuffer(b, dtype=np.float64) for b in (az_bytes, el_bytes, x_bytes, z_bytes))
+    # Path difference of every (az, el, antenna)
+    path = (np.cos(az)[:, None, None] * np.cos(el)[None, :, None] * x_pos[None, None, :]
+            + np.sin(el)[None, :, None] * z_pos[None, None, :])
+    steering = np.exp(1j * 2 * np.pi / lm * path).astype(np.complex64)
+    steering = np.ascontiguousarray(steering.reshape(-1, len(x_pos)).T)
+    steering.flags.writeable = False
+    return steering
+
+
+def order_by_chirp(x_pos, z_pos, tx_order, num_rx):
+    """
+    Reorders virtual antenna positions given per physical transmitter (tx major, like get_ant_static_2d) into the
+    order of the chirps of a frame, the order of the virtual antennas of the organized ADC data.
+
+    Parameters
+    ----------
+    x_pos : np.ndarray
+        x positions of the virtual antennas, num_rx per physical transmitter in transmitter order.
+    z_pos : np.ndarray
+        z positions of the virtual antennas.
+    tx_order : sequence of int
+        Physical transmitter of every chirp slot, e.g. (1, 0, 2) for the lua configs of the repo which send TX1
+        first, then TX0 and TX2.
+    num_rx : int
+        Number of receivers.
+
+    Returns
+    -------
+    x_pos, z_pos : np.ndarray
+        Positions of the virtual antennas in chirp order.
+    """
+    idx = (np.asarray(tx_order)[:, None] * num_rx + np.arange(num_rx)[None, :]).ravel()
+    return np.asarray(x_pos)[idx], np.asarray(z_pos)[idx]
+
+
+def image_3d(beat_freq_data, az, el, x_pos, z_pos, lm, out=None):
+    """
+    Range-azimuth-elevation image of a planar virtual array, one complex64 matrix product for all voxels.
+
+    Parameters
+    ----------
+    beat_freq_data : np.ndarray
+        The range FFT data, of shape (num_antennas, num_range) or with leading frame axes, antennas ordered like
+        x_pos and z_pos. Organized ADC data is in chirp order (chirp slot major, then receiver), so positions from
+        get_ant_static_2d, which are in physical transmitter order, must first go through order_by_chirp.
+    az : np.ndarray
+        Azimuth angles in radians.
+    el : np.ndarray
+        Elevation angles in radians.
+    x_pos : np.ndarray
+        x positions of the virtual antennas.
+    z_pos : np.ndarray
+        z positions of the virtual antennas.
+    lm : float
+        Wavelength.
+    out : np.ndarray
+        Optional complex64 array of shape (..., num_range, num_az, num_el) to write the image into.
+
+    Returns
+    -------
+    voxels : np.ndarray
+        Magnitude of the beamformed signal (as complex64 like beamform), shape (..., num_range, num_az, num_el).
+    """
+    steering = steering_tensor(az, el, x_pos, z_pos, lm)
+    data = np.asarray(beat_freq_data, dtype=np.complex64)
+    shape = data.shape[:-2] + (data.shape[-1], len(az), len(el))
+
+    flat = None if out is None else out.reshape(shape[:-2] + (-1,))
+    flat = np.matmul(np.swapaxes(data, -1, -2), steering, out=flat)
+    np.abs(flat, out=flat)
+    return flat.reshape(shape)
+
+
+def point_cloud(voxels, ranges, az, el, threshold=0.3, peak_size=3):
+    """
+    Points of the voxels above a fraction of the strongest one, optionally only the local maxima.
+
+    Parameters
+    ----------
+    voxels : np.ndarray
+        Magnitude image of shape (num_range, num_az, num_el), see image_3d.
+    ranges : np.ndarray
+        Range of every range bin, in the unit of the output coordinates.
+    az : np.ndarray
+        Azimuth angles in radians (90 degrees is boresight).
+    el : np.ndarray
+        Elevation angles in radians.
+    threshold : float
+        Fraction of the strongest voxel a point must exceed.
+    peak_size : int
+        Size of the neighbourhood of the local maxima, 1 keeps every voxel above the threshold.
+
+    Returns
+    -------
+    points : np.ndarray
+        Structured array of dtype POINT_DTYPE: x along the array, y the boresight, z up, the intensity and the
+        bins of every point.
+    """
+    voxels = np.abs(voxels)
+    r_idx, az_idx, el_idx = np.nonzero(voxels > threshold * voxels.max())
+
+    # Compare the few candidates with their neighbours, rather than filtering the whole cube
+    if peak_size > 1:
+        half = peak_size // 2
+        padded = np.pad(voxels, half, mode='constant', constant_values=-np.inf)
+        values = voxels[r_idx, az_idx, el_idx]
+        keep = np.ones(len(values), dtype=bool)
+        for dr, da, de in product(range(-half, half + 1), repeat=3):
+            keep &= values >= padded[r_idx + half + dr, az_idx + half + da, el_idx + half + de]
+        r_idx, az_idx, el_idx = r_idx[keep], az_idx[keep], el_idx[keep]
+
+    r = np.asarray(ranges)[r_idx]
+    phi, theta = np.asarray(az)[az_idx], np.asarray(el)[el_idx]
+
+    points = np.empty(len(r_idx), dtype=POINT_DTYPE)
+    points['x'] = r * np.cos(theta) * np.cos(phi)
+    points['y'] = r * np.cos(theta) * np.sin(phi)
+    points['z'] = r * np.sin(theta)
+    points['intensity'] = voxels[r_idx, az_idx, el_idx]
+    points['range'], points['azimuth'], points['elevation'] = r_idx, az_idx, el_idx
+    return points
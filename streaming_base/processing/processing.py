@@ -1,7 +1,9 @@
 import numpy as np
-from scipy.signal import convolve2d
+
+from streaming_base.processing.cfar import cfar_ca, apply_chunked, detect_points, detection_dtype, DETECTORS
 
 # implement this function to accumulate the time domain data 
+# (the real-time producers use streaming_base.processing.buffers.SlowTimeBuffer, which avoids shifting the history)
 def get_accumulated_time_data(current_range_data, range_fft_s):
     
     afx = np.squeeze(range_fft_s)
@@ -17,14 +19,19 @@ def cfar_ca_2d(power_map,
                num_train_doppler: int = 8,
                num_guard_range: int = 2,
                num_guard_doppler: int = 2,
-               rate_fa: float = 1e-5):
+               rate_fa: float = 1e-5,
+               wrap_doppler: bool = False,
+               chunk: int = None):
     """
-    2D Cell-Averaging CFAR on a (range × Doppler) power map.
+    2D Cell-Averaging CFAR on a (range × Doppler) power map, or on a stack of maps in one vectorized call.
+
+    Window sums come from cumulative sums (see streaming_base.processing.cfar), so the cost does not grow with
+    the number of training cells.
 
     Parameters
     ----------
-    power_map : 2D np.ndarray
-        The incoherent power map |X|^2 over (range, Doppler).
+    power_map : np.ndarray
+        The incoherent power map |X|^2 over (range, Doppler), or a stack of shape (frames, range, Doppler).
     num_train_range : int
         # of training cells on each side in range
     num_train_doppler : int
@@ -35,96 +42,145 @@ def cfar_ca_2d(power_map,
         # of guard cells on each side in Doppler
     rate_fa : float
         Desired probability of false alarm
+    wrap_doppler : bool
+        Wrap the windows around the Doppler axis instead of filling with zeros
+    chunk : int
+        Number of maps of a stack processed at once, to bound memory. All at once if None.
 
     Returns
     -------
-    detection_map : 2D bool np.ndarray
-        True where power_map exceeds the CFAR threshold.
+    detection_map : np.ndarray
+        power_map where it exceeds the CFAR threshold, 0 elsewhere.
     """
 
-    Tr, Td = num_train_range, num_train_doppler
-    Gr, Gd = num_guard_range, num_guard_doppler
-
-    # full window half–sizes
-    Wr = Tr + Gr
-    Wd = Td + Gd
-
-    # number of training cells total
-    Nwin = (2*Wr+1)*(2*Wd+1)
-    Nguard = (2*Gr+1)*(2*Gd+1)
-    Ntrain = Nwin - Nguard
-
-    # build convolution kernels
-    kernel_win   = np.ones((2*Wr+1, 2*Wd+1), dtype=float)
-    kernel_guard = np.ones((2*Gr+1,2*Gd+1), dtype=float)
-
-    # sum over full window
-    sum_win   = convolve2d(power_map, kernel_win,   mode='same', boundary='fill', fillvalue=0)
-    # sum over guard+CUT region
-    sum_guard = convolve2d(power_map, kernel_guard, mode='same', boundary='fill', fillvalue=0)
-
-    # training‐cell sum = window minus guard (which includes the CUT)
-    sum_train = sum_win - sum_guard
-
-    # noise estimate (average of training cells)
-    noise_level = sum_train / float(Ntrain)
+    return apply_chunked(cfar_ca, power_map, chunk,
+                         num_train_range=num_train_range,
+                         num_train_doppler=num_train_doppler,
+                         num_guard_range=num_guard_range,
+                         num_guard_doppler=num_guard_doppler,
+                         rate_fa=rate_fa,
+                         wrap_doppler=wrap_doppler)
 
-    # CFAR threshold multiplier (cell–averaging formula)
-    alpha = Ntrain * (rate_fa**(-1.0/Ntrain) - 1.0)
-    threshold = alpha * noise_level
-
-    detection_map = np.where(power_map > threshold, power_map, 0)
+def cfar_2d(power_map, cfar_params, chunk=None, axes=('range', 'doppler')):
+    """
+    Runs the CFAR detector selected by cfar_params["method"] (see streaming_base.processing.cfar.DETECTORS).
 
-    return detection_map
+    Parameters
+    ----------
+    power_map : np.ndarray
+        The power map over the two axes named by axes, optionally with leading frame axes.
+    cfar_params : dict
+        CFAR parameters: num_train_r, num_train_d, num_guard_r, num_guard_d, threshold_scale (the false alarm
+        rate) and optionally method ('ca', 'os', 'go' or 'so', 'ca' by default), wrap_doppler, for OS-CFAR
+        os_rank and os_levels, and output ('dense' by default, or 'points') with peak_size.
+    chunk : int
+        Number of maps of a stack processed at once, to bound memory. All at once if None.
+    axes : tuple of str
+        Names of the two axes of the maps, the field names of the points. The detectors take (range, Doppler)
+        maps, so ('doppler', 'range') maps are transposed for them and the results transposed back.
+        wrap_doppler only applies to maps with a 'doppler' axis, the _r parameters apply to the first axis of
+        maps without one, e.g. the angle of ('angle', 'range') maps.
+        Maps with a single Doppler bin, e.g. with one chirp loop, get a 1-D range CFAR.
 
-def process_frame(range_fft, cfar_params):
+    Returns
+    -------
+    detection_map : np.ndarray
+        power_map where it exceeds the CFAR threshold, 0 elsewhere. With output 'points', a structured array of
+        the local maxima among the detections instead (see streaming_base.processing.cfar.extract_detections).
+    """
+    method = cfar_params.get("method", "ca")
+    if method not in DETECTORS:
+        raise ValueError(f"Unknown CFAR method {method}, use one of {list(DETECTORS)}")
+
+    kwargs = {}
+    if method == "os":
+        kwargs = {"rank": cfar_params.get("os_rank", 0.75), "levels": cfar_params.get("os_levels", 32)}
+    kwargs.update(num_train_range=cfar_params["num_train_r"],
+                  num_train_doppler=cfar_params["num_train_d"],
+                  num_guard_range=cfar_params["num_guard_r"],
+                  num_guard_doppler=cfar_params["num_guard_d"],
+                  rate_fa=cfar_params["threshold_scale"],
+                  wrap_doppler=cfar_params.get("wrap_doppler", False) and 'doppler' in axes)
+
+    output = cfar_params.get("output", "dense")
+    if output not in ("dense", "points"):
+        raise ValueError(f"Unknown CFAR output {output}, use 'dense' or 'points'")
+
+    # Detectors take (range, Doppler) maps
+    transpose = tuple(axes) == ('doppler', 'range')
+    maps = np.swapaxes(power_map, -1, -2) if transpose else power_map
+    maps_axes = tuple(axes[::-1]) if transpose else tuple(axes)
+
+    # A single Doppler bin (one chirp loop): range-only CFAR over the training cells that exist (OS-CFAR mirrors
+    # the map at its edges instead)
+    if 'doppler' in axes and np.shape(maps)[-1] == 1:
+        kwargs.update(num_train_doppler=0, num_guard_doppler=0, wrap_doppler=False)
+        if method != "os":
+            kwargs["edge_counts"] = True
+
+    if output == "points":
+        points = detect_points(DETECTORS[method], maps, chunk, maps_axes, cfar_params.get("peak_size", 3), **kwargs)
+        if not transpose:
+            return points
+        # Same fields in the order of axes
+        detections = np.empty(len(points), dtype=detection_dtype(tuple(axes)))
+        for name in detections.dtype.names:
+            detections[name] = points[name]
+        return detections
+    dets = apply_chunked(DETECTORS[method], maps, chunk, **kwargs)
+    return np.swapaxes(dets, -1, -2) if transpose else dets
+
+def process_frame(range_fft, cfar_params, chunk=None):
     """
-    Process a single frame of range FFT data to detect targets using CFAR.
+    Process a frame of range FFT data, or a stack of frames, to detect targets using CFAR. Raw TDM-MIMO frames
+    go through streaming_base.processing.range_doppler.RangeDopplerProcessor instead, which adds the windows,
+    clutter removal and Doppler phase compensation, and whose rd_map can be passed to cfar_2d.
 
     Parameters
     ----------
     range_fft : np.ndarray
-        The range FFT data, typically a 2D array of shape (N_ant, N_R).
+        The range FFT data, typically of shape (N_ant, N_chirps, N_R), optionally with a leading frame axis.
     cfar_params : dict
         A dictionary containing CFAR parameters such as number of training cells, guard cells, and threshold scale.
+    chunk : int
+        Number of frames of a stack processed at once, to bound memory. All at once if None.
 
     Returns
     -------
     dets : np.ndarray
-        A 2D boolean array indicating detected targets, where True indicates a detection.
+        A 2D boolean array indicating detected targets, where True indicates a detection. With
+        cfar_params["output"] set to 'points', a structured array of detections instead.
     """
 
     # Doppler FFT
-    rd_cube = np.fft.fft(range_fft, axis=1)    # → (N_ant, N_D=N_adc, N_R=N_chirps)
+    rd_cube = np.fft.fft(range_fft, axis=-2)    # → (..., N_ant, N_D=N_adc, N_R=N_chirps)
 
     # Build RD magnitude for CFAR (average across antennas)
-    rd_map = np.mean(np.abs(rd_cube)**2, axis=0)  # shape (N_R, N_D)
+    rd_map = np.mean(np.abs(rd_cube)**2, axis=-3)  # shape (..., N_D, N_R)
 
-    # CFAR detections
-    dets = cfar_ca_2d(rd_map,
-                    cfar_params["num_train_r"],
-                    cfar_params["num_train_d"],
-                    cfar_params["num_guard_r"],
-                    cfar_params["num_guard_d"],
-                    cfar_params["threshold_scale"])
+    # CFAR detections, the range parameters on the range axis and wrap_doppler on the Doppler axis
+    dets = cfar_2d(rd_map, cfar_params, chunk, axes=('doppler', 'range'))
 
     return dets
 
-def process_frame_2d(range_fft, cfar_params):
+def process_frame_2d(range_fft, cfar_params, chunk=None):
     """
-    Process a single frame of range FFT data to detect targets using CFAR.
+    Process a 2D power map, or a stack of maps, to detect targets using CFAR.
 
     Parameters
     ----------
     range_fft : np.ndarray
-        The range FFT data, typically a 2D array of shape (N_ant, N_R).
+        The power map, typically a 2D array of shape (N_phi, N_R), optionally with a leading frame axis.
     cfar_params : dict
         A dictionary containing CFAR parameters such as number of training cells, guard cells, and threshold scale.
+    chunk : int
+        Number of maps of a stack processed at once, to bound memory. All at once if None.
 
     Returns
     -------
     dets : np.ndarray
-        A 2D boolean array indicating detected targets, where True indicates a detection.
+        A 2D boolean array indicating detected targets, where True indicates a detection. With
+        cfar_params["output"] set to 'points', a structured array of detections instead.
     """
 
     # Doppler FFT
@@ -133,13 +189,8 @@ def process_frame_2d(range_fft, cfar_params):
     # Build RD magnitude for CFAR (average across antennas)
     # rd_map = np.mean(np.abs(rd_cube)**2, axis=0)  # shape (N_R, N_D)
 
-    # CFAR detections
-    dets = cfar_ca_2d(range_fft,
-                    cfar_params["num_train_r"],
-                    cfar_params["num_train_d"],
-                    cfar_params["num_guard_r"],
-                    cfar_params["num_guard_d"],
-                    cfar_params["threshold_scale"])
+    # CFAR detections, there is no Doppler axis to wrap around
+    dets = cfar_2d(range_fft, cfar_params, chunk, axes=('angle', 'range'))
 
     return dets
 
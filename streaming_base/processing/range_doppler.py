@@ -0,0 +1,152 @@
+import numpy as np
+import scipy.fft
+
+# Windows by name, all symmetric like np.hamming
+WINDOWS = {
+    'hamming': np.hamming,
+    'hanning': np.hanning,
+    'blackman': np.blackman,
+    'rect': np.ones,
+}
+
+
+def get_window(name, size):
+    """
+    Window of the given name and size.
+
+    Parameters
+    ----------
+    name : str
+        One of WINDOWS, or None for no window.
+    size : int
+        Number of samples.
+
+    Returns
+    -------
+    window : np.ndarray
+        float32 window of shape (size,).
+    """
+    name = 'rect' if name is None else name
+    if name not in WINDOWS:
+        raise ValueError(f"Unknown window {name}, use one of {list(WINDOWS)}")
+    return WINDOWS[name](size).astype(np.float32)
+
+
+def tdm_phase_compensation(num_tx, num_doppler):
+    """
+    Phases that undo the Doppler shift accumulated between the TX slots of a TDM-MIMO frame.
+
+    The chirp of transmitter m starts m chirp periods after the one of transmitter 0, so a target in Doppler bin k
+    (over loops of num_tx chirps) has an extra phase exp(j 2pi k m / (num_doppler num_tx)) on the virtual antennas
+    of transmitter m, which would otherwise look like an angle offset.
+
+    Parameters
+    ----------
+    num_tx : int
+        Number of transmitters, in the order they transmit within a loop.
+    num_doppler : int
+        Number of Doppler bins (chirp loops), in the unshifted FFT order.
+
+    Returns
+    -------
+    phases : np.ndarray
+        complex64 array of shape (num_tx, 1, num_doppler, 1) to multiply a (tx, rx, Doppler, range) cube with.
+    """
+    # Signed Doppler bin of every FFT bin, e.g. 0, 1, ..., -2, -1
+    k = np.fft.fftfreq(num_doppler, 1. / num_doppler)
+    m = np.arange(num_tx)
+    phases = np.exp(-2j * np.pi * m[:, None] * k[None, :] / (num_doppler * num_tx))
+    return phases[:, None, :, None].astype(np.complex64)
+
+
+class RangeDopplerProcessor():
+    """
+    Range-Doppler stage of a TDM-MIMO frame: windowed range and Doppler FFTs, static clutter removal, TDM-MIMO
+    Doppler phase compensation and the non-coherent integration over antennas.
+
+    Both FFTs are one batched scipy.fft.fft2 call over (loops, samples). The clutter removal subtracts the mean
+    over the chirp loops, which commutes with the range FFT and the range window, so it is done on the ADC samples
+    before a single combined (loops, samples) window. The windows, phases and the work buffer are allocated once,
+    and the fixed shape lets scipy.fft reuse its cached FFT plans every frame.
+
+    Examples
+    --------
+    >>> stage = RangeDopplerProcessor(num_tx=3, num_rx=4, num_loops=64, num_samples=256, range_idx=r_idxs)
+    >>> rd_cube, rd_map = stage(cube)      # cube from DCA1000.organize_tdm, (tx, rx, loops, samples)
+    >>> rd_cube.shape, rd_map.shape        # (virtual antennas, Doppler, range) and (Doppler, range)
+    ((12, 64, 40), (64, 40))
+    """
+
+    def __init__(self, num_tx, num_rx, num_loops, num_samples, range_idx=None, range_window='hamming',
+                 doppler_window='hamming', clutter_removal=True, tdm_compensation=True, workers=None):
+        """
+        Parameters
+        ----------
+        num_tx : int
+            Number of transmitters.
+        num_rx : int
+            Number of receivers.
+        num_loops : int
+            Number of chirp loops per frame, the number of Doppler bins.
+        num_samples : int
+            Number of ADC samples per chirp.
+        range_idx : np.ndarray
+            Range bins kept after the range FFT, all of them if None.
+        range_window : str
+            Window of the range FFT, see WINDOWS.
+        doppler_window : str
+            Window of the Doppler FFT, see WINDOWS. Ignored with a single chirp loop.
+        clutter_removal : bool
+            Subtract the mean over the chirp loops, which removes the static reflections (zero Doppler). Ignored
+            with a single chirp loop, where it would zero the whole frame.
+        tdm_compensation : bool
+            Apply the TDM-MIMO Doppler phase compensation, see tdm_phase_compensation.
+        workers : int
+            Number of threads of scipy.fft, -1 for all CPUs.
+        """
+        self.shape = (num_tx, num_rx, num_loops, num_samples)
+        self.range_idx = slice(None) if range_idx is None else np.asarray(range_idx)
+        # A single loop has no Doppler axis to speak of: its mean is the frame itself and a 1-point window is 0
+        if num_loops == 1:
+            clutter_removal, doppler_window = False, None
+        self.clutter_removal = clutter_removal
+        self.workers = workers
+
+        self.window = (get_window(doppler_window, num_loops)[:, None]
+                       * get_window(range_window, num_samples)[None, :])
+        self.phases = tdm_phase_compensation(num_tx, num_loops) if tdm_compensation else None
+        self._work = np.empty(self.shape, dtype=np.complex64)
+
+    def __call__(self, cube):
+        """
+        Range-Doppler cube and map of a frame.
+
+        Parameters
+        ----------
+        cube : np.ndarray
+            ADC data of shape (num_tx, num_rx, num_loops, num_samples), e.g. from DCA1000.organize_tdm.
+
+        Returns
+        -------
+        rd_cube : np.ndarray
+            complex64 range-Doppler data of shape (num_tx * num_rx, num_doppler, num_range), virtual antennas in
+            the tx major order of get_ant_pos_2d, compensated for TDM-MIMO and ready for angle processing. Without
+            range_idx it shares the work buffer, so it is only valid until the next call.
+        rd_map : np.ndarray
+            float32 power averaged over the antennas, shape (num_doppler, num_range), the (Doppler, range) map of
+            process_frame.
+        """
+        if self.clutter_removal:
+            np.subtract(cube, cube.mean(axis=-2, keepdims=True), out=self._work)
+        else:
+            self._work[...] = cube
+        self._work *= self.window
+
+        rd_cube = scipy.fft.fft2(self._work, axes=(-2, -1), workers=self.workers, overwrite_x=True)
+        rd_cube = rd_cube[..., self.range_idx]
+        if self.phases is not None:
+            rd_cube *= self.phases
+
+        rd_cube = rd_cube.reshape(self.shape[0] * self.shape[1], self.shape[2], -1)
+        rd_map = np.mean(np.abs(rd_cube) ** 2, axis=0)
+        return rd_cube, rd_map
@@ -0,0 +1,153 @@
+from itertools import product
+
+import numpy as np
+import scipy.sparse
+
+
+def bilinear_matrix(grid, points, dtype=np.float32):
+    """
+    Sparse operator of the bilinear interpolation of a 2D regular grid at fixed points.
+
+    Matches scipy.interpolate.RegularGridInterpolator with method='linear', bounds_error=False and fill_value=0:
+    every row holds the (at most 4) weights of a point, and points outside the grid have an empty row.
+
+    Parameters
+    ----------
+    grid : tuple of np.ndarray
+        The two ascending axes of the grid, of lengths n0 and n1.
+    points : np.ndarray
+        Points of shape (num_points, 2), in the order of the axes.
+    dtype : np.dtype
+        dtype of the weights.
+
+    Returns
+    -------
+    matrix : scipy.sparse.csr_matrix
+        Operator of shape (num_points, n0 * n1), to multiply a C ordered (n0, n1) array flattened.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    idx, frac = [], []
+    inside = np.ones(len(points), dtype=bool)
+    for axis, g in enumerate(grid):
+        g = np.asarray(g, dtype=np.float64)
+        if len(g) < 2:
+            raise ValueError(f"Axis {axis} of the grid needs at least 2 points, got {len(g)}")
+        p = points[:, axis]
+        i = np.clip(np.searchsorted(g, p) - 1, 0, len(g) - 2)
+        idx.append(i)
+        frac.append((p - g[i]) / (g[i + 1] - g[i]))
+        inside &= (p >= g[0]) & (p <= g[-1])
+
+    rows = np.flatnonzero(inside)
+    n1 = len(grid[1])
+    cols, weights = [], []
+    for a, b in product((0, 1), (0, 1)):
+        cols.append((idx[0][rows] + a) * n1 + idx[1][rows] + b)
+        weights.append((frac[0][rows] if a else 1 - frac[0][rows]) * (frac[1][rows] if b else 1 - frac[1][rows]))
+    matrix = scipy.sparse.csr_matrix((np.concatenate(weights).astype(dtype), (np.tile(rows, 4), np.concatenate(cols))),
+                                     shape=(len(points), len(grid[0]) * n1))
+    matrix.eliminate_zeros()
+    return matrix
+
+
+class PolarResampler():
+    """
+    Resampling of the (phi, range) images of a radar to a Cartesian (y, x) grid and back, for the BEV display.
+
+    The geometry of both grids is fixed for a run, so the bilinear weights are computed once as sparse matrices
+    (see bilinear_matrix) and every frame is a single sparse mat-vec. The round trip polar -> Cartesian -> polar
+    of the display is precomputed as the product of both operators, with the flip in phi of the polar axes.
+
+    Examples
+    --------
+    >>> resampler = PolarResampler(cfg_radar["phi"], cfg_radar["range_idx"], cfg_radar["width"])
+    >>> bev = resampler.to_cartesian(bf_output)        # (range_idx, x) Cartesian image
+    >>> to_plot = resampler.round_trip(bf_output)      # (phi, range) image for the polar axes
+    """
+
+    def __init__(self, phi, r, width, origin=(0., 0.), flip_phi=True, dtype=np.float32):
+        """
+        Parameters
+        ----------
+        phi : np.ndarray
+            Ascending angles of the polar grid in radians, 90 degrees is boresight.
+        r : np.ndarray
+            Ascending ranges of the polar grid, the range bins, also the y axis of the Cartesian grid.
+        width : int
+            The x axis of the Cartesian grid is np.arange(-width, width), in the units of r.
+        origin : tuple of float
+            (x, y) position of the radar in the Cartesian grid.
+        flip_phi : bool
+            Flip the round trip in phi, as drawn by configure_ax_bf.
+        dtype : np.dtype
+            dtype of the weights and of the resampled images.
+        """
+        self.phi = np.asarray(phi)
+        self.r = np.asarray(r)
+        self.x = np.arange(-width, width, 1)
+        self.y = self.r
+        self.polar_shape = (len(self.phi), len(self.r))
+        self.cart_shape = (len(self.y), len(self.x))
+
+        # Polar coordinates of every Cartesian pixel, relative to the radar
+        X, Y = np.meshgrid(self.x - origin[0], self.y - origin[1], indexing='xy')
+        self.polar_to_cart = bilinear_matrix((self.phi, self.r), np.column_stack(
+            (np.arctan2(Y, X).ravel(), np.hypot(X, Y).ravel())), dtype)
+
+        # Cartesian coordinates of every polar pixel, (y, x) like the Cartesian grid
+        PHI, R = np.meshgrid(self.phi, self.r, indexing='ij')
+        self.cart_to_polar = bilinear_matrix((self.y, self.x), np.column_stack(
+            ((R * np.sin(PHI)).ravel() + origin[1], (R * np.cos(PHI)).ravel() + origin[0])), dtype)
+
+        round_trip = self.cart_to_polar @ self.polar_to_cart
+        if flip_phi:
+            round_trip = round_trip[np.arange(round_trip.shape[0]).reshape(self.polar_shape)[::-1].ravel()]
+        self.round_trip_matrix = scipy.sparse.csr_matrix(round_trip)
+
+    def to_cartesian(self, image):
+        """
+        Resamples a polar image to the Cartesian grid.
+
+        Parameters
+        ----------
+        image : np.ndarray
+            Image of shape (len(phi), len(r)).
+
+        Returns
+        -------
+        cart : np.ndarray
+            Image of shape (len(r), 2 * width), 0 outside the field of view.
+        """
+        return (self.polar_to_cart @ image.ravel()).reshape(self.cart_shape)
+
+    def to_polar(self, cart):
+        """
+        Resamples a Cartesian image to the polar grid.
+
+        Parameters
+        ----------
+        cart : np.ndarray
+            Image of shape (len(r), 2 * width).
+
+        Returns
+        -------
+        image : np.ndarray
+            Image of shape (len(phi), len(r)), not flipped.
+        """
+        return (self.cart_to_polar @ cart.ravel()).reshape(self.polar_shape)
+
+    def round_trip(self, image):
+        """
+        Resamples a polar image to the Cartesian grid and back, the BEV image of the display.
+
+        Parameters
+        ----------
+        image : np.ndarray
+            Image of shape (len(phi), len(r)).
+
+        Returns
+        -------
+        image : np.ndarray
+            Image of shape (len(phi), len(r)), flipped in phi if flip_phi.
+        """
+        return (self.round_trip_matrix @ image.ravel()).reshape(self.polar_shape)
@@ -0,0 +1,152 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+import utils.utility as utility
+from streaming_base.mmwave.dataloader.emulator import DCA1000Emulator, load_frames, synthetic_frames
+from streaming_base.streaming.prod_dca import pipeline_1843, pipeline_1843_task4, frame_dtype_1843, frame_dtype_1843_task4
+from streaming_base.streaming.shared_frames import SharedFrameRing
+from streaming_base.streaming.metrics import Metrics, MetricsReporter, GUI_TIMERS, GUI_COUNTERS
+
+'''
+    Measures how many frames per second the real-time producer pipelines sustain, and the latency of every stage,
+    without the radar or the GUI. A local DCA1000 emulator streams a capture (or synthetic frames) and this
+    process reads the shared-memory ring of the producer as fast as possible. Run from the root of the repo, e.g.
+        python -m streaming_base.streaming.benchmark_producer --task 3 --bin data/task3_gt_Raw_0.bin --max-speed
+'''
+
+
+def get_configs(task, chirp_dict, cfar_on, bf_mode="loop"):
+    """
+    Builds the radar and CFAR configuration of a task like task3_tracking_realtime.py and task4_vital_signs_realtime.py.
+
+    Parameters
+    ----------
+    task : int
+        3 for tracking, 4 for vital signs.
+    chirp_dict : dict
+        Radar parameters as returned by utils.utility.read_radar_params.
+    cfar_on : bool
+        Enables CFAR in the tracking producer.
+    bf_mode : str
+        Beamformer of the tracking producer, 'loop', 'matmul', 'fft', 'mvdr' or 'music'.
+
+    Returns
+    -------
+    tuple
+        The pipeline function, cfg_radar and cfg_cfar.
+    """
+    cfg_radar = {
+        "range_idx": np.arange(0, chirp_dict['samples_per_chirp'], 1),
+        "phi": np.deg2rad(np.arange(0, 180, 1)),
+        "width": 100,
+        "n_radar": 1,
+        "num_tx": chirp_dict['num_tx'],
+        "num_rx": chirp_dict['num_rx'],
+        "num_doppler": chirp_dict['chirp_loops'],
+        "samples_per_chirp": chirp_dict['samples_per_chirp'],
+        "sample_rate": chirp_dict['sample_rate'],
+        "c": 3e8,
+        "lm": 3e8 / 77e9,
+        "slope": chirp_dict['sample_rate'],
+        "num_frames": 250,
+        "periodicity": chirp_dict['periodicity'],
+        "bf_mode": bf_mode
+    }
+    cfg_cfar = {
+        "cfar_on": cfar_on,
+        "bg_sub": False,
+        "num_train_r": 10,
+        "num_train_d": 10,
+        "num_guard_r": 4,
+        "num_guard_d": 2,
+        "threshold_scale": 1e-3
+    }
+    pipeline = pipeline_1843 if task == 3 else pipeline_1843_task4
+    return pipeline, cfg_radar, cfg_cfar
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks a real-time producer against a DCA1000 emulator.")
+    parser.add_argument("--task", type=int, choices=[3, 4], default=3, help="Producer to benchmark.")
+    parser.add_argument("--lua", default=None, help="Lua configuration, defaults to the streaming script of the task.")
+    parser.add_argument("--bin", default=None, help="Recorded capture to stream, synthetic frames if not given.")
+    parser.add_argument("--cfar", action="store_true", help="Enables CFAR in the tracking producer.")
+    parser.add_argument("--bf-mode", default="loop", choices=["loop", "matmul", "fft", "mvdr", "music"], help="Beamformer of the tracking producer.")
+    parser.add_argument("--duration", type=float, default=10., help="Seconds to measure.")
+    parser.add_argument("--frame-rate", type=float, default=None, help="Frames per second, defaults to the lua periodicity.")
+    parser.add_argument("--max-speed", action="store_true", help="Send frames as fast as possible.")
+    parser.add_argument("--loss", type=float, default=0., help="Probability of dropping a packet.")
+    parser.add_argument("--reorder", type=float, default=0., help="Probability of swapping a packet with the next.")
+    parser.add_argument("--worker", default="process", choices=["process", "thread"], help="Worker of every stage.")
+    parser.add_argument("--metrics-path", default=None, help="File the final metrics are appended to as a JSON line.")
+    args = parser.parse_args()
+
+    lua = args.lua or os.path.join(os.getcwd(), 'scripts', f'1843_config_streaming_task{args.task}.lua')
+    chirp_dict = utility.read_radar_params(lua)
+    pipeline, cfg_radar, cfg_cfar = get_configs(args.task, chirp_dict, args.cfar, args.bf_mode)
+
+    num_chirps = chirp_dict['num_tx'] * chirp_dict['chirp_loops']
+    bytes_in_frame = num_chirps * chirp_dict['num_rx'] * chirp_dict['samples_per_chirp'] * 4
+    if args.bin:
+        frames = load_frames(args.bin, bytes_in_frame)
+    else:
+        frames = synthetic_frames(100, num_chirps, chirp_dict['num_rx'], chirp_dict['samples_per_chirp'])
+    frame_rate = args.frame_rate or 1000 / chirp_dict['periodicity']
+
+    if args.task == 3:
+        ring = SharedFrameRing(frame_dtype_1843(cfg_radar, cfg_cfar))
+    else:
+        ring = SharedFrameRing(frame_dtype_1843_task4(cfg_radar))
+    pipeline = pipeline(ring, cfg_radar, cfg_cfar, 4096, 4098, "127.0.0.1", "127.0.0.2", worker=args.worker)
+    pipeline.start()
+    # Let the capture stage bind its sockets before the first packet
+    time.sleep(2)
+
+    dca_emulator = DCA1000Emulator(frames, frame_rate=frame_rate, loss=args.loss, reorder=args.reorder,
+                                   max_speed=args.max_speed)
+    dca_emulator.start()
+
+    # Read the ring as fast as possible, so the producer is the only bottleneck. The reader stands in for the GUI
+    reader = Metrics("reader", GUI_TIMERS, GUI_COUNTERS)
+    received = 0
+    start = time.perf_counter()
+    sent_start = dca_emulator.stats['frames_sent']
+    try:
+        while time.perf_counter() - start < args.duration:
+            read = time.perf_counter()
+            frame = ring.latest()
+            if frame is None:
+                time.sleep(1e-4)
+                continue
+            end = time.perf_counter()
+            reader.record("update", end - read)
+            reader.record("display_latency", end - frame['t0'])
+            reader.add("frames_shown")
+            received += 1
+    finally:
+        elapsed = time.perf_counter() - start
+        sent = dca_emulator.stats['frames_sent'] - sent_start
+        dca_emulator.close()
+        report = pipeline.report()
+        line = MetricsReporter([pipeline.metrics, reader]).line()
+        pipeline.stop()
+
+    print(f"Emulator sent {sent / elapsed:.1f} frames/s, producer output {received / elapsed:.1f} frames/s "
+          f"({received} frames in {elapsed:.1f} s)")
+    print(f"Emulator stats: {dca_emulator.stats}")
+    print(f"Transport stats: {ring.stats}")
+    print(report)
+    latency = reader.snapshot()['timers']['display_latency']
+    print(f"Capture to read latency p50 {latency['p50_ms']:.2f} ms, p95 {latency['p95_ms']:.2f} ms, "
+          f"p99 {latency['p99_ms']:.2f} ms")
+    if args.metrics_path:
+        with open(args.metrics_path, 'a') as f:
+            f.write(line + "\n")
+    ring.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import RawArray
+
+import numpy as np
+
+# Number of the latest samples of every timer the percentiles are computed over
+WINDOW = 1024
+PERCENTILES = (50, 95, 99)
+
+# Metrics of the visualizers: time of an update that drew a frame, time from the capture of a frame until it was
+# drawn, frames read from the ring and frames drawn
+GUI_TIMERS = ('update', 'display_latency')
+GUI_COUNTERS = ('frames_read', 'frames_shown')
+
+
+class Metrics():
+    """
+    Timers and counters shared between processes, for the stages of the producers and the GUI.
+
+    A timer keeps its number of samples, their sum and a rolling window of the latest samples, from which the
+    percentiles are computed when a snapshot is taken. Recording a sample is two additions and a store into
+    shared arrays, so any process (or thread) started with the object can record while another one reports. Every
+    timer and counter has a single writer. All times come from time.perf_counter, which is monotonic and shared
+    between the processes of a machine.
+
+    Examples
+    --------
+    >>> metrics = Metrics("gui", timers=["update", "display_latency"], counters=["frames"])
+    >>> with metrics.timer("update"):
+    ...     redraw()
+    >>> metrics.record("display_latency", time.perf_counter() - frame['t0'])
+    >>> metrics.add("frames")
+    >>> metrics.snapshot()["timers"]["update"]["p95_ms"]
+    """
+
+    def __init__(self, name, timers=(), counters=(), window=WINDOW):
+        """
+        Parameters
+        ----------
+        name : str
+            Name of the group of metrics in the reports.
+        timers : list of str
+            Names of the timers.
+        counters : list of str
+            Names of the counters.
+        window : int
+            Number of the latest samples of every timer kept for the percentiles.
+        """
+        self.name = name
+        self.timers = {timer: i for i, timer in enumerate(timers)}
+        self.counters = {counter: i for i, counter in enumerate(counters)}
+        self.window = window
+        self.started = time.perf_counter()
+        self._count = RawArray('d', len(self.timers))
+        self._total = RawArray('d', len(self.timers))
+        self._samples = RawArray('d', len(self.timers) * window)
+        self._counters = RawArray('d', len(self.counters))
+
+    def record(self, timer, seconds):
+        """
+        Adds a sample to a timer.
+
+        Parameters
+        ----------
+        timer : str
+            Name of the timer.
+        seconds : float
+            Duration.
+        """
+        i = self.timers[timer]
+        count = int(self._count[i])
+        self._samples[i * self.window + count % self.window] = seconds
+        self._total[i] += seconds
+        self._count[i] = count + 1
+
+    @contextmanager
+    def timer(self, timer):
+        """
+        Context manager recording the duration of its block into a timer.
+
+        Parameters
+        ----------
+        timer : str
+            Name of the timer.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(timer, time.perf_counter() - start)
+
+    def add(self, counter, n=1):
+        """
+        Increments a counter.
+
+        Parameters
+        ----------
+        counter : str
+            Name of the counter.
+        n : int
+            Increment.
+        """
+        self._counters[self.counters[counter]] += n
+
+    def snapshot(self):
+        """
+        Current value of every timer and counter.
+
+        Returns
+        -------
+        snapshot : dict
+            name, uptime_s, timers (for every timer its count, rate_hz since the start, mean_ms and the p50_ms,
+            p95_ms and p99_ms of the latest samples) and counters.
+        """
+        now = time.perf_counter()
+        uptime = now - self.started
+        samples = np.frombuffer(self._samples, dtype=np.float64).reshape(len(self.timers), self.window)
+        timers = {}
+        for timer, i in self.timers.items():
+            count = int(self._count[i])
+            stats = {'count': count, 'rate_hz': count / uptime if uptime > 0 else 0.,
+                     'mean_ms': 1e3 * self._total[i] / count if count else 0.}
+            latest = samples[i, :min(count, self.window)]
+            values = np.percentile(latest, PERCENTILES) if len(latest) else np.zeros(len(PERCENTILES))
+            stats.update({f'p{p}_ms': 1e3 * float(v) for p, v in zip(PERCENTILES, values)})
+            timers[timer] = stats
+        counters = {counter: int(self._counters[i]) for counter, i in self.counters.items()}
+        return {'name': self.name, 'uptime_s': uptime, 'timers': timers, 'counters': counters}
+
+
+class MetricsReporter():
+    """
+    Background thread writing a JSON line with the snapshot of every Metrics periodically, to a file or stdout.
+
+    Examples
+    --------
+    >>> reporter = MetricsReporter([pipeline.metrics, gui_metrics], period=10, path="metrics.jsonl")
+    >>> reporter.start()
+    >>> reporter.stop()
+    """
+
+    def __init__(self, metrics, period=10., path=None):
+        """
+        Parameters
+        ----------
+        metrics : list of Metrics
+            Groups of metrics to report.
+        period : float
+            Seconds between two lines.
+        path : str
+            File the lines are appended to, stdout if None.
+        """
+        self.metrics = list(metrics)
+        self.period = period
+        self.path = path
+        self._stop = threading.Event()
+        self._thread = None
+
+    def line(self):
+        """
+        JSON line of the current snapshots.
+
+        Returns
+        -------
+        line : str
+            {"time": unix time, <name of every Metrics>: its snapshot}.
+        """
+        report = {'time': time.time()}
+        report.update({metrics.name: metrics.snapshot() for metrics in self.metrics})
+        return json.dumps(report)
+
+    def start(self):
+        """Starts the reporting thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-reporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the reporting thread after a last line."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        """
+        Helper function, body of the reporting thread.
+        """
+        out = sys.stdout if self.path is None else open(self.path, 'a')
+        try:
+            while not self._stop.wait(self.period):
+                out.write(self.line() + "\n")
+                out.flush()
+            out.write(self.line() + "\n")
+        finally:
+            if out is not sys.stdout:
+                out.close()
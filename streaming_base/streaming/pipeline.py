@@ -0,0 +1,323 @@
+import multiprocessing
+import signal
+import threading
+import time
+
+import numpy as np
+
+from streaming_base.streaming.metrics import Metrics
+from streaming_base.streaming.shared_frames import SharedFrameQueue
+
+'''
+    Multi-stage DSP pipelines: every stage runs in its own worker process (or thread) and hands its frames to the
+    next one through a bounded SharedFrameQueue. The producers of streaming_base.streaming.prod_dca are declared
+    as pipelines, capture -> organize -> range FFT -> angle -> detect -> publish, so a slow stage no longer stalls
+    the UDP capture and the stages run on several cores.
+'''
+
+# What a stage does when the queue to the next stage is full: wait for room (backpressure), or drop the frame
+POLICIES = ('block', 'drop')
+
+# Timers of every stage: time of a step, time waiting for the queues and time from capture to the end of the step
+TIMERS = ('service', 'wait', 'latency')
+# Counters of every stage: frames processed and dropped
+COUNTERS = ('frames', 'dropped')
+
+# Seconds a worker waits on a queue before checking whether the pipeline was stopped
+POLL_TIMEOUT = 0.1
+
+
+class Stage():
+    """
+    Declaration of a pipeline stage.
+
+    The step factory is called in the worker with the configuration of the pipeline and returns the step, a
+    callable step(frame, out) taking the frame of the previous stage (None for the first stage) and filling out,
+    a slot of the queue to the next stage (None for the last stage). The step returns False to skip a frame, e.g.
+    on a capture timeout. A step with a close method is closed when its worker exits. Both frames are 0-d
+    structured arrays in shared memory and only valid during the call. Every frame also carries t0, the time it
+    was captured (time.perf_counter), set by the first stage.
+
+    Examples
+    --------
+    >>> Stage("range_fft", RangeFFT, out_dtype=np.dtype([('range_fft', np.complex64, (12, 64, 128))]))
+    """
+
+    def __init__(self, name, step, out_dtype=None, capacity=2, policy='block', worker='process'):
+        """
+        Parameters
+        ----------
+        name : str
+            Name of the stage in the reports.
+        step : callable
+            Step factory taking the configuration dict, a class or a module level function so it can be pickled.
+        out_dtype : np.dtype
+            Structured dtype of the frames passed to the next stage, None for the last stage.
+        capacity : int
+            Number of frames the queue to the next stage holds.
+        policy : str
+            'block' to wait when the queue to the next stage is full, 'drop' to drop the frame.
+        worker : str
+            'process' or 'thread'.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy}, use one of {list(POLICIES)}")
+        if worker not in ('process', 'thread'):
+            raise ValueError(f"Unknown worker {worker}, use 'process' or 'thread'")
+        self.name = name
+        self.step = step
+        self.out_dtype = None if out_dtype is None else np.dtype(out_dtype)
+        self.capacity = capacity
+        self.policy = policy
+        self.worker = worker
+
+
+class Pipeline():
+    """
+    Ordered stages, each in its own worker, connected by bounded shared-memory queues.
+
+    Every stage records into the metrics of the pipeline, as '<stage>.<timer>' and '<stage>.<counter>', the frames
+    it processed and dropped and the percentiles of its service time (the time of a step), of the time it waited
+    for its input and for room in its output queue, and of the latency of its output since capture.
+
+    Examples
+    --------
+    >>> pipeline = Pipeline([Stage("capture", Capture, raw_dtype, policy='drop'),
+    ...                      Stage("range_fft", RangeFFT, fft_dtype),
+    ...                      Stage("publish", Publish)], cfg)
+    >>> pipeline.run(report_every=5)       # until Ctrl+C
+    """
+
+    def __init__(self, stages, cfg, worker=None):
+        """
+        Parameters
+        ----------
+        stages : list of Stage
+            Stages in order, all but the last with an out_dtype.
+        cfg : dict
+            Configuration given to the step factories, pickled to the worker processes.
+        worker : str
+            'process' or 'thread' for every stage, overriding the stages.
+        """
+        self.stages = list(stages)
+        if any(stage.out_dtype is None for stage in self.stages[:-1]):
+            raise ValueError("Every stage but the last needs an out_dtype")
+        self.cfg = cfg
+        self.worker_types = [worker or stage.worker for stage in self.stages]
+
+        self.queues = [SharedFrameQueue(_with_timestamp(stage.out_dtype), stage.capacity)
+                       for stage in self.stages[:-1]]
+        self.metrics = Metrics("pipeline", [f"{stage.name}.{timer}" for stage in self.stages for timer in TIMERS],
+                               [f"{stage.name}.{counter}" for stage in self.stages for counter in COUNTERS])
+        self._stop = multiprocessing.Event()
+        self.workers = []
+
+    def start(self, report_every=None):
+        """
+        Starts one worker per stage, the last stage first so every queue has a consumer before it fills.
+
+        Parameters
+        ----------
+        report_every : float
+            Seconds between the reports printed by a background thread, None for no report.
+        """
+        self._stop.clear()
+        self.metrics.started = time.perf_counter()
+        for index in reversed(range(len(self.stages))):
+            inbox = self.queues[index - 1] if index > 0 else None
+            outbox = self.queues[index] if index < len(self.queues) else None
+            worker, target = ((multiprocessing.Process, _run_process_stage) if self.worker_types[index] == 'process'
+                              else (threading.Thread, _run_stage))
+            self.workers.append(worker(target=target, name=f"pipeline-{self.stages[index].name}", daemon=True,
+                                       args=(self.stages[index], self.cfg, inbox, outbox, self.metrics, self._stop)))
+            self.workers[-1].start()
+        if report_every:
+            threading.Thread(target=self._print_reports, args=(report_every,), name="pipeline-report",
+                             daemon=True).start()
+
+    def _print_reports(self, report_every):
+        """
+        Helper function printing the report every report_every seconds until the pipeline is stopped.
+        """
+        while not self._stop.wait(report_every):
+            print(self.report())
+
+    def stop(self, timeout=2.):
+        """
+        Stops the workers, terminating the processes still running after timeout, and frees the queues. A
+        terminated process still closes its step, e.g. the socket of the capture, and is killed if that takes
+        longer than timeout too. Threads cannot be terminated, so stop waits for every thread to finish its step:
+        the queues are only freed once no worker can hold one of their slots.
+
+        Parameters
+        ----------
+        timeout : float
+            Seconds to wait for every worker.
+        """
+        self._stop.set()
+        for worker in self.workers:
+            worker.join(timeout)
+            if isinstance(worker, multiprocessing.Process) and worker.is_alive():
+                worker.terminate()
+                worker.join(timeout)
+                if worker.is_alive():
+                    worker.kill()
+                    worker.join()
+            elif worker.is_alive():
+                # The step of the thread may still hold a slot of a queue, which cannot be closed under it
+                worker.join()
+        self.workers = []
+        for frames in self.queues:
+            frames.close()
+
+    def run(self, report_every=None):
+        """
+        Starts the pipeline and waits until Ctrl+C, printing the report periodically.
+
+        Parameters
+        ----------
+        report_every : float
+            Seconds between reports, None for no report.
+        """
+        self.start(report_every)
+        try:
+            while all(worker.is_alive() for worker in self.workers):
+                time.sleep(POLL_TIMEOUT)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stats(self):
+        """
+        Metrics of every stage.
+
+        Returns
+        -------
+        stats : list of dict
+            For every stage its name, frames (processed), dropped, fps (processed per second since the start) and
+            the mean, p50, p95 and p99 in ms of its service time (service_ms, service_p50_ms, ...), which includes
+            waiting for the source in the first stage, of its wait for the queues (wait_*) and of the time from
+            capture to the end of its step (latency_*).
+        """
+        snapshot = self.metrics.snapshot()
+        stats = []
+        for stage in self.stages:
+            counters = {counter: snapshot['counters'][f"{stage.name}.{counter}"] for counter in COUNTERS}
+            row = {'name': stage.name, 'frames': counters['frames'], 'dropped': counters['dropped'],
+                   'fps': snapshot['timers'][f"{stage.name}.service"]['rate_hz']}
+            for timer in TIMERS:
+                timings = snapshot['timers'][f"{stage.name}.{timer}"]
+                row[f"{timer}_ms"] = timings['mean_ms']
+                row.update({f"{timer}_{key}": value for key, value in timings.items() if key.startswith('p')})
+            stats.append(row)
+        return stats
+
+    def report(self):
+        """
+        Table of the stats of every stage.
+
+        Returns
+        -------
+        report : str
+            One line per stage, times in ms.
+        """
+        lines = [f"{'stage':>12} {'frames':>8} {'dropped':>8} {'fps':>7} {'service p50/p95':>16} "
+                 f"{'wait p50/p95':>16} {'latency p50/p95/p99':>22}"]
+        for row in self.stats():
+            service = f"{row['service_p50_ms']:.2f}/{row['service_p95_ms']:.2f}"
+            wait = f"{row['wait_p50_ms']:.2f}/{row['wait_p95_ms']:.2f}"
+            latency = f"{row['latency_p50_ms']:.2f}/{row['latency_p95_ms']:.2f}/{row['latency_p99_ms']:.2f}"
+            lines.append(f"{row['name']:>12} {row['frames']:8d} {row['dropped']:8d} {row['fps']:7.1f} {service:>16} "
+                         f"{wait:>16} {latency:>22}")
+        return "\n".join(lines)
+
+
+def _with_timestamp(dtype):
+    """
+    Helper function adding the capture time t0, carried along the pipeline, to the dtype of a stage if it has none.
+    """
+    if 't0' in dtype.names:
+        return dtype
+    return np.dtype([('t0', np.float64)] + [(name, dtype.fields[name][0]) for name in dtype.names])
+
+
+def _terminated(signum, stack):
+    """
+    Helper function, SIGTERM handler of the worker processes: exits through the finally of _run_stage so the
+    step is closed, ignoring a second SIGTERM while it closes.
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    raise SystemExit(1)
+
+
+def _run_process_stage(*args):
+    """
+    Worker body of a stage in a process, _run_stage that still closes its step when Pipeline.stop terminates it.
+    """
+    signal.signal(signal.SIGTERM, _terminated)
+    _run_stage(*args)
+
+
+def _run_stage(stage, cfg, inbox, outbox, metrics, stop):
+    """
+    Worker body of a stage: takes the frames of inbox, runs the step and passes the results to outbox until stop
+    is set, recording the metrics of the stage.
+    """
+    step = stage.step(cfg)
+    service, wait, latency = (f"{stage.name}.{timer}" for timer in TIMERS)
+    frames, dropped = (f"{stage.name}.{counter}" for counter in COUNTERS)
+    # Output of the first stage when its frame is dropped, it still runs so its source is drained
+    scratch = None
+    try:
+        while not stop.is_set():
+            waiting = time.perf_counter()
+            # Room for the output first, a full queue holds this stage back (or drops the frame)
+            out = None
+            if outbox is not None:
+                out = outbox.reserve(0 if stage.policy == 'drop' else POLL_TIMEOUT)
+                if out is None and stage.policy == 'block':
+                    continue
+
+            frame = None
+            if inbox is not None:
+                frame = inbox.get(POLL_TIMEOUT)
+                if frame is None:
+                    if out is not None:
+                        outbox.cancel()
+                    continue
+
+            if outbox is not None and out is None:
+                if inbox is not None:
+                    metrics.add(dropped)
+                    inbox.release()
+                    continue
+                if scratch is None:
+                    scratch = np.zeros((), dtype=outbox.dtype)
+                # Only a frame the source delivered is dropped, not a capture timeout
+                if step(None, scratch) is not False:
+                    metrics.add(dropped)
+                continue
+
+            start = time.perf_counter()
+            if out is not None:
+                out['t0'] = start if frame is None else frame['t0']
+            done = step(frame, out) is not False
+            end = time.perf_counter()
+
+            if done:
+                t0 = out['t0'] if out is not None else frame['t0'] if frame is not None else start
+                metrics.add(frames)
+                metrics.record(service, end - start)
+                metrics.record(wait, start - waiting)
+                metrics.record(latency, end - t0)
+            if out is not None and done:
+                outbox.commit()
+            elif out is not None:
+                outbox.cancel()
+            if frame is not None:
+                inbox.release()
+    finally:
+        close = getattr(step, 'close', None)
+        if close is not None:
+            close()
@@ -1,26 +1,340 @@
 import numpy as np
-import queue
 import time
 
 # from streaming_base.mmwave.dataloader.adc import DCA1000 
-from streaming_base.processing.processing import process_frame, get_accumulated_time_data, process_frame_2d
+from streaming_base.processing.processing import process_frame, process_frame_2d, cfar_2d
+from streaming_base.processing.range_doppler import RangeDopplerProcessor
+from streaming_base.processing.buffers import SlowTimeBuffer
+from streaming_base.processing.beamforming import BEAMFORMERS, AdaptiveBeamformer, beamform_sparse, beamform_cells
 
 from task4_vital_signs_TODO import get_freq, get_br_hr
 from task3_tracking_TODO import beamform_2d
 
-from streaming_base.utils.utils import get_ant_pos_2d 
+from streaming_base.utils.utils import get_ant_pos_2d, get_ant_static_2d
+from streaming_base.processing.imaging import image_3d, order_by_chirp, point_cloud, POINT_DTYPE
+from streaming_base.processing.cfar import detection_dtype
+from streaming_base.streaming.shared_frames import write_points
+from streaming_base.streaming.pipeline import Pipeline, Stage
 from streaming_base.mmwave.dataloader.adcv3 import DCA1000
 
-def producer_real_time_1843(q, cfg_radar, cfg_cfar, config_port, data_port, static_ip, system_ip):
+def frame_dtype_1843(cfg_radar, cfg_cfar):
     """
-    Producer function for real-time data acquisition from the DCA1000 connected to the AWR1843 radar.
+    Structured dtype of the frames published by producer_real_time_1843, for its SharedFrameRing.
 
     Parameters
     ----------
-    q : queue.Queue
-        The queue to which the processed data will be sent.
+    cfg_radar : dict
+        Configuration parameters for the radar, see producer_real_time_1843.
+    cfg_cfar : dict
+        Configuration parameters for the CFAR processing, see producer_real_time_1843.
+
+    Returns
+    -------
+    dtype : np.dtype
+        The capture time t0 (time.perf_counter) and a single field bev, the (phi, range) float32 image, or a
+        capacity of points (angle-range detections with cfg_cfar["output"] 'points', at most cfg_cfar["max_points"])
+        or cloud (3D imaging points, at most cfg_radar["max_cloud_points"]) with their count.
+    """
+    if cfg_cfar.get('before_bf') != 2 and cfg_radar.get("bf_mode") == "3d":
+        return np.dtype([('t0', np.float64), ('count', np.int64),
+                         ('cloud', POINT_DTYPE, (cfg_radar.get("max_cloud_points", 4096),))])
+    if cfg_cfar.get('before_bf') != 2 and cfg_cfar['cfar_on'] and cfg_cfar.get('output') == 'points':
+        return np.dtype([('t0', np.float64), ('count', np.int64),
+                         ('points', detection_dtype(('angle', 'range')), (cfg_cfar.get("max_points", 512),))])
+    return np.dtype([('t0', np.float64), ('bev', np.float32, (len(cfg_radar["phi"]), len(cfg_radar["range_idx"])))])
+
+def frame_dtype_1843_task4(cfg_radar):
+    """
+    Structured dtype of the frames published by producer_real_time_1843_task4, for its SharedFrameRing.
+
+    Parameters
+    ----------
+    cfg_radar : dict
+        Configuration parameters for the radar, see producer_real_time_1843_task4.
+
+    Returns
+    -------
+    dtype : np.dtype
+        Fields t0 (capture time, time.perf_counter), rfft (normalized range profile), phase (phase history),
+        max_idx (range bin of the phase), freq and freqs (normalized spectrum of the phase and its frequencies, a
+        capacity of num_frames with their count) and bpm.
+    """
+    num_frames = cfg_radar['num_frames']
+    return np.dtype([('t0', np.float64), ('rfft', np.float64, (cfg_radar['samples_per_chirp'],)), ('phase', np.float64, (num_frames,)),
+                     ('max_idx', np.int64), ('count', np.int64), ('freq', np.float64, (num_frames,)),
+                     ('freqs', np.float64, (num_frames,)), ('bpm', np.float64, (2,))])
+
+class Capture():
+    """
+    Capture stage: receives the frames of the DCA1000 in its capture thread and passes the raw int16 data on, with
+    the time each frame was received as its t0.
+    """
+
+    def __init__(self, cfg):
+        cfg_radar, dca_cfg = cfg["radar"], cfg["dca"]
+        print("Starting producer for DCA1000 with ip " + dca_cfg["static_ip"] + " and system ip " + dca_cfg["system_ip"])
+        self.dca = DCA1000(static_ip=dca_cfg["static_ip"], adc_ip=dca_cfg["system_ip"], data_port=dca_cfg["data_port"],
+                           config_port=dca_cfg["config_port"])
+        self.dca.sensor_config(chirps=cfg_radar["num_tx"], chirp_loops=cfg_radar["num_doppler"],
+                               num_rx=cfg_radar["num_rx"], num_samples=cfg_radar["samples_per_chirp"])
+        self.dca.polling()
+        print("DCA1000 initialized.")
+        # The newest frame only (tracking), or every frame in order (vital signs need a continuous history)
+        self.read = self.dca.latest_frame if dca_cfg["latest"] else self.dca.get_frame
+
+    def __call__(self, frame, out):
+        adc_data = self.read(timeout=1)
+        if adc_data is None:
+            return False
+        out['raw'] = adc_data
+        out['t0'] = self.dca.frame_info['timestamp']
+
+    def close(self):
+        self.dca.close()
+
+class Organize():
+    """
+    Organize stage: raw int16 data to the (tx, rx, loops, samples) complex cube.
+    """
+
+    def __init__(self, cfg):
+        cfg_radar = cfg["radar"]
+        self.shape = (cfg_radar["num_tx"], cfg_radar["num_doppler"], cfg_radar["num_rx"], cfg_radar["samples_per_chirp"])
+
+    def __call__(self, frame, out):
+        num_tx, chirp_loops, num_rx, adc_samples = self.shape
+        DCA1000.organize_tdm(frame['raw'], num_tx, chirp_loops, num_rx, adc_samples, model='1843', out=out['cube'])
+
+class RangeFFT():
+    """
+    Range FFT stage of the tracking pipeline: window, range FFT, background subtraction, range bins of interest
+    and the average over the last frames, plus the range-Doppler cube of the cell beamformer.
+    """
+
+    def __init__(self, cfg):
+        cfg_radar, self.cfg_cfar = cfg["radar"], cfg["cfar"]
+        num_tx, num_rx = cfg_radar["num_tx"], cfg_radar["num_rx"]
+        chirp_loops, adc_samples = cfg_radar["num_doppler"], cfg_radar["samples_per_chirp"]
+        self.r_idxs = cfg_radar["range_idx"]
+        self.window = np.hamming(adc_samples).astype(np.float32)
+        self.last_range_fft = np.zeros((num_rx * num_tx, chirp_loops, adc_samples), dtype=np.complex128)
+        self.last_frames = SlowTimeBuffer(5, (num_rx * num_tx, chirp_loops, len(self.r_idxs)))
+
+        # Range-Doppler stage of the cell beamformer: windowed FFTs, clutter removal and TDM-MIMO phase compensation
+        self.rd_stage = None
+        if self.cfg_cfar.get('before_bf') == 2 and self.cfg_cfar.get('bf_cells'):
+            self.rd_stage = RangeDopplerProcessor(num_tx, num_rx, chirp_loops, adc_samples, range_idx=self.r_idxs,
+                                                  clutter_removal=cfg_radar.get("clutter_removal", False),
+                                                  workers=cfg_radar.get("fft_workers"))
+
+    def __call__(self, frame, out):
+        cube = frame['cube']
+        if self.rd_stage is not None:
+            out['rd_cube'], out['rd_map'] = self.rd_stage(cube)
+
+        # Apply Hamming window
+        cube *= self.window
+
+        # View the data as (num_tx*num_rx, chirp_loops, adc_samples)
+        adc_windowed = cube.reshape(-1, cube.shape[-2], cube.shape[-1])
+
+        # Apply FFT along the range dimension
+        range_fft = np.fft.fft(adc_windowed, axis=-1)
+
+        # Substract the last frame and keep only the corresponding range indices. The FFT is linear, so the
+        # range FFT of the last frame is kept instead of computing it again
+        if self.cfg_cfar['bg_sub']:
+            range_fft, self.last_range_fft = range_fft - self.last_range_fft, range_fft
+        else:
+            self.last_range_fft = range_fft
+        range_fft_s = range_fft[:, :, self.r_idxs]
+
+        # Set the static range indices to zero
+        range_fft_s[:, :, 0:4] = 0
+
+        # append current frame
+        self.last_frames.append(range_fft_s)
+        out['range_fft'] = range_fft_s
+        np.mean(self.last_frames.view(), axis=0, out=out['bf_input'])
+
+class Angle():
+    """
+    Angle stage of the tracking pipeline: the beamformer of cfg_radar["bf_mode"], the detect then beamform path
+    (cfg_cfar["before_bf"] 2) or the range-azimuth-elevation image, as magnitudes.
+    """
+
+    def __init__(self, cfg):
+        self.cfg_radar, self.cfg_cfar = cfg_radar, cfg_cfar = cfg["radar"], cfg["cfar"]
+        num_tx, num_rx = cfg_radar["num_tx"], cfg_radar["num_rx"]
+        adc_samples = cfg_radar["samples_per_chirp"]
+        r_idxs = cfg_radar["range_idx"]
+
+        # Get the antenna positions
+        x_locs, _, _ = get_ant_pos_2d(num_tx*num_rx, adc_samples, num_rx)
+        self.x_locs = x_locs[:, 0]
+
+        # 'loop' is beamform_2d of task 3, the other modes write into a preallocated image
+        self.bf_mode = bf_mode = cfg_radar.get("bf_mode", "loop")
+        if bf_mode == "loop":
+            self.beamformer, self.bf_kwargs = beamform_2d, {}
+        elif bf_mode == "3d":
+            # Range-azimuth-elevation image of the true virtual array (elevated TX). The positions are per physical
+            # TX, the cube per chirp slot: the lua configs send TX1 first, then TX0 and TX2
+            x_3d, z_3d = get_ant_static_2d(1, 3, num_rx, adc_samples)
+            tx_order = cfg_radar.get("tx_order", (1, 0, 2))[:num_tx]
+            self.x_3d, self.z_3d = order_by_chirp(x_3d, z_3d, tx_order, num_rx)
+            self.theta = cfg_radar.get("theta", np.deg2rad(np.arange(-40, 41, 5)))
+            self.voxels = np.empty((len(r_idxs), len(cfg_radar["phi"]), len(self.theta)), dtype=np.complex64)
+        elif bf_mode in ("mvdr", "music"):
+            # Covariances tracked over frames, the chirps of a frame are the snapshots. adaptive_bins restricts the
+            # spectra to some range bins (indices into range_idx), the cost is printed every 100 frames
+            self.adaptive = AdaptiveBeamformer(cfg_radar["phi"], self.x_locs, cfg_radar["lm"], len(r_idxs),
+                                               method=bf_mode, alpha=cfg_radar.get("cov_alpha", 0.1),
+                                               loading=cfg_radar.get("diag_loading", 1e-2),
+                                               num_sources=cfg_radar.get("num_sources", 2))
+            self.adaptive_bins = cfg_radar.get("adaptive_bins")
+            self.adaptive_cost = np.zeros(2)
+            self.bf_kwargs = {"out": np.empty((len(cfg_radar["phi"]), len(r_idxs)), dtype=np.complex64)}
+        else:
+            self.beamformer = BEAMFORMERS[bf_mode]
+            self.bf_kwargs = {"out": np.empty((len(cfg_radar["phi"]), len(r_idxs)), dtype=np.complex64)}
+        self.sparse_output = np.zeros((len(cfg_radar["phi"]), len(r_idxs)), dtype=np.complex64)
+
+    def __call__(self, frame, out):
+        cfg_radar, cfg_cfar = self.cfg_radar, self.cfg_cfar
+        bf_input = frame['bf_input']
+
+        # Detect then beamform: range-Doppler CFAR on the antenna averaged power, then angle spectra only for
+        # the detected range bins (or range-Doppler cells), scattered into the usual (phi, range) image
+        if cfg_cfar.get('before_bf') == 2:
+            if cfg_cfar.get('bf_cells'):
+                cells = np.nonzero(cfar_2d(frame['rd_map'], dict(cfg_cfar, output="dense"),
+                                           axes=('doppler', 'range')))
+                bf_output = beamform_cells(frame['rd_cube'], cfg_radar, self.x_locs, cells, out=self.sparse_output)
+            else:
+                cells = np.nonzero(process_frame(frame['range_fft'], dict(cfg_cfar, output="dense")))
+                bf_output = beamform_sparse(bf_input.squeeze(), cfg_radar, self.x_locs, np.unique(cells[1]),
+                                            out=self.sparse_output)
+        elif self.bf_mode == "3d":
+            image_3d(bf_input.squeeze(), cfg_radar["phi"], self.theta, self.x_3d, self.z_3d, cfg_radar["lm"],
+                     out=self.voxels)
+            np.abs(self.voxels, out=out['voxels'])
+            return
+        elif self.bf_mode in ("mvdr", "music"):
+            self.adaptive.update(frame['range_fft'])
+            bf_output = self.adaptive.spectrum(self.adaptive_bins, **self.bf_kwargs)
+            self.adaptive_cost += self.adaptive.timings['update'], self.adaptive.timings['spectrum']
+            if self.adaptive.num_updates % 100 == 0:
+                print(f"{self.bf_mode.upper()}: covariance update {self.adaptive_cost[0] * 10:.2f} ms, "
+                      f"spectrum {self.adaptive_cost[1] * 10:.2f} ms per frame")
+                self.adaptive_cost[:] = 0
+        else:
+            bf_output = self.beamformer(bf_input.squeeze(), cfg_radar, self.x_locs, **self.bf_kwargs)
+        np.abs(bf_output, out=out['image'])
+
+class Detect():
+    """
+    Detect stage of the tracking pipeline: CFAR, local maxima or point cloud of the angle stage output, in the
+    format published to the GUI (frame_dtype_1843).
+    """
+
+    def __init__(self, cfg):
+        self.cfg_radar, self.cfg_cfar = cfg["radar"], cfg["cfar"]
+        self.theta = self.cfg_radar.get("theta", np.deg2rad(np.arange(-40, 41, 5)))
+
+    def __call__(self, frame, out):
+        cfg_radar, cfg_cfar = self.cfg_radar, self.cfg_cfar
+        if 'cloud' in out.dtype.names:
+            cloud = point_cloud(frame['voxels'], cfg_radar["range_idx"], cfg_radar["phi"], self.theta,
+                                cfg_radar.get("cloud_threshold", 0.3))
+            write_points(out, 'cloud', cloud)
+            return
+
+        image = frame['image']
+        max_output = image.max() or 1
+        if 'points' in out.dtype.names:
+            # Only the local maxima (angle, range, power, snr) are published, not the whole map
+            write_points(out, 'points', process_frame_2d(image**2, cfg_cfar))
+        elif cfg_cfar['cfar_on'] and cfg_cfar.get('before_bf') != 2:
+            dets = process_frame_2d(image**2, cfg_cfar)
+            np.divide(dets, max_output, out=out['bev'])
+        else:
+            np.divide(image, max_output, out=out['bev'])
+
+class Publish():
+    """
+    Publish stage: copies the frames into the SharedFrameRing read by the GUI, which only shows the newest one.
+    """
+
+    def __init__(self, cfg):
+        self.ring = cfg["ring"]
+
+    def __call__(self, frame, out):
+        with self.ring.slot() as published:
+            for name in self.ring.dtype.names:
+                published[name] = frame[name]
+
+class RangeFFTTask4():
+    """
+    Range FFT stage of the vital signs pipeline: range profile of the sum of the antennas.
+    """
+
+    def __init__(self, cfg):
+        pass
+
+    def __call__(self, frame, out):
+        raw_all = frame['cube'].squeeze() # for heatrate/breathing rate we can just use one antenna
+        out['range_fft'] = np.fft.fft(np.sum(raw_all, axis=(0,1)), axis=-1)
+
+class Vitals():
+    """
+    Vital signs stage: phase history of the strongest range bin and its spectrum, in the format published to the
+    GUI (frame_dtype_1843_task4).
+    """
+
+    def __init__(self, cfg):
+        self.cfg_radar = cfg["radar"]
+        self.acc_time_data = SlowTimeBuffer(self.cfg_radar['num_frames'], (self.cfg_radar['samples_per_chirp'],))
+        self.second_p = 0
+
+    def __call__(self, frame, out):
+        # Compute breathing rate/heartrate
+        self.acc_time_data.append(frame['range_fft'])
+        range_fft = abs(frame['range_fft'])
+        phase_data, self.second_p, max_idx = get_br_hr(range_fft, self.acc_time_data.view(), self.second_p)
+        freq_data, freqs, bpm = get_freq(phase_data, self.cfg_radar['periodicity'])
+
+        np.divide(range_fft, np.max(range_fft), out=out['rfft'])
+        out['phase'] = phase_data
+        out['max_idx'] = max_idx
+        write_points(out, 'freq', freq_data / np.max(freq_data))
+        write_points(out, 'freqs', freqs)
+        out['bpm'] = bpm
+
+def _capture_stages(cfg_radar, latest):
+    """
+    Helper function declaring the capture and organize stages. The tracking pipeline drops frames the organize
+    stage has no room for, so the capture never waits, the vital signs pipeline keeps every frame.
+    """
+    num_tx, num_rx = cfg_radar["num_tx"], cfg_radar["num_rx"]
+    chirp_loops, adc_samples = cfg_radar["num_doppler"], cfg_radar["samples_per_chirp"]
+    raw_dtype = np.dtype([('raw', np.int16, (num_tx * chirp_loops * num_rx * adc_samples * 2,))])
+    cube_dtype = np.dtype([('cube', np.complex64, (num_tx, num_rx, chirp_loops, adc_samples))])
+    return [Stage("capture", Capture, raw_dtype, capacity=4, policy='drop' if latest else 'block'),
+            Stage("organize", Organize, cube_dtype)]
+
+def pipeline_1843(ring, cfg_radar, cfg_cfar, config_port, data_port, static_ip, system_ip, worker=None):
+    """
+    Tracking pipeline of the DCA1000 connected to the AWR1843 radar: capture -> organize -> range FFT -> angle
+    -> detect -> publish, each stage in its own worker.
+
+    Parameters
+    ----------
+    ring : streaming_base.streaming.shared_frames.SharedFrameRing
+        The shared-memory ring the processed frames are published to, of dtype frame_dtype_1843.
     cfg_radar : dict
         Configuration parameters for the radar, including range indices, number of transmitters, receivers, chirp loops, and ADC samples.
+        Optionally pipeline_worker, 'process' (default) or 'thread'.
     cfg_cfar : dict
         Configuration parameters for the CFAR processing, including number of training and guard cells, and threshold scale.
     config_port : str
@@ -31,106 +345,89 @@ def producer_real_time_1843(q, cfg_radar, cfg_cfar, config_port, data_port, stat
         The static IP address for the DCA1000.
     system_ip : str
         The system IP address.
+    worker : str
+        'process' or 'thread' for every stage, overriding cfg_radar["pipeline_worker"].
+
+    Returns
+    -------
+    pipeline : streaming_base.streaming.pipeline.Pipeline
+        The pipeline, not started.
     """
+    num_ant, chirp_loops = cfg_radar["num_tx"] * cfg_radar["num_rx"], cfg_radar["num_doppler"]
+    num_phi, num_range = len(cfg_radar["phi"]), len(cfg_radar["range_idx"])
 
-    # Parameters
-    r_idxs = cfg_radar["range_idx"]
-    num_tx = cfg_radar["num_tx"]
-    num_rx = cfg_radar["num_rx"]
-    chirp_loops = cfg_radar["num_doppler"]
-    adc_samples = cfg_radar["samples_per_chirp"]
-
-    last_frame = np.zeros((num_rx * num_tx, chirp_loops, adc_samples), dtype=np.complex64)
-    last_frames = np.zeros((5, num_rx * num_tx, chirp_loops, adc_samples), dtype=np.complex64)
-
-    # Get the antenna positions
-    x_locs, _, _ = get_ant_pos_2d(num_tx*num_rx, adc_samples, num_rx)
-
-    # Setup the DCA1000
-    print("Starting producer for DCA1000 with ip " + static_ip + " and system ip " + system_ip)
-    dca = DCA1000()
-    dca.sensor_config(chirps=num_tx, chirp_loops=chirp_loops, num_rx=num_rx, num_samples=adc_samples)
-    # dca = DCA1000(config_port=config_port, data_port=data_port, static_ip=static_ip, system_ip=system_ip)
-    print("DCA1000 initialized.")
-    try:
-        while True:
-            # Read data from DCA1000
-            # raw = dca.read(timeout=0.5, chirps=chirp_loops, rx=num_rx, tx=num_tx, samples=adc_samples)
-            # raw = read_packet(num_rx, num_tx, adc_samples)
-            adc_data = dca.read()
-            raw = dca.organize(raw_frame=adc_data, num_chirps=num_tx*chirp_loops,
-            num_rx=num_rx, num_samples=adc_samples, num_frames=1, model='1843') # frames x chirps x samples x rx
-            if raw is None:
-                continue
-            if not q.empty():
-                continue
-            
-            # raw = dca.organize(raw, chirp_loops, num_tx, num_rx, adc_samples) # shape = (chirp_loops*tx, rx, samples)
-            # Apply Hamming window
-            adc_windowed = raw * np.hamming(adc_samples)
-
-            # Reshape the data to (num_tx*num_rx, chirp_loops, adc_samples)
-            adc_windowed = adc_windowed.reshape(chirp_loops, num_tx, num_rx, adc_samples)
-            adc_windowed = adc_windowed.transpose(1, 2, 0, 3) # tx, rx, loops, adc samples
-            adc_windowed = adc_windowed.reshape(num_tx*num_rx, chirp_loops, adc_samples)
-
-            # Apply FFT along the range dimension
-            range_fft = np.fft.fft(adc_windowed, axis=-1)
-            last_frame_fft = np.fft.fft(last_frame, axis=-1)
-
-            # Update the last frame
-            last_frame = adc_windowed
-
-            # Substract the last frame and keep only the corresponding range indices
-            if cfg_cfar['bg_sub']:
-                range_fft = range_fft - last_frame_fft
-            range_fft_s = range_fft[:, :, r_idxs]
-
-            # Set the static range indices to zero
-            range_fft_s[:, :, 0:4] = 0 
-
-            # append current frame
-            last_frames[:-1] = last_frames[1:]
-            last_frames[-1] = range_fft_s
-
-            # Compute CFAR
-            # if cfg_cfar['before_bf'] == 2:
-            #     dets = process_frame(range_fft_s, cfg_cfar)
-            #     # # Compute beamforming
-            #     bf_output = beamform_2d_s(range_fft_s, cfg_radar, x_locs[:,0], dets)
-            #     dets = process_frame_2d(abs(bf_output), cfg_cfar)
-            #     bf_output = dets
-            
-            bf_input = np.mean(last_frames,axis=0)
-            bf_output = beamform_2d(bf_input.squeeze(), cfg_radar, x_locs[:,0])
-            max_output = abs(bf_output).max()
-            if cfg_cfar['cfar_on']: 
-                dets = process_frame_2d(abs(bf_output)**2, cfg_cfar)
-                bf_output = dets / max_output
-            else:
-                bf_output /= max_output
+    fft_fields = [('range_fft', np.complex64, (num_ant, chirp_loops, num_range)),
+                  ('bf_input', np.complex64, (num_ant, chirp_loops, num_range))]
+    if cfg_cfar.get('before_bf') == 2 and cfg_cfar.get('bf_cells'):
+        fft_fields += [('rd_cube', np.complex64, (num_ant, chirp_loops, num_range)),
+                       ('rd_map', np.float32, (chirp_loops, num_range))]
+    if cfg_cfar.get('before_bf') != 2 and cfg_radar.get("bf_mode") == "3d":
+        theta = cfg_radar.get("theta", np.deg2rad(np.arange(-40, 41, 5)))
+        angle_dtype = np.dtype([('voxels', np.float32, (num_range, num_phi, len(theta)))])
+    else:
+        angle_dtype = np.dtype([('image', np.float32, (num_phi, num_range))])
 
-            # Send the data to the queue
-            try:
-                q.put_nowait(("bev", (bf_output)))
-            except queue.Full:
-                continue
+    stages = _capture_stages(cfg_radar, latest=True) + [
+        Stage("range_fft", RangeFFT, np.dtype(fft_fields)),
+        Stage("angle", Angle, angle_dtype),
+        Stage("detect", Detect, frame_dtype_1843(cfg_radar, cfg_cfar)),
+        Stage("publish", Publish)]
+    cfg = {"radar": cfg_radar, "cfar": cfg_cfar, "ring": ring,
+           "dca": {"config_port": config_port, "data_port": data_port, "static_ip": static_ip,
+                   "system_ip": system_ip, "latest": True}}
+    return Pipeline(stages, cfg, worker=worker or cfg_radar.get("pipeline_worker", "process"))
 
-    except KeyboardInterrupt:
-        print("Producer for DCA1000 with ip " + static_ip + " and system ip " + system_ip + " stopped by user.")
-    # finally:
-        # dca.close()
+def pipeline_1843_task4(ring, cfg_radar, cfg_cfar, config_port, data_port, static_ip, system_ip, worker=None):
+    """
+    Vital signs pipeline of the DCA1000 connected to the AWR1843 radar: capture -> organize -> range FFT ->
+    vitals -> publish, each stage in its own worker. Every frame is processed, as the phase history must be
+    continuous, only the GUI skips frames.
 
-def producer_real_time_1843_task4(q, cfg_radar, cfg_cfar, config_port, data_port, static_ip, system_ip):
+    Parameters
+    ----------
+    ring : streaming_base.streaming.shared_frames.SharedFrameRing
+        The shared-memory ring the processed frames are published to, of dtype frame_dtype_1843_task4.
+    cfg_radar : dict
+        Configuration parameters for the radar, including range indices, number of transmitters, receivers, chirp loops, and ADC samples.
+        Optionally pipeline_worker, 'process' (default) or 'thread'.
+    config_port : str
+        The port for the DCA1000 configuration.
+    data_port : str
+        The port for the DCA1000 data.
+    static_ip : str
+        The static IP address for the DCA1000.
+    system_ip : str
+        The system IP address.
+    worker : str
+        'process' or 'thread' for every stage, overriding cfg_radar["pipeline_worker"].
+
+    Returns
+    -------
+    pipeline : streaming_base.streaming.pipeline.Pipeline
+        The pipeline, not started.
+    """
+    stages = _capture_stages(cfg_radar, latest=False) + [
+        Stage("range_fft", RangeFFTTask4, np.dtype([('range_fft', np.complex64, (cfg_radar["samples_per_chirp"],))])),
+        Stage("vitals", Vitals, frame_dtype_1843_task4(cfg_radar)),
+        Stage("publish", Publish)]
+    cfg = {"radar": cfg_radar, "cfar": cfg_cfar, "ring": ring,
+           "dca": {"config_port": config_port, "data_port": data_port, "static_ip": static_ip,
+                   "system_ip": system_ip, "latest": False}}
+    return Pipeline(stages, cfg, worker=worker or cfg_radar.get("pipeline_worker", "process"))
+
+def producer_real_time_1843(ring, cfg_radar, cfg_cfar, config_port, data_port, static_ip, system_ip):
     """
-    Producer function for real-time data acquisition from the DCA1000 connected to the AWR1843 radar.
+    Producer function for real-time data acquisition from the DCA1000 connected to the AWR1843 radar: runs
+    pipeline_1843 with every stage in a thread of the calling process, until interrupted.
 
     Parameters
     ----------
-    q : queue.Queue
-        The queue to which the processed data will be sent.
+    ring : streaming_base.streaming.shared_frames.SharedFrameRing
+        The shared-memory ring the processed frames are published to, of dtype frame_dtype_1843.
     cfg_radar : dict
-        Configuration parameters for the radar, including range indices, number of transmitters, receivers, chirp loops, and ADC samples. 
+        Configuration parameters for the radar, including range indices, number of transmitters, receivers, chirp loops, and ADC samples.
+    cfg_cfar : dict
+        Configuration parameters for the CFAR processing, including number of training and guard cells, and threshold scale.
     config_port : str
         The port for the DCA1000 configuration.
     data_port : str
@@ -140,66 +437,28 @@ def producer_real_time_1843_task4(q, cfg_radar, cfg_cfar, config_port, data_port
     system_ip : str
         The system IP address.
     """
+    pipeline_1843(ring, cfg_radar, cfg_cfar, config_port, data_port, static_ip, system_ip, worker='thread').run()
+    print("Producer for DCA1000 with ip " + static_ip + " and system ip " + system_ip + " stopped.")
+
+def producer_real_time_1843_task4(ring, cfg_radar, cfg_cfar, config_port, data_port, static_ip, system_ip):
+    """
+    Producer function for real-time data acquisition from the DCA1000 connected to the AWR1843 radar: runs
+    pipeline_1843_task4 with every stage in a thread of the calling process, until interrupted.
 
-    # Parameters
-    r_idxs = cfg_radar["range_idx"]
-    num_tx = cfg_radar["num_tx"]
-    num_rx = cfg_radar["num_rx"]
-    chirp_loops = cfg_radar["num_doppler"]
-    adc_samples = cfg_radar["samples_per_chirp"]
-
-    # Setup the DCA1000
-    print("Starting producer for DCA1000 with ip " + static_ip + " and system ip " + system_ip)
-    dca = DCA1000()
-    dca.sensor_config(chirps=num_tx, chirp_loops=chirp_loops, num_rx=num_rx, num_samples=adc_samples)
-
-    print("DCA1000 initialized.")
-            
-
-    last_frame = np.zeros((1, chirp_loops, adc_samples), dtype=np.complex64)
-    acc_time_data = np.zeros(shape=(cfg_radar['num_frames'], cfg_radar['samples_per_chirp']), dtype=np.complex128)
-    second_p = 0
-    try:
-        while True:
-            # Read data from DCA1000
-            # raw = read_packet(num_rx, num_tx, adc_samples)
-
-            adc_data = dca.read()
-            raw = dca.organize(raw_frame=adc_data, num_chirps=num_tx*chirp_loops,
-            num_rx=num_rx, num_samples=adc_samples, num_frames=1, model='1843') # frames x chirps x samples x rx
-            if raw is None:
-                continue
-            if not q.empty():
-                continue
-            
-            # Apply Hamming window
-            # adc_windowed = raw * np.hamming(adc_samples)
-
-            # Reshape the data to (num_tx*num_rx, chirp_loops, adc_samples)
-            raw = raw.reshape(chirp_loops, num_tx, num_rx, adc_samples)
-            raw = raw.transpose(1, 2, 0, 3) # tx, rx, loops, adc samples
-            # raw = raw.reshape(num_tx*num_rx, chirp_loops, adc_samples)
-            raw_all = raw.squeeze() # for heatrate/breathing rate we can just use one antenna
-            range_fft = np.fft.fft(np.sum(raw_all, axis=(0,1)), axis=-1)
-            raw = raw[0,-1,:,:].squeeze() # for heatrate/breathing rate we can just use one antenna
-            # raw = np.sum(raw[[0,2],:,:,:], axis=(0,1,2)) # for heatrate/breathing rate we can just use one antenna
-
-
-            # Compute breathing rate/heartrate 
-            acc_time_data  = get_accumulated_time_data(acc_time_data, range_fft)
-            range_fft = abs(range_fft)
-            phase_data, second_p, max_idx = get_br_hr(range_fft, acc_time_data, second_p)
-            freq_data, freqs, bpm = get_freq(phase_data, cfg_radar['periodicity'])
-            
-            # Send the data to the queue
-            try:
-                # q.put_nowait(("time", (acc_time_data)))
-                q.put(("data", (range_fft/np.max(range_fft), phase_data, max_idx, freq_data/np.max(freq_data), freqs, bpm))) 
-                # q.put_nowait(("freq", (freq_data)))
-            except queue.Full:
-                continue
-
-    except KeyboardInterrupt:
-        print("Producer for DCA1000 with ip " + static_ip + " and system ip " + system_ip + " stopped by user.")
-    # finally:
-        # dca.close()
\ No newline at end of file
+    Parameters
+    ----------
+    ring : streaming_base.streaming.shared_frames.SharedFrameRing
+        The shared-memory ring the processed frames are published to, of dtype frame_dtype_1843_task4.
+    cfg_radar : dict
+        Configuration parameters for the radar, including range indices, number of transmitters, receivers, chirp loops, and ADC samples. 
+    config_port : str
+        The port for the DCA1000 configuration.
+    data_port : str
+        The port for the DCA1000 data.
+    static_ip : str
+        The static IP address for the DCA1000.
+    system_ip : str
+        The system IP address.
+    """
+    pipeline_1843_task4(ring, cfg_radar, cfg_cfar, config_port, data_port, static_ip, system_ip, worker='thread').run()
+    print("Producer for DCA1000 with ip " + static_ip + " and system ip " + system_ip + " stopped.")
@@ -1,21 +1,21 @@
 # top-level: only safe, non-GUI imports
 import time
 import numpy as np
-from multiprocessing import Process, Queue
 
 # import the producer (should not import GUI libs)
-from streaming_base.streaming.prod_dca import producer_real_time_1843
+from streaming_base.streaming.prod_dca import pipeline_1843, frame_dtype_1843
+from streaming_base.streaming.shared_frames import SharedFrameRing
+from streaming_base.streaming.metrics import Metrics, MetricsReporter, GUI_TIMERS, GUI_COUNTERS
 
 # -------------------------
 # Visualization code is moved into a function so it is only imported/run
 # in the main process (no GUI imports at module top-level)
 # -------------------------
-def run_visualization(q1, cfg_radar, cfg_cfar):
+def run_visualization(ring, cfg_radar, cfg_cfar, metrics):
     # GUI imports done here (main process only)
     import warnings
     warnings.simplefilter("ignore", UserWarning)
 
-    from scipy.interpolate import RegularGridInterpolator
     from direct.showbase.ShowBase import ShowBase
     from direct.task import Task
 
@@ -28,19 +28,21 @@ def run_visualization(q1, cfg_radar, cfg_cfar):
     loadPrcFileData('', 'window-type none')   # no native GL window
     loadPrcFileData('', 'audio-library-name null')
 
-    from PyQt5 import QtWidgets
-
     # GUI-related helpers (move these imports here too)
     from streaming_base.visualization.visualization import (
         configure_ax_bf, 
     )
-    from streaming_base.utils.utils import cart2pol
+    from streaming_base.processing.resampling import PolarResampler
+    from streaming_base.visualization.renderer import BlitRenderer
 
 
     class MyApp(ShowBase):
-        def __init__(self, queue_1, cfg_radar):
+        def __init__(self, ring, cfg_radar, metrics):
             ShowBase.__init__(self)
-            self.q1 = queue_1
+            self.ring = ring
+            self.metrics = metrics
+            # Capture time of the newest frame read
+            self.t0 = None
             self.latest_msg = {}
             self.msg_count = set()
 
@@ -51,19 +53,15 @@ def run_visualization(q1, cfg_radar, cfg_cfar):
             self.ax = self.fig.add_subplot(111, projection='polar')
             self.ax.set_ylabel('')
             self.im = configure_ax_bf(self.ax, self.phi, self.r_idxs, 0, 0.3)  
-
-            self.last_frame_time = time.time()
-            self.frame_counter = 0
-            self.fps = 0
-            self.last_fps_time = time.time() 
+            # Detections sent as points by the producer (cfg_cfar["output"] == "points")
+            self.scatter = self.ax.scatter([], [], s=[], c='r')
+            # Point cloud of the 3D imaging mode (cfg_radar["bf_mode"] == "3d"), colored by height
+            self.cloud = self.ax.scatter([], [], s=12, c=[], cmap='jet')
 
             self.taskMgr.add(self.updateTask, "updateTask")
 
-            self.x = np.arange(-cfg_radar["width"], cfg_radar["width"], 1)
-            self.y = self.r_idxs
-            self.X, self.Y = np.meshgrid(self.x, self.y, indexing='xy')
-
-            self.cart2pol = cart2pol(self.X.ravel(), self.Y.ravel()) 
+            # Bilinear weights of the fixed polar <-> Cartesian BEV grids, the radar at the origin
+            self.resampler = PolarResampler(self.phi, self.r_idxs, cfg_radar["width"])
 
             self.last_artists = []
             num_ticks = 7
@@ -78,102 +76,118 @@ def run_visualization(q1, cfg_radar, cfg_cfar):
             self.ax.set_rticks(radial_bins)
             self.ax.set_yticklabels(radial_labels)
 
+            # Only the image and the points are redrawn, at most cfg_radar["display_fps"] times per second
+            self.renderer = BlitRenderer(self.fig, [self.im, self.scatter, self.cloud],
+                                         cfg_radar.get("display_fps", 30))
+            plt.show(block=False)
+
+        def shown(self, start):
+            # A frame was drawn: time of the update and latency since its capture
+            end = time.perf_counter()
+            self.metrics.record("update", end - start)
+            self.metrics.record("display_latency", end - self.t0)
+            self.metrics.add("frames_shown")
+
         def updateTask(self, task):
-            # NOTE: single queue, so don't enumerate tuples — just use it
-            try:
-                q = self.q1
-                while not q.empty():
-                    msg = q.get_nowait()
-                    if msg[0] == 'bev':
-                        # store with a fixed pid 0 (you only have q1)
-                        self.latest_msg[0] = msg[1]
-                        self.msg_count.add(0)
-            except Exception:
-                pass
+            # Sleeps until the next refresh, frames published meanwhile are skipped by the ring
+            self.renderer.wait()
+            start = time.perf_counter()
+            drawn = False
+            # Newest frame of the producer, the kind of frame is given by the fields of the ring
+            frame = self.ring.latest()
+            if frame is not None:
+                self.t0 = float(frame['t0'])
+                self.metrics.add("frames_read")
+                if 'bev' in frame.dtype.names:
+                    # store with a fixed pid 0 (you only have one radar)
+                    self.latest_msg[0] = frame['bev']
+                    self.msg_count.add(0)
+                elif 'points' in frame.dtype.names:
+                    self.latest_msg['points'] = frame['points'][:frame['count']]
+                    self.msg_count.add('points')
+                elif 'cloud' in frame.dtype.names:
+                    self.latest_msg['cloud'] = frame['cloud'][:frame['count']]
+                    self.msg_count.add('cloud')
+
+                stats = self.ring.stats
+                if stats['consumed'] % 500 == 0:
+                    print(f"Frames published {stats['published']}, shown {stats['consumed']}, "
+                          f"dropped {stats['dropped']}, overwritten {stats['overwritten']}")
+
+            if 'points' in self.msg_count:
+                points = self.latest_msg['points']
+                # The bev image is drawn flipped in phi, draw the points the same way
+                phi_idx = len(self.phi) - 1 - points['angle_interp']
+                theta = np.interp(phi_idx, np.arange(len(self.phi)), self.phi)
+                r = np.interp(points['range_interp'], np.arange(len(self.r_idxs)), self.r_idxs)
+                self.scatter.set_offsets(np.column_stack((theta, r)))
+                self.scatter.set_sizes(np.clip(points['snr'], 1, 40) * 2)
+                self.msg_count.discard('points')
+                drawn = True
+
+            if 'cloud' in self.msg_count:
+                cloud = self.latest_msg['cloud']
+                # Azimuth flipped like the bev image, range in bins
+                theta = self.phi[len(self.phi) - 1 - cloud['azimuth']]
+                self.cloud.set_offsets(np.column_stack((theta, self.r_idxs[cloud['range']])))
+                self.cloud.set_array(cloud['z'])
+                z_max = np.abs(cloud['z']).max() if len(cloud) else 1.0
+                self.cloud.set_clim(-z_max, z_max)
+                self.msg_count.discard('cloud')
+                drawn = True
 
             if self.msg_count == {0}:
                 bf_1 = self.latest_msg[0]
 
-                # NOTE: you used self.x1/self.y1 in original — ensure those exist.
-                # If radars are at origin, set to 0. Adjust as you need.
-                self.x1 = getattr(self, "x1", 0.0)
-                self.y1 = getattr(self, "y1", 0.0)
-
-                phi1 = np.arctan2((self.Y - self.y1).ravel(), (self.X - self.x1).ravel())
-                r1 = np.hypot(self.X.ravel() - self.x1, self.Y.ravel() - self.y1)
-                cart2pol1 = np.column_stack((phi1, r1))
-
-                interp1 = RegularGridInterpolator(
-                    (self.phi, self.r_idxs),
-                    bf_1,
-                    method='linear', bounds_error=False, fill_value=0
-                )
-                Z1 = interp1(cart2pol1).reshape(self.X.shape)
-                Z_cart = Z1
-
-                interp_cart2pol = RegularGridInterpolator(
-                    (self.y, self.x),
-                    Z_cart,
-                    method='linear',
-                    bounds_error=False,
-                    fill_value=0
-                )
-
-                PHI, R = np.meshgrid(self.phi, self.r_idxs, indexing='ij')
-                pts_back = np.column_stack(((R * np.sin(PHI)).ravel(), (R * np.cos(PHI)).ravel()))
-                Z_polar = interp_cart2pol(pts_back).reshape(PHI.shape)
-                Z_polar = np.flip(Z_polar, axis=0)
-
-                to_plot = np.abs(Z_polar)
+                # polar -> Cartesian -> polar with the precomputed sparse operator, flipped in phi
+                to_plot = self.resampler.round_trip(bf_1)
+                np.abs(to_plot, out=to_plot)
                 mx = np.max(to_plot) if np.max(to_plot) != 0 else 1.0
                 to_plot /= mx 
-                to_plot = to_plot
 
                 self.im.set_array(to_plot.ravel()) 
-
-                # # FPS update
-                # current_time = time.time()
-                # self.frame_counter += 1
-                # if current_time - self.last_fps_time >= 1.0:
-                #     self.fps = self.frame_counter / (current_time - self.last_fps_time)
-                #     self.last_fps_time = current_time
-                #     self.frame_counter = 0
- 
-                self.fig.canvas.draw_idle() 
-                QtWidgets.QApplication.processEvents()
                 self.msg_count.clear()
-                plt.pause(0.001)
+                drawn = True
+
+            if drawn:
+                self.renderer.render()
+                self.shown(start)
 
             return Task.cont
 
     # instantiate and run (this stays in the main process)
-    app = MyApp(q1, cfg_radar)
+    app = MyApp(ring, cfg_radar, metrics)
     app.run()
 
 
 # -------------------------
 # main guard: run producer in child, GUI in main
 # -------------------------
-def main(cfg_radar, cfg_cfar):
-    q_main_1 = Queue(maxsize=1)
+def main(cfg_radar, cfg_cfar, static_ip="192.168.33.30", system_ip="192.168.33.180"):
+    # Shared-memory ring of the frames, sized for the output of the producer configuration
+    ring = SharedFrameRing(frame_dtype_1843(cfg_radar, cfg_cfar))
 
-    producer = Process(
-        target=producer_real_time_1843,
-        args=(q_main_1, cfg_radar, cfg_cfar, 4096, 4098, "192.168.33.30", "192.168.33.180"),
-        daemon=True
-    )
-    producer.start()
+    # Every stage of the producer in its own process
+    pipeline = pipeline_1843(ring, cfg_radar, cfg_cfar, 4096, 4098, static_ip, system_ip)
+    pipeline.start()
     print("Producer started, launching visualization in main process...")
 
+    # Latency and throughput of every stage and of the GUI, as JSON lines to cfg_radar["metrics_path"] (or stdout)
+    gui_metrics = Metrics("gui", GUI_TIMERS, GUI_COUNTERS)
+    reporter = MetricsReporter([pipeline.metrics, gui_metrics], cfg_radar.get("metrics_period", 10.),
+                               cfg_radar.get("metrics_path"))
+    reporter.start()
+
     # run visualization (no GUI imports in child process)
-    run_visualization(q_main_1, cfg_radar, cfg_cfar)
+    run_visualization(ring, cfg_radar, cfg_cfar, gui_metrics)
 
     # if run_visualization ever returns, do cleanup
     try:
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
-        producer.terminate()
-        producer.join()
+        reporter.stop()
+        pipeline.stop()
+        ring.close()
         print("Shutdown complete.")
 
@@ -1,17 +1,18 @@
 # top-level: only safe, non-GUI imports
 import time
 import numpy as np
-from multiprocessing import Process, Queue
 
 # import the producer (should not import GUI libs)
-from streaming_base.streaming.prod_dca import producer_real_time_1843_task4
+from streaming_base.streaming.prod_dca import pipeline_1843_task4, frame_dtype_1843_task4
+from streaming_base.streaming.shared_frames import SharedFrameRing
+from streaming_base.streaming.metrics import Metrics, MetricsReporter, GUI_TIMERS, GUI_COUNTERS
 
 # -------------------------
 # Visualization code is moved into a function so it is only imported/run
 # in the main process (no GUI imports at module top-level)
 # -------------------------
 
-def run_visualization(q1, cfg_radar):
+def run_visualization(ring, cfg_radar, metrics):
     # GUI imports done here (main process only)
     import warnings
     warnings.simplefilter("ignore", UserWarning)
@@ -29,15 +30,16 @@ def run_visualization(q1, cfg_radar):
     loadPrcFileData('', 'window-type none')   # no native GL window
     loadPrcFileData('', 'audio-library-name null')
 
-    from PyQt5 import QtWidgets
-
-    from streaming_base.utils.utils import cart2pol
+    from streaming_base.visualization.renderer import BlitRenderer
 
 
     class MyApp(ShowBase):
-        def __init__(self, queue_1, cfg_radar):
+        def __init__(self, ring, cfg_radar, metrics):
             ShowBase.__init__(self)
-            self.q1 = queue_1
+            self.ring = ring
+            self.metrics = metrics
+            # Capture time of the newest frame read
+            self.t0 = None
             self.latest_msg = {}
             self.msg_count = set()
             self.num_frames = cfg_radar['num_frames']
@@ -73,7 +75,7 @@ def run_visualization(q1, cfg_radar):
             self.freq_y_data = np.zeros_like(self.freq_x_data)
             self.line_freq, = self.ax_freq.plot(self.freq_x_data, self.freq_y_data)
             self.ax_freq.set_ylim(self.freq_range)
-            self.text_freq = self.ax_freq.text(0.90, 0.85, "0" , fontsize=40, transform=self.ax_freq.transAxes, verticalalignment='top', ha='right')
+            self.text_freq = self.ax_freq.text(0.5, 0.95, "", fontsize=20, transform=self.ax_freq.transAxes, ha='center', va='top')
             self.ax_freq.set_title('Freq Data')
 
             # self.ax_freq.set_xticks(np.arange(0, self.num_frames , 20)) 
@@ -102,18 +104,37 @@ def run_visualization(q1, cfg_radar):
 
             self.last_artists = []
 
+            # Only the lines and the text are redrawn, the axes when their limits change, at most
+            # cfg_radar["display_fps"] times per second
+            self.renderer = BlitRenderer(self.fig, [self.line_phase, self.line_fft, self.point_plot, self.line_freq,
+                                                    self.text_freq], cfg_radar.get("display_fps", 30))
+            plt.show(block=False)
+
+        def shown(self, start):
+            # A frame was drawn: time of the update and latency since its capture
+            end = time.perf_counter()
+            self.metrics.record("update", end - start)
+            self.metrics.record("display_latency", end - self.t0)
+            self.metrics.add("frames_shown")
+
         def updateTask(self, task):
-            # NOTE: single queue, so don't enumerate tuples — just use it
-            try:
-                q = self.q1
-                while not q.empty():
-                    msg = q.get_nowait()
-                    if msg[0] == 'data':
-                        # store with a fixed pid 0 (you only have q1)
-                        self.latest_msg[0] = msg[1]
-                        self.msg_count.add(0) 
-            except Exception:
-                pass
+            # Sleeps until the next refresh, frames published meanwhile are skipped by the ring
+            self.renderer.wait()
+            start = time.perf_counter()
+            # Newest frame of the producer, as (rfft, phase, max_idx, freq, freqs, bpm)
+            frame = self.ring.latest()
+            if frame is not None:
+                self.t0 = float(frame['t0'])
+                self.metrics.add("frames_read")
+                count = frame['count']
+                self.latest_msg[0] = (frame['rfft'], frame['phase'], int(frame['max_idx']), frame['freq'][:count],
+                                      frame['freqs'][:count], frame['bpm'])
+                self.msg_count.add(0)
+
+                stats = self.ring.stats
+                if stats['consumed'] % 500 == 0:
+                    print(f"Frames published {stats['published']}, shown {stats['consumed']}, "
+                          f"dropped {stats['dropped']}, overwritten {stats['overwritten']}")
 
             if self.msg_count == {0}:
                 rfft = self.latest_msg[0][0]
@@ -125,11 +146,12 @@ def run_visualization(q1, cfg_radar):
 
                 self.phase_y_data = phase                       
                 self.line_phase.set_ydata(self.phase_y_data)
-                self.ax_time.set_ylim([np.min(self.phase_y_data)-0.001, np.max(self.phase_y_data)+0.001])
+                self.renderer.autoscale(self.ax_time, 'y', np.min(self.phase_y_data), np.max(self.phase_y_data),
+                                        min_pad=0.001)
 
                 self.fft_y_data = rfft
                 self.line_fft.set_ydata(self.fft_y_data) 
-                self.ax_rfft.set_ylim([np.min(self.fft_y_data)-1, np.max(self.fft_y_data)+1]) 
+                self.renderer.autoscale(self.ax_rfft, 'y', np.min(self.fft_y_data), np.max(self.fft_y_data), min_pad=1)
                 self.point_x = max_idx
                 self.point_y = rfft[self.point_x]   
                 self.point_plot.set_data([self.point_x], [self.point_y])
@@ -138,57 +160,62 @@ def run_visualization(q1, cfg_radar):
                 self.freq_x_data = freq_inds
                 self.line_freq.set_ydata(self.freq_y_data)
                 self.line_freq.set_xdata(self.freq_x_data)
-                self.ax_freq.set_xlim([self.freq_x_data[0]-1e-5, self.freq_x_data[-1]+1e-5])
-                self.ax_freq.set_ylim([0,max(1e-5,np.max(self.freq_y_data))])
-                self.text_freq.remove()
-                self.text_freq = self.ax_freq.text(0.5, 0.95,"BR and HR in XPM is " + str(bpm),fontsize=20,transform=self.ax_freq.transAxes,ha='center',va='top')
-                num_ticks = 7
+                self.renderer.autoscale(self.ax_freq, 'y', 0, max(1e-5, np.max(self.freq_y_data)), lower=0)
+                self.text_freq.set_text("BR and HR in XPM is " + str(bpm))
 
-                # Pick evenly spaced radial ticks across your range bins
-                bins = np.linspace(self.freq_x_data.min(), self.freq_x_data.max(), num_ticks)
+                # The frequencies only change with the configuration, so do the ticks
+                if self.renderer.set_lim(self.ax_freq, 'x', (self.freq_x_data[0]-1e-5, self.freq_x_data[-1]+1e-5)):
+                    num_ticks = 7
 
-                # Convert them to meter labels (or whatever 0.04 means)
-                labels = [f"{rb * 60:.2f}" for rb in bins]
+                    # Pick evenly spaced radial ticks across your range bins
+                    bins = np.linspace(self.freq_x_data.min(), self.freq_x_data.max(), num_ticks)
 
-                # Apply ticks to the polar axis
-                self.ax_freq.set_xticks(bins)
-                self.ax_freq.set_xticklabels(labels)
+                    # Convert them to meter labels (or whatever 0.04 means)
+                    labels = [f"{rb * 60:.2f}" for rb in bins]
+
+                    # Apply ticks to the polar axis
+                    self.ax_freq.set_xticks(bins)
+                    self.ax_freq.set_xticklabels(labels)
 
-                self.fig.canvas.draw_idle() 
-                QtWidgets.QApplication.processEvents()
                 self.msg_count.clear()
-                plt.pause(0.0025)
+                self.renderer.render()
+                self.shown(start)
 
             return Task.cont
          
     # instantiate and run (this stays in the main process)
-    app = MyApp(q1, cfg_radar)
+    app = MyApp(ring, cfg_radar, metrics)
     app.run()
 
 
 # -------------------------
 # main guard: run producer in child, GUI in main
 # -------------------------
-def main(cfg_radar, cfg_cfar):
-    q_main_1 = Queue(maxsize=1)
-
-    producer = Process(
-        target=producer_real_time_1843_task4,
-        args=(q_main_1, cfg_radar, cfg_cfar, 4096, 4098, "192.168.33.30", "192.168.33.180"),
-        daemon=True
-    )
-    producer.start()
+def main(cfg_radar, cfg_cfar, static_ip="192.168.33.30", system_ip="192.168.33.180"):
+    # Shared-memory ring of the frames, the producer never waits for the GUI
+    ring = SharedFrameRing(frame_dtype_1843_task4(cfg_radar))
+
+    # Every stage of the producer in its own process
+    pipeline = pipeline_1843_task4(ring, cfg_radar, cfg_cfar, 4096, 4098, static_ip, system_ip)
+    pipeline.start()
     print("Producer started, launching visualization in main process...")
 
+    # Latency and throughput of every stage and of the GUI, as JSON lines to cfg_radar["metrics_path"] (or stdout)
+    gui_metrics = Metrics("gui", GUI_TIMERS, GUI_COUNTERS)
+    reporter = MetricsReporter([pipeline.metrics, gui_metrics], cfg_radar.get("metrics_period", 10.),
+                               cfg_radar.get("metrics_path"))
+    reporter.start()
+
     # run visualization (no GUI imports in child process)
-    run_visualization(q_main_1, cfg_radar)
+    run_visualization(ring, cfg_radar, gui_metrics)
 
     # if run_visualization ever returns, do cleanup
     try:
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
-        producer.terminate()
-        producer.join()
+        reporter.stop()
+        pipeline.stop()
+        ring.close()
         print("Shutdown complete.")
 
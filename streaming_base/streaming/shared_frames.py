@@ -0,0 +1,334 @@
+import multiprocessing
+import os
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Counters at the start of the shared block, followed by the sequence number of every slot. LAST_READ is the
+# number of frames published when the consumer last read
+PUBLISHED, CONSUMED, DROPPED, OVERWRITTEN, LAST_READ = range(5)
+NUM_COUNTERS = 5
+# Slots start on a cache line
+ALIGNMENT = 64
+
+
+class SharedFrameRing():
+    """
+    Latest-wins frame transport between a producer and a consumer process, over a ring of fixed-shape slots in
+    shared memory.
+
+    Every slot holds one record of a structured dtype (e.g. the beamforming image, or a capacity of points and
+    their count). The producer writes straight into the next slot and publishes it, so nothing is pickled and
+    the data is copied at most once; the consumer copies the newest published slot. Each slot has a sequence
+    number, odd while it is written, so a copy is retried if the producer lapped the ring and overwrote the slot
+    meanwhile. One producer and one consumer are supported, and the counters rely on aligned 64-bit stores not
+    being torn, which holds on x86 and ARM.
+
+    The consumer counts the published frames it never saw (dropped, as only the newest is read) and the copies
+    invalidated by the producer (overwritten), both visible to the producer through stats.
+
+    Examples
+    --------
+    >>> ring = SharedFrameRing(np.dtype([('bev', np.float32, (180, 128))]))
+    >>> Process(target=producer, args=(ring, ...)).start()     # the ring is pickled by name
+    >>> with ring.slot() as frame:                             # in the producer
+    ...     np.divide(bf_output, max_output, out=frame['bev'])
+    >>> frame = ring.latest()                                  # in the consumer, None if nothing new
+    """
+
+    def __init__(self, dtype, num_slots=3, name=None):
+        """
+        Parameters
+        ----------
+        dtype : np.dtype
+            Structured dtype of a frame.
+        num_slots : int
+            Number of slots, at least 2 so the newest frame is never the one being written.
+        name : str
+            Name of an existing ring to attach to, a new one is created if None.
+        """
+        if num_slots < 2:
+            raise ValueError(f"A ring needs at least 2 slots, got {num_slots}")
+        self.dtype = np.dtype(dtype)
+        self.num_slots = num_slots
+        self._slot_size = -(-self.dtype.itemsize // ALIGNMENT) * ALIGNMENT
+        self._offset = -(-8 * (NUM_COUNTERS + num_slots) // ALIGNMENT) * ALIGNMENT
+
+        # Pid of the creator, a forked child inherits the object but must not free the block
+        self._owner = os.getpid() if name is None else None
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=self._offset + num_slots * self._slot_size)
+        else:
+            # Processes started by the creator share its resource tracker, which frees the block only once
+            self._shm = shared_memory.SharedMemory(name=name)
+        self._map()
+        if self._owner:
+            self._header[:] = 0
+        self._last = int(self._header[LAST_READ])
+        self._frame = None
+
+    def _map(self):
+        """
+        Helper function to view the counters and slots of the shared block.
+        """
+        buf = self._shm.buf
+        self._header = np.ndarray((NUM_COUNTERS + self.num_slots,), dtype=np.int64, buffer=buf)
+        self._seq = self._header[NUM_COUNTERS:]
+        self._slots = [np.ndarray((), dtype=self.dtype, buffer=buf, offset=self._offset + i * self._slot_size)
+                       for i in range(self.num_slots)]
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __getstate__(self):
+        # Processes attach to the same block by name instead of copying it
+        return {'dtype': self.dtype, 'num_slots': self.num_slots, 'name': self.name}
+
+    def __setstate__(self, state):
+        self.__init__(state['dtype'], state['num_slots'], state['name'])
+
+    @contextmanager
+    def slot(self):
+        """
+        Context manager giving the next slot to the producer, published on exit. If the block raises, the frame
+        is not published.
+
+        Yields
+        ------
+        frame : np.ndarray
+            0-d structured array in shared memory, fill its fields in place.
+        """
+        published = int(self._header[PUBLISHED])
+        index = published % self.num_slots
+        self._seq[index] += 1
+        try:
+            yield self._slots[index]
+        except BaseException:
+            self._seq[index] += 1
+            raise
+        self._seq[index] += 1
+        self._header[PUBLISHED] = published + 1
+
+    def put(self, **fields):
+        """
+        Writes and publishes a frame, copying every given field into the next slot.
+
+        Parameters
+        ----------
+        **fields : np.ndarray
+            Values of the fields, by name. Fields not given keep the values of an older frame.
+        """
+        with self.slot() as frame:
+            for field, value in fields.items():
+                frame[field] = value
+
+    def latest(self, out=None):
+        """
+        Copies the newest published frame, if it was not read yet. Frames published since the previous call but
+        older than the newest are counted as dropped.
+
+        Parameters
+        ----------
+        out : np.ndarray
+            Optional 0-d array of the ring dtype to copy into. A buffer of the ring is reused if None, valid until
+            the next call.
+
+        Returns
+        -------
+        frame : np.ndarray
+            0-d structured array with the newest frame, or None if no new frame was published.
+        """
+        if out is None:
+            if self._frame is None:
+                self._frame = np.zeros((), dtype=self.dtype)
+            out = self._frame
+
+        while True:
+            published = int(self._header[PUBLISHED])
+            if published == self._last:
+                return None
+            index = (published - 1) % self.num_slots
+            seq = int(self._seq[index])
+            if seq % 2 == 0:
+                out[...] = self._slots[index]
+                if int(self._seq[index]) == seq:
+                    break
+            # The producer lapped the ring and is writing this slot, try the newest frame again
+            self._header[OVERWRITTEN] += 1
+
+        self._header[DROPPED] += published - self._last - 1
+        self._header[CONSUMED] += 1
+        self._header[LAST_READ] = self._last = published
+        return out
+
+    def unread(self):
+        """Whether the newest published frame was not read by the consumer yet."""
+        return int(self._header[PUBLISHED]) != int(self._header[LAST_READ])
+
+    @property
+    def stats(self):
+        """Frames published, consumed, dropped and overwritten, as a dict."""
+        return {'published': int(self._header[PUBLISHED]), 'consumed': int(self._header[CONSUMED]),
+                'dropped': int(self._header[DROPPED]), 'overwritten': int(self._header[OVERWRITTEN])}
+
+    def close(self):
+        """
+        Detaches from the shared block, and frees it if this process created it.
+        """
+        if self._shm is None:
+            return
+        # Views of the block must be released before it is closed
+        self._header = self._seq = self._slots = None
+        self._shm.close()
+        if self._owner == os.getpid():
+            self._shm.unlink()
+        self._shm = None
+
+
+class SharedFrameQueue():
+    """
+    Bounded FIFO of fixed-shape frames in shared memory, between one producer and one consumer (processes or
+    threads).
+
+    Unlike SharedFrameRing every frame is delivered, in order. Two semaphores count the free and the filled slots,
+    so a full queue gives backpressure: reserve waits for a free slot, or returns None at once to let the
+    producer drop the frame. Both sides work in place, the producer fills the reserved slot and the consumer
+    reads the slot returned by get, so frames are never pickled nor copied by the queue.
+
+    Examples
+    --------
+    >>> frames = SharedFrameQueue(np.dtype([('cube', np.complex64, (3, 4, 64, 256))]), capacity=4)
+    >>> frame = frames.reserve()           # producer, None on timeout
+    >>> dca.organize_tdm(adc_data, 3, 64, 4, 256, out=frame['cube'])
+    >>> frames.commit()
+    >>> frame = frames.get(timeout=0.1)    # consumer, None on timeout
+    >>> range_fft = np.fft.fft(frame['cube'], axis=-1)
+    >>> frames.release()
+    """
+
+    def __init__(self, dtype, capacity=2, name=None, semaphores=None):
+        """
+        Parameters
+        ----------
+        dtype : np.dtype
+            Structured dtype of a frame.
+        capacity : int
+            Number of slots.
+        name : str
+            Name of an existing queue to attach to, a new one is created if None.
+        semaphores : tuple
+            Free and filled slot semaphores of the existing queue.
+        """
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        self._slot_size = -(-self.dtype.itemsize // ALIGNMENT) * ALIGNMENT
+
+        self._owner = os.getpid() if name is None else None
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=capacity * self._slot_size)
+            self._free, self._filled = multiprocessing.Semaphore(capacity), multiprocessing.Semaphore(0)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._free, self._filled = semaphores
+        self._slots = [np.ndarray((), dtype=self.dtype, buffer=self._shm.buf, offset=i * self._slot_size)
+                       for i in range(capacity)]
+        # Frames reserved and read by this side, each side only uses its own counter
+        self._written = 0
+        self._read = 0
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __getstate__(self):
+        # Processes attach to the same block by name instead of copying it
+        return {'dtype': self.dtype, 'capacity': self.capacity, 'name': self.name,
+                'semaphores': (self._free, self._filled)}
+
+    def __setstate__(self, state):
+        self.__init__(state['dtype'], state['capacity'], state['name'], state['semaphores'])
+
+    def reserve(self, timeout=None):
+        """
+        Gives the next free slot to the producer, to fill and then commit.
+
+        Parameters
+        ----------
+        timeout : float
+            Seconds to wait for a free slot, None to wait forever and 0 to return at once.
+
+        Returns
+        -------
+        frame : np.ndarray
+            0-d structured array in shared memory, or None if the queue stayed full.
+        """
+        if not self._free.acquire(timeout != 0, timeout if timeout else None):
+            return None
+        return self._slots[self._written % self.capacity]
+
+    def commit(self):
+        """Hands the slot given by reserve to the consumer."""
+        self._written += 1
+        self._filled.release()
+
+    def cancel(self):
+        """Gives the slot given by reserve back without committing it."""
+        self._free.release()
+
+    def get(self, timeout=None):
+        """
+        Oldest committed frame, to read in place and then release.
+
+        Parameters
+        ----------
+        timeout : float
+            Seconds to wait for a frame, None to wait forever and 0 to return at once.
+
+        Returns
+        -------
+        frame : np.ndarray
+            0-d structured array in shared memory, or None if the queue stayed empty.
+        """
+        if not self._filled.acquire(timeout != 0, timeout if timeout else None):
+            return None
+        return self._slots[self._read % self.capacity]
+
+    def release(self):
+        """Gives the slot returned by get back to the producer."""
+        self._read += 1
+        self._free.release()
+
+    def close(self):
+        """
+        Detaches from the shared block, and frees it if this process created it.
+        """
+        if self._shm is None:
+            return
+        self._slots = None
+        self._shm.close()
+        if self._owner == os.getpid():
+            self._shm.unlink()
+        self._shm = None
+
+
+def write_points(frame, field, values, count_field='count'):
+    """
+    Writes a variable number of points into a fixed capacity field of a frame, keeping the first ones if there
+    are more than the capacity.
+
+    Parameters
+    ----------
+    frame : np.ndarray
+        0-d structured frame, e.g. a slot of SharedFrameRing.
+    field : str
+        Field of shape (capacity,).
+    values : np.ndarray
+        Points to write.
+    count_field : str
+        Integer field receiving the number of points written.
+    """
+    count = min(len(values), frame[field].shape[0])
+    frame[field][:count] = values[:count]
+    frame[count_field] = count
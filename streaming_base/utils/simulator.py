@@ -0,0 +1,201 @@
+import numpy as np
+
+from streaming_base.mmwave.dataloader.emulator import interleave
+from streaming_base.processing.imaging import order_by_chirp
+from streaming_base.utils.utils import get_ant_static_2d
+
+# Default values of a target, see simulate_frames
+TARGET_DEFAULTS = {
+    "range": 1.,            # m
+    "azimuth": 90.,         # deg, phi convention of the README (90 is boresight)
+    "elevation": 0.,        # deg
+    "velocity": 0.,         # m/s, positive moving away
+    "rcs": 1.,              # m^2
+    "breath_amp": 0.,       # m, chest displacement
+    "breath_bpm": 15.,
+    "heart_amp": 0.,        # m
+    "heart_bpm": 70.,
+}
+
+
+def get_target_params(targets):
+    """
+    Collects a list of target dictionaries into one array per parameter, filling in TARGET_DEFAULTS.
+
+    Parameters
+    ----------
+    targets : list of dict
+        Targets, each with any of the keys of TARGET_DEFAULTS.
+
+    Returns
+    -------
+    params : dict
+        Array of shape (num_targets,) for every key of TARGET_DEFAULTS.
+    """
+    for target in targets:
+        unknown = set(target) - set(TARGET_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown target parameters {sorted(unknown)}")
+    return {key: np.array([target.get(key, default) for target in targets], dtype=float)
+            for key, default in TARGET_DEFAULTS.items()}
+
+
+def simulate_frames(chirp_dict, targets, num_frames, start_frame=0, ant_pos=None, tx_order=(1, 0, 2), noise=1.,
+                    gain=1e3, seed=None):
+    """
+    Synthesizes the complex ADC data of a TDM-MIMO FMCW radar observing point targets.
+
+    Every target follows range(t) = range + velocity * t plus a breathing and a heartbeat sinusoid, so the
+    Doppler and vital sign phase come out of the round trip delay of every chirp. The antenna phase follows the
+    convention of the README: the signal of a virtual antenna at (x, z) is proportional to
+    exp(-j 2pi/lm (x cos(phi) cos(el) + z sin(el))), which the steering vector exp(+j 2pi/lm x cos(phi)) undoes.
+    All frames, chirps, antennas and samples are computed at once, looping only over the targets.
+
+    Parameters
+    ----------
+    chirp_dict : dict
+        Radar parameters as returned by utils.utility.read_radar_params.
+    targets : list of dict
+        Targets, see TARGET_DEFAULTS for the keys and units.
+    num_frames : int
+        Number of frames to synthesize.
+    start_frame : int
+        Index of the first frame, sets the time of the frames so consecutive calls continue each other.
+    ant_pos : tuple of np.ndarray
+        x and z positions of the num_tx * num_rx virtual antennas per physical transmitter (tx major), defaults
+        to get_ant_static_2d.
+    tx_order : sequence of int
+        Physical transmitter of every chirp slot, (1, 0, 2) for the lua configs of the repo which send TX1 first,
+        then TX0 and TX2. The positions of ant_pos go through imaging.order_by_chirp with it, so the chirps come
+        out like those of the DCA1000. range(num_tx) if ant_pos is already in chirp order.
+    noise : float
+        Standard deviation of the complex noise in ADC counts per I/Q part.
+    gain : float
+        Amplitude in ADC counts of a 1 m^2 target at 1 m.
+    seed : int
+        Seed of the noise.
+
+    Returns
+    -------
+    frames : np.ndarray
+        complex64 data of shape (frames, chirps, rx, samples), chirps ordered loop by loop and chirp slot by chirp
+        slot like DCA1000.organize returns them.
+    """
+    num_tx = chirp_dict['num_tx']
+    num_rx = chirp_dict['num_rx']
+    num_loops = chirp_dict['chirp_loops']
+    num_samples = chirp_dict['samples_per_chirp']
+    num_chirps = num_tx * num_loops
+    c = 3e8
+    lm = c / chirp_dict['start_freq']
+    slope = chirp_dict['slope']
+
+    if ant_pos is None:
+        ant_pos = get_ant_static_2d(num_frames, num_tx, num_rx, num_samples)
+    x_ant, z_ant = order_by_chirp(ant_pos[0], ant_pos[1], tx_order[:num_tx], num_rx)
+    x_ant = np.reshape(x_ant, (num_tx, num_rx))
+    z_ant = np.reshape(z_ant, (num_tx, num_rx))
+
+    # Time of every chirp (frames, chirps) and of every sample within a chirp
+    frame_t = (start_frame + np.arange(num_frames)) * chirp_dict['periodicity'] * 1e-3
+    chirp_t = np.arange(num_chirps) * (chirp_dict['idle_time'] + chirp_dict['ramp_end_time'])
+    t = frame_t[:, None] + chirp_t[None, :]
+    sample_t = chirp_dict['adc_start_time'] + np.arange(num_samples) / chirp_dict['sample_rate']
+    slot_of_chirp = np.arange(num_chirps) % num_tx
+
+    params = get_target_params(targets)
+    frames = np.zeros((num_frames, num_chirps, num_rx, num_samples), dtype=np.complex64)
+    for i in range(len(targets)):
+        rng = (params['range'][i] + params['velocity'][i] * t
+               + params['breath_amp'][i] * np.sin(2 * np.pi * params['breath_bpm'][i] / 60 * t)
+               + params['heart_amp'][i] * np.sin(2 * np.pi * params['heart_bpm'][i] / 60 * t))
+        tau = 2 * rng / c
+
+        # Beat tone in fast time with the carrier phase of the round trip delay (frames, chirps, samples)
+        beat = np.exp(2j * np.pi * (tau[:, :, None] * slope * sample_t[None, None, :] + rng[:, :, None] * 2 / lm))
+        beat = beat.astype(np.complex64)
+
+        # Phase of every virtual antenna (chirp slot, rx), picked per chirp by its slot
+        phi = np.deg2rad(params['azimuth'][i])
+        el = np.deg2rad(params['elevation'][i])
+        ant = np.exp(-2j * np.pi / lm * (x_ant * np.cos(phi) * np.cos(el) + z_ant * np.sin(el)))
+
+        amp = gain * np.sqrt(params['rcs'][i]) / params['range'][i] ** 2
+        frames += (amp * ant[slot_of_chirp]).astype(np.complex64)[None, :, :, None] * beat[:, :, None, :]
+
+    if noise:
+        rng = np.random.default_rng(seed)
+        frames.real += rng.normal(0, noise, frames.shape).astype(np.float32)
+        frames.imag += rng.normal(0, noise, frames.shape).astype(np.float32)
+    return frames
+
+
+def simulate_raw(chirp_dict, targets, num_frames, chunk=256, tx_order=(1, 0, 2), seed=None, **kwargs):
+    """
+    Synthesizes frames in the int16 layout the DCA1000 streams and the TI .bin files hold.
+
+    Frames are generated in chunks so memory stays bounded for long captures.
+
+    Parameters
+    ----------
+    chirp_dict : dict
+        Radar parameters as returned by utils.utility.read_radar_params.
+    targets : list of dict
+        Targets, see TARGET_DEFAULTS.
+    num_frames : int
+        Number of frames to synthesize.
+    chunk : int
+        Number of frames synthesized at once.
+    tx_order : sequence of int
+        Physical transmitter of every chirp slot, see simulate_frames, (1, 0, 2) like the lua configs.
+    seed : int
+        Seed of the noise.
+    kwargs : dict
+        Extra arguments of simulate_frames.
+
+    Returns
+    -------
+    raw : np.ndarray
+        int16 data of shape (frames, int16 per frame).
+    """
+    raw = None
+    seeds = np.random.SeedSequence(seed).spawn(-(-num_frames // chunk))
+    for start, chunk_seed in zip(range(0, num_frames, chunk), seeds):
+        frames = simulate_frames(chirp_dict, targets, min(chunk, num_frames - start), start_frame=start,
+                                 tx_order=tx_order, seed=chunk_seed, **kwargs)
+        data = interleave(frames)
+        if raw is None:
+            raw = np.empty((num_frames, data.shape[1]), dtype=np.int16)
+        raw[start:start + len(data)] = data
+    return raw
+
+
+def write_raw_bin(path, chirp_dict, targets, num_frames, chunk=256, tx_order=(1, 0, 2), seed=None, **kwargs):
+    """
+    Writes synthesized frames as a *_Raw_0.bin capture, chunk by chunk.
+
+    Parameters
+    ----------
+    path : str
+        Output file.
+    chirp_dict : dict
+        Radar parameters as returned by utils.utility.read_radar_params.
+    targets : list of dict
+        Targets, see TARGET_DEFAULTS.
+    num_frames : int
+        Number of frames to synthesize.
+    chunk : int
+        Number of frames synthesized at once.
+    tx_order : sequence of int
+        Physical transmitter of every chirp slot, see simulate_frames, (1, 0, 2) like the lua configs.
+    seed : int
+        Seed of the noise.
+    kwargs : dict
+        Extra arguments of simulate_frames.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(-(-num_frames // chunk))
+    with open(path, 'wb') as f:
+        for start, chunk_seed in zip(range(0, num_frames, chunk), seeds):
+            frames = simulate_frames(chirp_dict, targets, min(chunk, num_frames - start), start_frame=start,
+                                     tx_order=tx_order, seed=chunk_seed, **kwargs)
+            interleave(frames).tofile(f)
@@ -0,0 +1,177 @@
+import time
+
+
+class BlitRenderer():
+    """
+    Frame-rate capped renderer of a matplotlib figure that redraws only its changing artists.
+
+    The artists updated every frame (QuadMesh arrays, lines, scatters, texts) are animated: a full draw renders
+    everything else once and caches it as the background, then every frame restores the background, draws the
+    animated artists and blits the figure. The background is captured again after every full draw, e.g. on a
+    resize or when the limits of an axis change (set_lim, autoscale), so the axes, ticks and labels are only
+    rendered when they change. wait() paces the GUI loop at max_fps and keeps the GUI events processed, so the
+    display refresh rate is independent of the producer rate and the GUI sleeps instead of competing with the DSP.
+
+    Examples
+    --------
+    >>> renderer = BlitRenderer(fig, [im, line], max_fps=30)
+    >>> plt.show(block=False)
+    >>> while True:
+    ...     renderer.wait()
+    ...     im.set_array(ring.latest()['bev'].ravel())
+    ...     renderer.autoscale(ax, 'y', line_data.min(), line_data.max())
+    ...     renderer.render()
+    """
+
+    def __init__(self, fig, artists=(), max_fps=30):
+        """
+        Parameters
+        ----------
+        fig : matplotlib.figure.Figure
+            The figure to render.
+        artists : list of matplotlib.artist.Artist
+            Artists updated every frame, more can be added with add.
+        max_fps : float
+            Maximum number of renders per second, None for no cap.
+        """
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.artists = []
+        for artist in artists:
+            self.add(artist)
+        self.period = 1. / max_fps if max_fps else 0.
+        self._next = time.perf_counter()
+        self._background = None
+        self._cid = self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def add(self, artist):
+        """
+        Adds an artist updated every frame.
+
+        Parameters
+        ----------
+        artist : matplotlib.artist.Artist
+            Artist of the figure.
+
+        Returns
+        -------
+        artist : matplotlib.artist.Artist
+            The same artist, animated.
+        """
+        artist.set_animated(True)
+        self.artists.append(artist)
+        return artist
+
+    def invalidate(self):
+        """Renders the whole figure again at the next render, e.g. after changing ticks or labels."""
+        self._background = None
+
+    def _on_draw(self, event):
+        """
+        Helper function capturing the background after every full draw, and drawing the artists on it.
+        """
+        if event is not None and event.canvas is not self.canvas:
+            return
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        """
+        Helper function drawing the animated artists.
+        """
+        for artist in self.artists:
+            self.fig.draw_artist(artist)
+
+    def render(self):
+        """
+        Renders the figure: only the animated artists on the cached background, or a full draw if the background
+        was invalidated. Falls back to a full draw on canvases that cannot blit.
+        """
+        if not self.canvas.supports_blit:
+            self.canvas.draw_idle()
+        elif self._background is None:
+            # Captures the background in _on_draw
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self._background)
+            self._draw_artists()
+            self.canvas.blit(self.fig.bbox)
+        self.canvas.flush_events()
+
+    def wait(self):
+        """
+        Processes the GUI events and sleeps until the next render is due at max_fps.
+        """
+        self.canvas.flush_events()
+        now = time.perf_counter()
+        if self._next > now:
+            time.sleep(self._next - now)
+            now = self._next
+        # A late render does not make the next ones catch up
+        self._next = max(self._next + self.period, now)
+
+    def set_lim(self, ax, axis, lim):
+        """
+        Sets the limits of an axis if they change, which invalidates the background.
+
+        Parameters
+        ----------
+        ax : matplotlib.axes.Axes
+            The axes.
+        axis : str
+            'x' or 'y'.
+        lim : tuple of float
+            New (lower, upper) limits.
+
+        Returns
+        -------
+        changed : bool
+            Whether the limits changed, so ticks depending on them can be updated.
+        """
+        get_lim, set_lim = (ax.get_xlim, ax.set_xlim) if axis == 'x' else (ax.get_ylim, ax.set_ylim)
+        if tuple(get_lim()) == tuple(lim):
+            return False
+        set_lim(lim)
+        self.invalidate()
+        return True
+
+    def autoscale(self, ax, axis, low, high, margin=0.1, shrink=0.5, min_pad=0., lower=None):
+        """
+        Fits the limits of an axis to the data range with some headroom, keeping them while the data stays within
+        them and spans at least shrink of them, so the background is rarely invalidated.
+
+        Parameters
+        ----------
+        ax : matplotlib.axes.Axes
+            The axes.
+        axis : str
+            'x' or 'y'.
+        low : float
+            Minimum of the data.
+        high : float
+            Maximum of the data.
+        margin : float
+            Headroom on each side, as a fraction of the data range.
+        shrink : float
+            The limits are fitted again when the data spans less than this fraction of them.
+        min_pad : float
+            Minimum headroom on each side, e.g. for constant data.
+        lower : float
+            Fixed lower limit, e.g. 0 for a spectrum.
+
+        Returns
+        -------
+        changed : bool
+            Whether the limits changed.
+        """
+        low = low if lower is None else lower
+        current_low, current_high = ax.get_xlim() if axis == 'x' else ax.get_ylim()
+        span = high - low
+        if low >= current_low and high <= current_high and span >= shrink * (current_high - current_low):
+            return False
+        pad = max(margin * span, min_pad)
+        return self.set_lim(ax, axis, (low - pad if lower is None else lower, high + pad))
+
+    def close(self):
+        """Disconnects the renderer from the figure."""
+        self.canvas.mpl_disconnect(self._cid)
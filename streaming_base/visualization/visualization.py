@@ -1,5 +1,5 @@
 import numpy as np
-import matplotlib.cm as cm
+import matplotlib
 import matplotlib.patches as mpatches
 
 
@@ -87,6 +87,10 @@ def update_ax_gtrack(ax, tracks, last_artists):
     """
     Update the GTRACK visualization axes with the current tracks.
 
+    The artists are reused between updates: the circles of all the tracks are a single scatter and the arrows a
+    single quiver, updated in place, and the legend is only rebuilt when the track IDs change. The quiver is
+    created again when the number of tracks changes, as its number of arrows is fixed.
+
     Parameters:
     ----------
     ax : matplotlib.axes.Axes
@@ -94,11 +98,9 @@ def update_ax_gtrack(ax, tracks, last_artists):
     tracks : list of dict
         List of track dictionaries containing 'pos', 'vel', 'uid', and 'status'.
     last_artists : list
+        Artists of the previous update, [scatter, quiver, legend], empty before the first update. Updated in place.
     """
 
-    for art in last_artists:
-        art.remove()
-    last_artists.clear()
     # Filter active tracks
     active = [tr for tr in tracks if tr['status'] == 'ACTIVE']
 
@@ -107,7 +109,7 @@ def update_ax_gtrack(ax, tracks, last_artists):
 
     # Defined colormap
     TRACK_COLORS = {}
-    PALETTE = cm.get_cmap('Set2')
+    PALETTE = matplotlib.colormaps['Set2']
 
     def get_color_for_uid(uid):
         if uid not in TRACK_COLORS:
@@ -116,44 +118,51 @@ def update_ax_gtrack(ax, tracks, last_artists):
             TRACK_COLORS[uid] = PALETTE(next_idx)
         return TRACK_COLORS[uid]
 
-    # Draw each track
-    for tr in tracks:
-        x, y        = tr['pos']
-        vx, vy      = tr['vel']
-        uid         = tr['uid']
-        col         = get_color_for_uid(uid)
-        col_edge    = col
-
-        if tr['status'] != 'ACTIVE':
-            col = 'None'
-
-        # Draw circle for each track
-        sc = ax.scatter(x, y,
-                   s=500,
-                   facecolor=col,
-                   edgecolor=col_edge,
-                   linewidth=3,
-                   zorder=3)
-
-        # Draw arrow for each track
-        qv = ax.quiver(x, y, vx, vy,
-                  angles='xy',
-                  scale_units='xy',
-                  scale=0.3,
-                  width=0.005,
-                  color=col)
-
-        last_artists.extend([sc, qv])
-
-    # Build legend
-    handles = [
-        mpatches.Patch(color=get_color_for_uid(uid), label=str(uid))
-        for uid in ids
-    ]
-    leg = ax.legend(handles=handles,
-              title='Track ID',
-              loc='center left',
-              bbox_to_anchor=(1.02, 0.5),
-              borderaxespad=0.0)
-
-    last_artists.append(leg)
+    pos = np.array([tr['pos'] for tr in tracks], dtype=float).reshape(-1, 2)
+    vel = np.array([tr['vel'] for tr in tracks], dtype=float).reshape(-1, 2)
+    edge = np.array([get_color_for_uid(tr['uid']) for tr in tracks]).reshape(-1, 4)
+    # Inactive tracks are drawn as empty circles
+    face = edge.copy()
+    face[[tr['status'] != 'ACTIVE' for tr in tracks]] = 0
+
+    if not last_artists:
+        sc = ax.scatter([], [], s=500, linewidth=3, zorder=3)
+        last_artists.extend([sc, None, None])
+    sc, qv, leg = last_artists
+
+    # Circle for each track
+    sc.set_offsets(pos)
+    sc.set_facecolors(face)
+    sc.set_edgecolors(edge)
+
+    # Arrow for each track
+    if qv is not None and qv.N != len(tracks):
+        qv.remove()
+        qv = None
+    if qv is None and len(tracks):
+        qv = ax.quiver(pos[:, 0], pos[:, 1], vel[:, 0], vel[:, 1],
+                       angles='xy',
+                       scale_units='xy',
+                       scale=0.3,
+                       width=0.005)
+    if qv is not None:
+        qv.set_offsets(pos)
+        qv.set_UVC(vel[:, 0], vel[:, 1])
+        qv.set_color(face)
+    last_artists[1] = qv
+
+    # Build legend when the track IDs or their colors change
+    key = [(str(uid), tuple(get_color_for_uid(uid))) for uid in ids]
+    if leg is None or [(text.get_text(), tuple(patch.get_facecolor()))
+                       for text, patch in zip(leg.get_texts(), leg.get_patches())] != key:
+        if leg is not None:
+            leg.remove()
+        handles = [
+            mpatches.Patch(color=get_color_for_uid(uid), label=str(uid))
+            for uid in ids
+        ]
+        last_artists[2] = ax.legend(handles=handles,
+                                    title='Track ID',
+                                    loc='center left',
+                                    bbox_to_anchor=(1.02, 0.5),
+                                    borderaxespad=0.0)
@@ -3,7 +3,7 @@ import numpy as np
 import os
 import utils.save_adc_data as sd
 import utils.utility as utility
-from utils.singlechip_raw_data_reader_example import TI_PROCESSOR
+from utils.capture_cache import load_capture
 import matplotlib.pyplot as plt
 import scipy
 import argparse
@@ -82,16 +82,14 @@ def main(args):
     chirp_dict = utility.read_radar_params(args.config + '.lua')
     print(chirp_dict['range_res'])
     # Put the path (relative to home_dir) and name of the JSON files (exlude the .setup.json and .mmwave.json), you should not have to edit this
-    processor = TI_PROCESSOR()
 
     # temp file that has your chirp parameters 
     mmwave_dict, setup_dict, mmwave_filename, setup_filename = sd.process_json_files(json_filename, chirp_dict, exp_path, args.exp_name)
 
     # this reads the data from the binary file and puts it into a nice array for you
-    adc_data = processor.rawDataReader(setup_dict, mmwave_dict, os.path.join(exp_path, args.exp_name), 'tmp_rdc.mat')
-    adc_data = np.stack(adc_data, axis=-1)
+    # decoded once and cached in data/.capture_cache, later runs just memory map it
+    adc_data = load_capture(setup_dict, mmwave_dict, chirp_dict)
     # in the end the data will be of shape (number of frames x number of transmitters x number of receivers x number of samples per chirp aka adc samples)
-    adc_data = np.reshape(adc_data, (adc_data.shape[0], adc_data.shape[1], adc_data.shape[2], adc_data.shape[3]))
 
     print("You captured %d frames, for %d TX, %d Rx, and %d adc samples" % adc_data.shape)
 
@@ -5,8 +5,9 @@ import os
 import scipy
 import utils.save_adc_data as sd
 import utils.utility as utility
-from utils.singlechip_raw_data_reader_example import TI_PROCESSOR
+from utils.capture_cache import load_capture
 from streaming_base.processing.processing import process_frame_2d
+from streaming_base.processing.buffers import SlowTimeBuffer
 from streaming_base.utils.utils import get_ant_pos_2d
 # from task3_tracking_TODO import  beamform_2d
 from task2_ranging_TODO import rangefft
@@ -85,6 +86,7 @@ def parse_args():
     parser = argparse.ArgumentParser(description="Configure and capture radar data from mmWave Studio.")
     parser.add_argument("--config",type=str, default='scripts/1843_config_debug_task3',help="Run the radar configuration Lua script before capturing.",)
     parser.add_argument("--exp_name",type=str, default='task3_gt',help="Run the radar configuration Lua script before capturing.",)
+    parser.add_argument("--cfar_batch",type=int, default=1,help="Number of frames CFAR runs on at once, the display is updated after every batch.",)
 
     return parser.parse_args()
 
@@ -107,13 +109,11 @@ def main(args):
     # num_rx, num_tx, adc_samples, periodicity, num_frames, chirp_loops
     chirp_dict = utility.read_radar_params(config_lua_script)
 
-    processor = TI_PROCESSOR()
     # temp file
     mmwave_dict, setup_dict, mmwave_filename, setup_filename = sd.process_json_files(json_filename, chirp_dict, exp_path, args.exp_name)
 
-    adc_data = processor.rawDataReader(setup_dict, mmwave_dict, os.path.join(exp_path, args.exp_name), 'tmp_rdc.mat')
-    adc_data = np.stack(adc_data, axis=-1)
-    adc_data = np.reshape(adc_data, (adc_data.shape[0], adc_data.shape[1], adc_data.shape[2], adc_data.shape[3]))
+    # decoded once and cached in data/.capture_cache, later runs just memory map it
+    adc_data = load_capture(setup_dict, mmwave_dict, chirp_dict)
 
     num_frames = adc_data.shape[0]
     print("You captured %d frames, for %d TX, %d Rx, and %d adc samples" % adc_data.shape)
@@ -173,35 +173,46 @@ def main(args):
     rfft = rfft.transpose(1, 2, 0, 3) # tx, rx, frames, adc samples
     rfft = rfft.reshape(chirp_dict['num_tx']*chirp_dict['num_rx'], num_frames, chirp_dict['samples_per_chirp'])
     rfft = rfft.transpose(1,0,2) # frames, trx, adc samples
-    last_frames = np.zeros((5, chirp_dict['num_tx']*chirp_dict['num_rx'], chirp_dict['samples_per_chirp']), dtype=np.complex64)
+    last_frames = SlowTimeBuffer(5, (chirp_dict['num_tx']*chirp_dict['num_rx'], chirp_dict['samples_per_chirp']))
 
+    # power maps of the frames waiting for CFAR, at most args.cfar_batch of them
+    bf_window = None
+    num_waiting = 0
     for frame in range(0, rfft.shape[0]):
         # Apply FFT along the range dimension
         range_fft = rfft[frame]
 
-        last_frames[:-1] = last_frames[1:]
-        last_frames[-1] = range_fft
+        last_frames.append(range_fft)
 
         # Set the static range indices to zero
         range_fft[:, 0:5] = 0
         range_fft = np.reshape(range_fft,(range_fft.shape[0],1,range_fft.shape[-1]))
 
-        bf_input = np.mean(last_frames,axis=0)
+        bf_input = np.mean(last_frames.view(),axis=0)
 
         bf_output = beamform_2d(bf_input.squeeze(), cfg_radar, x_locs[:,0])
-        dets = process_frame_2d(abs(bf_output)**2, cfg_cfar)
-        bf_output = dets 
-        if bf_output.shape != (len(phi), len(r_idxs)):
-            print("ERROR: bf_output shape =", bf_output.shape,
-                "expected =", (len(phi), len(r_idxs)))
+        if bf_window is None:
+            bf_window = np.zeros((max(args.cfar_batch, 1),) + bf_output.shape, dtype=np.float64)
+        bf_window[num_waiting] = abs(bf_output)**2
+        num_waiting += 1
+        if num_waiting < len(bf_window) and frame < rfft.shape[0] - 1:
             continue
-        Z = np.abs(bf_output)
 
-        im.set_array(Z.ravel())                # efficient
-        im.set_clim(0, Z.max() + 1e-9)         # normalize color scale
-
-        fig.canvas.draw_idle()
-        fig.canvas.flush_events()
+        # CFAR on the waiting frames at once, then show them
+        dets = process_frame_2d(bf_window[:num_waiting], cfg_cfar)
+        num_waiting = 0
+        for bf_output in dets:
+            if bf_output.shape != (len(phi), len(r_idxs)):
+                print("ERROR: bf_output shape =", bf_output.shape,
+                    "expected =", (len(phi), len(r_idxs)))
+                continue
+            Z = np.abs(bf_output)
+
+            im.set_array(Z.ravel())                # efficient
+            im.set_clim(0, Z.max() + 1e-9)         # normalize color scale
+
+            fig.canvas.draw_idle()
+            fig.canvas.flush_events()
         
 
 
@@ -3,6 +3,7 @@ import numpy as np
 import utils.utility as utility
 from streaming_base.streaming import realtime_streaming_task3 
 import argparse
+from streaming_base.mmwave.dataloader import emulator
 from utils.read_com import find_com_port, update_com_port_in_file
 import os 
 
@@ -13,7 +14,7 @@ import os
     Goal of this task: debug run your code in real time!
 '''
 
-def main(cfar_on):
+def main(cfar_on, ips=()):
     """
     Main function to start the real-time radar streaming and processing.
     """
@@ -36,7 +37,17 @@ def main(cfar_on):
         "sample_rate": chirp_dict['sample_rate'],
         "c": 3e8,
         "lm": 3e8 / 77e9,
-        "slope": chirp_dict['sample_rate']
+        "slope": chirp_dict['sample_rate'],
+        "clutter_removal": False,   # range-Doppler stage of bf_cells: remove the zero Doppler reflections,
+                                    # needs CHIRP_LOOPS > 1 in the lua (ignored with a single loop)
+        "fft_workers": None,        # threads of its scipy.fft calls
+        "tx_order": (1, 0, 2),      # physical TX of every chirp slot, as in the ChirpConfig calls of the lua
+        "metrics_path": None,       # JSON lines of the stage and GUI latencies, printed if None
+        "metrics_period": 10,       # seconds between two lines
+        "display_fps": 30,          # maximum refresh rate of the GUI, independent of the frame rate
+        "bf_mode": "loop"       # 'loop' runs your beamform_2d, 'matmul' or 'fft' the vectorized beamformers,
+                                # '3d' a range-azimuth-elevation point cloud, 'mvdr' or 'music' the adaptive
+                                # angle spectra (optional "cov_alpha", "diag_loading", "num_sources", "adaptive_bins")
     }
     # Parameters for CFAR
     cfg_cfar = {
@@ -46,13 +57,17 @@ def main(cfar_on):
         "num_train_d": 10,
         "num_guard_r": 4,
         "num_guard_d": 2,
-        "threshold_scale": 1e-3
+        "threshold_scale": 1e-3,
+        "method": "ca",         # 'ca', 'os', 'go' or 'so'
+        "output": "dense",      # 'points' sends only the detected peaks to the GUI
+        "before_bf": 0,         # 2 runs range-Doppler CFAR first and beamforms only the detected range bins
+        "bf_cells": False       # with before_bf 2, beamform every detected range-Doppler cell instead
     }
 
     print("Starting streaming...")
 
     # Start the streaming process
-    realtime_streaming_task3.main(cfg_radar, cfg_cfar)
+    realtime_streaming_task3.main(cfg_radar, cfg_cfar, *ips)
 
 if __name__ == "__main__":
     
@@ -60,6 +75,8 @@ if __name__ == "__main__":
     # Add arguments
     parser.add_argument("--config",  action="store_true", help="True if you want to configure the radar from python.")
     parser.add_argument("--cfar", action="store_true", help="True if you want cfar.")
+    parser.add_argument("--emulate", nargs="?", const="", default=None, metavar="BIN",
+                        help="Stream from a local DCA1000 emulator instead of the board, replaying BIN if given.")
     args = parser.parse_args()
 
     current_dir = os.getcwd()
@@ -72,4 +89,15 @@ if __name__ == "__main__":
     if args.config:
         radar1 = radar()
         radar1.mmwave_config(config_lua_script)
-    main(args.cfar)
\ No newline at end of file
+
+    # Local DCA1000 emulator for running without the board
+    ips = ()
+    dca_emulator = None
+    if args.emulate is not None:
+        dca_emulator = emulator.spawn(chirp_dict, args.emulate)
+        ips = ("127.0.0.1", "127.0.0.2")
+    try:
+        main(args.cfar, ips)
+    finally:
+        if dca_emulator is not None:
+            dca_emulator.terminate()
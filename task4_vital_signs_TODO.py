@@ -6,7 +6,7 @@ import scipy
 import scipy.io as sio
 import utils.save_adc_data as sd
 import utils.utility as utility
-from utils.singlechip_raw_data_reader_example import TI_PROCESSOR
+from utils.capture_cache import load_capture
 # from task4_vital_signs_TODO_old import get_br_hr, get_freq 
 from task2_ranging_TODO import rangefft
 import argparse
@@ -133,13 +133,11 @@ def main(args):
     # this function reads the parameters from your lua config file (look at this function to see how it expects your config file to be formatted)
     # num_rx, num_tx, adc_samples, periodicity, num_frames, chirp_loops
     chirp_dict = utility.read_radar_params(config_lua_script)
-    processor = TI_PROCESSOR()
     # temp file
     mmwave_dict, setup_dict, mmwave_filename, setup_filename = sd.process_json_files(json_filename, chirp_dict, exp_path, args.exp_name)
 
-    adc_data = processor.rawDataReader(setup_dict, mmwave_dict, os.path.join(exp_path, args.exp_name), 'tmp_rdc.mat')
-    adc_data = np.stack(adc_data, axis=-1)
-    adc_data = np.reshape(adc_data, (adc_data.shape[0], adc_data.shape[1], adc_data.shape[2], adc_data.shape[3]))
+    # decoded once and cached in data/.capture_cache, later runs just memory map it
+    adc_data = load_capture(setup_dict, mmwave_dict, chirp_dict)
 
     print("You captured %d frames, for %d TX, %d Rx, and %d adc samples" % adc_data.shape)
 
@@ -3,6 +3,7 @@ import numpy as np
 import utils.utility as utility
 from streaming_base.streaming import realtime_streaming_task4
 import argparse
+from streaming_base.mmwave.dataloader import emulator
 from utils.read_com import find_com_port, update_com_port_in_file
 import os
 
@@ -13,7 +14,7 @@ import os
     Goal of this task: debug run your code in real time!
 '''
 
-def main():
+def main(ips=()):
     """
     Main function to start the real-time radar streaming and processing.
     """
@@ -48,13 +49,15 @@ def main():
     print("Starting streaming...")
 
     # Start the streaming process
-    realtime_streaming_task4.main(cfg_radar, cfg_cfar)
+    realtime_streaming_task4.main(cfg_radar, cfg_cfar, *ips)
 
 if __name__ == "__main__":
     
     parser = argparse.ArgumentParser(description="Command line arguments.")
     # Add arguments
     parser.add_argument("--config",  action="store_true", help="True if you want to configure the radar from python.")
+    parser.add_argument("--emulate", nargs="?", const="", default=None, metavar="BIN",
+                        help="Stream from a local DCA1000 emulator instead of the board, replaying BIN if given.")
     args = parser.parse_args()
 
     current_dir = os.getcwd()
@@ -68,4 +71,15 @@ if __name__ == "__main__":
     if args.config:
         radar1 = radar()
         radar1.mmwave_config(config_lua_script)
-    main()
\ No newline at end of file
+
+    # Local DCA1000 emulator for running without the board
+    ips = ()
+    dca_emulator = None
+    if args.emulate is not None:
+        dca_emulator = emulator.spawn(chirp_dict, args.emulate)
+        ips = ("127.0.0.1", "127.0.0.2")
+    try:
+        main(ips)
+    finally:
+        if dca_emulator is not None:
+            dca_emulator.terminate()
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import time
+import numpy as np
+
+from utils.raw_reader import RawBinReader, decode_to_file
+
+# Bytes hashed at the start, middle and end of every bin file for its fingerprint
+HASH_BLOCK = 1 << 20
+# Seconds after its last write a partial decode is considered left over by an interrupted process
+STALE_TMP_SECONDS = 3600
+
+
+def file_fingerprint(file_name):
+    """
+    Fingerprints a bin file by its size, modification time and a hash of three blocks of its content.
+
+    Hashing whole multi-gigabyte captures would take longer than decoding them, the sampled hash catches files
+    that were rewritten with the same size and time.
+
+    Parameters
+    ----------
+    file_name : str
+        Bin file.
+
+    Returns
+    -------
+    fingerprint : dict
+        path, size, mtime_ns and sha1 of the file.
+    """
+    stat = os.stat(file_name)
+    sha1 = hashlib.sha1()
+    with open(file_name, 'rb') as f:
+        for offset in sorted({0, max(stat.st_size // 2 - HASH_BLOCK // 2, 0), max(stat.st_size - HASH_BLOCK, 0)}):
+            f.seek(offset)
+            sha1.update(f.read(HASH_BLOCK))
+    return {'path': os.path.abspath(file_name), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'sha1': sha1.hexdigest()}
+
+
+def load_capture(setupJSON, mmwaveJSON, chirp_dict=None, range_fft=False, cache_dir=None, max_bytes=8 << 30,
+                 workers=1):
+    """
+    Returns the decoded capture (or its range FFT), decoding it only the first time.
+
+    The complex cube is stored as a .npy file next to a JSON sidecar holding its key: the fingerprint of every bin
+    file, the frame layout and the radar parameters. Later calls with the same key open the .npy as a copy-on-write
+    memmap, so nothing is read until it is used and writing to it never touches the cache. Least recently used
+    entries are evicted once the cache holds more than max_bytes.
+
+    Parameters
+    ----------
+    setupJSON : dict
+        Setup JSON, lists the captured files.
+    mmwaveJSON : dict
+        mmWave JSON, holds the frame, channel and data format configuration.
+    chirp_dict : dict
+        Radar parameters as returned by utils.utility.read_radar_params, part of the key.
+    range_fft : bool
+        Return the range FFT (along the samples) instead of the raw ADC data.
+    cache_dir : str
+        Cache directory, defaults to .capture_cache next to the bin files.
+    max_bytes : int
+        Size the cache directory is trimmed to.
+    workers : int
+        Number of processes decoding a capture that is not cached yet, see decode_to_file.
+
+    Returns
+    -------
+    data : np.ndarray
+        complex64 memmap of shape (frames, chirps, rx, samples).
+    """
+    with RawBinReader.from_json(setupJSON, mmwaveJSON) as reader:
+        bin_files = [f.filename for f in reader.files]
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(bin_files[0]), '.capture_cache')
+        os.makedirs(cache_dir, exist_ok=True)
+
+        key = {'files': [file_fingerprint(f) for f in bin_files],
+               'shape': list(reader.shape),
+               'range_fft': range_fft,
+               'chirp_dict': chirp_dict or {}}
+        name = hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+        data_file = os.path.join(cache_dir, name + '.npy')
+        meta_file = os.path.join(cache_dir, name + '.json')
+
+        # The sidecar is written last, an entry without one was interrupted
+        if os.path.exists(meta_file) and os.path.exists(data_file):
+            os.utime(meta_file)
+            return np.load(data_file, mmap_mode='c')
+
+        tmp_file = data_file + '.tmp.npy'
+        stats = decode_to_file(reader, tmp_file, range_fft=range_fft, workers=workers)
+        os.replace(tmp_file, data_file)
+        print(f"Decoded {stats['frames']} frames at {stats['frames_per_s']:.0f} frames/s, {stats['mb_per_s']:.0f} MB/s")
+
+    with open(meta_file, 'w') as f:
+        json.dump(dict(key, created=time.time(), nbytes=os.path.getsize(data_file)), f, indent=4, default=str)
+    evict(cache_dir, max_bytes, keep=(name,))
+    return np.load(data_file, mmap_mode='c')
+
+
+def evict(cache_dir, max_bytes, keep=()):
+    """
+    Deletes least recently used cache entries until the cache holds at most max_bytes, and the partial decodes
+    (.tmp.npy) left by interrupted processes, i.e. not written for STALE_TMP_SECONDS.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Cache directory.
+    max_bytes : int
+        Size to trim the cache to.
+    keep : tuple of str
+        Entry names never evicted.
+
+    Returns
+    -------
+    evicted : list of str
+        Names of the deleted entries.
+    """
+    entries = []
+    now = time.time()
+    for file_name in os.listdir(cache_dir):
+        name, ext = os.path.splitext(file_name)
+        if file_name.endswith('.tmp.npy'):
+            tmp_file = os.path.join(cache_dir, file_name)
+            try:
+                if now - os.path.getmtime(tmp_file) > STALE_TMP_SECONDS:
+                    os.remove(tmp_file)
+            except OSError:
+                # Finished, removed by another process or still open (Windows)
+                pass
+            continue
+        if ext != '.json':
+            continue
+        meta_file = os.path.join(cache_dir, file_name)
+        data_file = os.path.join(cache_dir, name + '.npy')
+        size = os.path.getsize(data_file) if os.path.exists(data_file) else 0
+        # Hits touch the sidecar, so its modification time is the last use
+        entries.append((os.path.getmtime(meta_file), name, size))
+
+    total = sum(size for _, _, size in entries)
+    evicted = []
+    for _, name, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        if name in keep:
+            continue
+        try:
+            for ext in ('.npy', '.json'):
+                if os.path.exists(os.path.join(cache_dir, name + ext)):
+                    os.remove(os.path.join(cache_dir, name + ext))
+        except OSError:
+            # Still mapped by a running process (Windows)
+            continue
+        total -= size
+        evicted.append(name)
+    return evicted
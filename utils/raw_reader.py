@@ -0,0 +1,326 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from streaming_base.mmwave.dataloader.adcv3 import DCA1000
+
+
+class RawBinReader():
+    """
+    Lazily indexed (frames, chirps, rx, samples) view of the *_Raw_N.bin files captured by mmWave Studio.
+
+    The bin files are memory mapped as int16, nothing is read until frames are indexed. Indexing decodes only the
+    selected frames, all of them in one vectorized pass of the 2-lane LVDS layout (I0 I1 Q0 Q1 per pair of samples,
+    channel interleaved), which is the same layout the DCA1000 streams. The sign fix of the uint16 reader is
+    free, the data is simply viewed as int16.
+
+    Examples
+    --------
+    >>> reader = RawBinReader.from_json(setup_dict, mmwave_dict)
+    >>> reader.shape
+    (500, 3, 4, 128)
+    >>> adc_data = reader[100:200]         # frames 100 to 199 only
+    >>> first_rx = reader[:, 0, -1]        # (frames, samples)
+
+    Going through a long capture batch by batch:
+
+    >>> with RawBinReader.from_json(setup_dict, mmwave_dict) as reader:
+    ...     for frame_idx, frames in reader.iter_frames(batch=256):
+    ...         process(frames)
+    """
+
+    def __init__(self, bin_files, num_chirps, num_rx, num_samples):
+        """
+        Parameters
+        ----------
+        bin_files : list of str
+            Captured bin files, in order.
+        num_chirps : int
+            Number of chirps per frame (chirp loops times transmitters).
+        num_rx : int
+            Number of receivers.
+        num_samples : int
+            Number of ADC samples per chirp.
+        """
+        self.bin_files = list(bin_files)
+        self.num_chirps = num_chirps
+        self.num_rx = num_rx
+        self.num_samples = num_samples
+        self.int16_in_frame = num_chirps * num_rx * num_samples * 2
+
+        # One memmap of whole frames per file, trailing partial frames are ignored like the TI reader does
+        self.files = []
+        for file_name in bin_files:
+            num_frames = os.path.getsize(file_name) // (self.int16_in_frame * 2)
+            if num_frames == 0:
+                raise ValueError(f"Not enough data in binary file {file_name}")
+            self.files.append(np.memmap(file_name, dtype=np.int16, mode='r',
+                                        shape=(num_frames, self.int16_in_frame)))
+
+        # First frame of every file, plus the total
+        self.frame_offsets = np.concatenate(([0], np.cumsum([len(f) for f in self.files])))
+
+    @classmethod
+    def from_json(cls, setupJSON, mmwaveJSON):
+        """
+        Creates a reader from the setup and mmwave JSON dictionaries, as used by TI_PROCESSOR.rawDataReader.
+
+        Parameters
+        ----------
+        setupJSON : dict
+            Setup JSON, lists the captured files.
+        mmwaveJSON : dict
+            mmWave JSON, holds the frame, channel and data format configuration.
+
+        Returns
+        -------
+        reader : RawBinReader
+        """
+        device = mmwaveJSON['mmWaveDevices'][0]
+        captureCfg = device['rawDataCaptureConfig']
+        numLane = bin(int(captureCfg['rlDevLaneEnable_t']['laneEn'], 16)).count('1')
+        chInterleave = captureCfg['rlDevDataFmtCfg_t']['chInterleave']
+        if numLane != 2 or chInterleave != 1:
+            raise ValueError(f"{numLane} LVDS lane with interleave mode {chInterleave} is not supported")
+
+        frameCfg = device['rfConfig']['rlFrameCfg_t']
+        numChirps = frameCfg['numLoops'] * (frameCfg['chirpEndIdx'] - frameCfg['chirpStartIdx'] + 1)
+        numRx = bin(int(device['rfConfig']['rlChanCfg_t']['rxChannelEn'], 16)).count('1')
+        numSamples = device['rfConfig']['rlProfiles'][0]['rlProfileCfg_t']['numAdcSamples']
+
+        basePath = setupJSON['capturedFiles']['fileBasePath']
+        binFiles = [os.path.join(basePath, f['processedFileName']) for f in setupJSON['capturedFiles']['files']]
+        if len(binFiles) < 1:
+            raise ValueError("Bin File is not available")
+        return cls(binFiles, numChirps, numRx, numSamples)
+
+    @property
+    def shape(self):
+        """Shape of the whole capture, (frames, chirps, rx, samples)."""
+        return (len(self), self.num_chirps, self.num_rx, self.num_samples)
+
+    def __len__(self):
+        return int(self.frame_offsets[-1])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Releases the memory maps of the bin files. Arrays returned by the reader are copies and stay valid.
+        """
+        self.files = []
+        self.frame_offsets = self.frame_offsets[:1]
+
+    def locate(self, frame):
+        """
+        Finds the file holding a frame with a binary search over the cumulative frame offsets.
+
+        Parameters
+        ----------
+        frame : int or np.ndarray
+            Frame index (or indices) over the whole capture.
+
+        Returns
+        -------
+        file_idx : int or np.ndarray
+            Index of the bin file.
+        local_idx : int or np.ndarray
+            Index of the frame within that file.
+        """
+        file_idx = np.searchsorted(self.frame_offsets, frame, side='right') - 1
+        return file_idx, frame - self.frame_offsets[file_idx]
+
+    def iter_frames(self, start=0, stop=None, step=1, batch=64):
+        """
+        Yields decoded frames batch by batch, so captures of any length are processed with bounded memory.
+
+        Parameters
+        ----------
+        start : int
+            First frame.
+        stop : int
+            End of the range (exclusive), defaults to the end of the capture.
+        step : int
+            Step between frames.
+        batch : int
+            Maximum number of frames per batch.
+
+        Yields
+        ------
+        frame_idx : np.ndarray
+            Indices of the frames of the batch.
+        frames : np.ndarray
+            complex64 data of shape (frames, chirps, rx, samples).
+        """
+        start, stop, step = slice(start, stop, step).indices(len(self))
+        for first in range(start, stop, batch * step):
+            last = min(first + batch * step, stop)
+            if step == 1:
+                yield np.arange(first, last), self.read(first, last)
+            else:
+                frame_idx = np.arange(first, last, step)
+                yield frame_idx, self.read(frame_idx)
+
+    def __getitem__(self, key):
+        """
+        Decodes the frames selected by the first index and applies the rest of the index to them.
+
+        Parameters
+        ----------
+        key : int, slice, array or tuple
+            Numpy index over (frames, chirps, rx, samples).
+
+        Returns
+        -------
+        data : np.ndarray
+            complex64 data.
+        """
+        if not isinstance(key, tuple):
+            key = (key,)
+        frame_key, rest = key[0], key[1:]
+
+        if isinstance(frame_key, (int, np.integer)):
+            frame = frame_key + len(self) if frame_key < 0 else frame_key
+            if not 0 <= frame < len(self):
+                raise IndexError(f"Frame {frame_key} is out of range for {len(self)} frames")
+            return self.read(frame, frame + 1)[(0,) + rest]
+        elif isinstance(frame_key, slice):
+            start, stop, step = frame_key.indices(len(self))
+            frames = self.read(start, stop) if step == 1 else self.read(np.arange(start, stop, step))
+        else:
+            frames = self.read(np.arange(len(self))[frame_key])
+        return frames[(slice(None),) + rest]
+
+    def read(self, start=0, stop=None, out=None):
+        """
+        Decodes a range of frames, or a list of frame indices.
+
+        Parameters
+        ----------
+        start : int or np.ndarray
+            First frame, or an array of frame indices.
+        stop : int
+            End of the range (exclusive), defaults to the end of the capture.
+        out : np.ndarray
+            Optional complex64 array of shape (frames, chirps, rx, samples) to decode into.
+
+        Returns
+        -------
+        data : np.ndarray
+            complex64 data of shape (frames, chirps, rx, samples).
+        """
+        if np.ndim(start):
+            idx = np.asarray(start, dtype=np.int64)
+        else:
+            stop = len(self) if stop is None else min(stop, len(self))
+            idx = None
+
+        num_frames = len(idx) if idx is not None else max(stop - start, 0)
+        if out is None:
+            out = np.empty((num_frames,) + self.shape[1:], dtype=np.complex64)
+
+        # Decode file by file, contiguous ranges straight from the memmap into the output
+        if idx is None:
+            if num_frames == 0:
+                return out
+            first_file, last_file = self.locate(start)[0], self.locate(stop - 1)[0]
+            for file_idx in range(first_file, last_file + 1):
+                first, last = self.frame_offsets[file_idx], self.frame_offsets[file_idx + 1]
+                lo, hi = max(start, first), min(stop, last)
+                self._decode(self.files[file_idx][lo - first:hi - first], out[lo - start:hi - start])
+        else:
+            file_idx, local_idx = self.locate(idx)
+            for f in np.unique(file_idx):
+                sel = np.nonzero(file_idx == f)[0]
+                out[sel] = self._decode(self.files[f][local_idx[sel]])
+        return out
+
+    def _decode(self, raw, out=None):
+        """
+        Helper function to decode whole frames of int16 data.
+
+        Parameters
+        ----------
+        raw : np.ndarray
+            int16 data of shape (frames, int16 per frame).
+        out : np.ndarray
+            Optional contiguous complex64 array of shape (frames, chirps, rx, samples).
+
+        Returns
+        -------
+        data : np.ndarray
+            complex64 data of shape (frames, chirps, rx, samples).
+        """
+        if out is None:
+            out = np.empty((len(raw),) + self.shape[1:], dtype=np.complex64)
+        # Frames are consecutive chirps, decode them all as one long frame
+        DCA1000.organize(raw, len(raw) * self.num_chirps, self.num_rx, self.num_samples, model='1843',
+                         out=out.reshape(-1, self.num_rx, self.num_samples))
+        return out
+
+
+def _decode_chunk(bin_files, num_chirps, num_rx, num_samples, out_file, start, stop, range_fft):
+    """
+    Worker of decode_to_file: decodes frames [start, stop) straight into the shared output file.
+    """
+    out = np.load(out_file, mmap_mode='r+')
+    with RawBinReader(bin_files, num_chirps, num_rx, num_samples) as reader:
+        for frame_idx, frames in reader.iter_frames(start, stop, batch=256):
+            if range_fft:
+                frames = np.fft.fft(frames, axis=-1)
+            out[frame_idx[0]:frame_idx[-1] + 1] = frames
+    out.flush()
+    return stop - start
+
+
+def decode_to_file(reader, out_file, range_fft=False, workers=None, chunk=1024):
+    """
+    Decodes a whole capture into a .npy file, chunk by chunk in a pool of processes.
+
+    The output file is preallocated by the parent and every worker opens it as a memmap and writes its own frame
+    range, so no decoded data is pickled back to the parent.
+
+    Parameters
+    ----------
+    reader : RawBinReader
+        Capture to decode.
+    out_file : str
+        Output .npy file.
+    range_fft : bool
+        Store the range FFT (along the samples) instead of the raw ADC data.
+    workers : int
+        Number of processes, defaults to the number of CPUs. 1 decodes in this process.
+    chunk : int
+        Number of frames per task.
+
+    Returns
+    -------
+    stats : dict
+        frames, seconds, frames_per_s and mb_per_s (of bin data read).
+    """
+    start_time = time.perf_counter()
+    out = np.lib.format.open_memmap(out_file, mode='w+', dtype=np.complex64, shape=reader.shape)
+    del out
+
+    args = (reader.bin_files, reader.num_chirps, reader.num_rx, reader.num_samples, out_file)
+    chunks = [(start, min(start + chunk, len(reader))) for start in range(0, len(reader), chunk)]
+    workers = workers or os.cpu_count()
+    if workers == 1 or len(chunks) == 1:
+        for start, stop in chunks:
+            _decode_chunk(*args, start, stop, range_fft)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            futures = [pool.submit(_decode_chunk, *args, start, stop, range_fft) for start, stop in chunks]
+            for future in futures:
+                future.result()
+
+    seconds = time.perf_counter() - start_time
+    return {'frames': len(reader),
+            'seconds': seconds,
+            'frames_per_s': len(reader) / seconds,
+            'mb_per_s': len(reader) * reader.int16_in_frame * 2 / 1e6 / seconds}
@@ -72,12 +72,17 @@ class TI_PROCESSOR():
             except Exception as e:
                 raise RuntimeError(f"Failed to read frames from {fileName}: {e}")
 
-        # Export data
-        return self.dp_exportData(rawDataFileName, radarCubeDataFileName)
+        # First frame (1-based frame index minus one) of every bin file, for a binary search per frame
+        self.Params['frameOffsets'] = np.concatenate(([0], np.cumsum(self.Params['NFramePerFile'])))
 
-        # # Close file handles
-        # for fid in self.Params['fid_rawData']:
-        #     fid.close()
+        # Export data
+        try:
+            return self.dp_exportData(rawDataFileName, radarCubeDataFileName)
+        finally:
+            # Close file handles
+            for fid in self.Params['fid_rawData']:
+                fid.close()
+            self.Params['fid_rawData'] = []
 
 
     def dp_exportData(self, rawDataFileName, radarCubeDataFileName):
@@ -132,16 +137,10 @@ class TI_PROCESSOR():
         # global Params, dataSet
 
         # Find correct bin file index for the given frame
-        currFrameIdx = 0
-        fidIdx = -1
-        for idx in range(self.Params['numBinFiles']):
-            if frameIdx <= (self.Params['NFramePerFile'][idx] + currFrameIdx):
-                fidIdx = idx
-                break
-            else:
-                currFrameIdx += self.Params['NFramePerFile'][idx]
+        fidIdx = int(np.searchsorted(self.Params['frameOffsets'], frameIdx, side='left')) - 1
+        currFrameIdx = int(self.Params['frameOffsets'][fidIdx])
 
-        if fidIdx < self.Params['numBinFiles']:
+        if 0 <= fidIdx < self.Params['numBinFiles']:
             # Load one frame of complex raw data
             rawDataComplex = self.dp_loadOneFrameData(
                 self.Params['fid_rawData'][fidIdx],
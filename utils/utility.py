@@ -7,12 +7,18 @@ def read_radar_params(lua_script):
     Helper function that reads the radar paramters from a input lua script.
     It assumes that the lua script has the following parameters input to variables 
         (chirp loops, number rx, number tx, adc samples, periodicity, number of frames).
+    The chirp timing (start frequency, idle, adc start and ramp end time) is read too if present, in Hz and seconds.
     Variables should be named as listed below.
     Paramters:
     - lua_script: lua configuration file
     """
     file1 = open(os.path.join(lua_script), 'r')
     Lines = file1.readlines()
+    # chirp timing, defaults for scripts that do not define it
+    start_freq = 77e9
+    idle_time = 0.
+    adc_start_time = 0.
+    ramp_end_time = 0.
     for line in Lines:
         line_ = line.replace(' ', '')
         if("CHIRP_LOOPS=" in line_):
@@ -31,6 +37,14 @@ def read_radar_params(lua_script):
             periodicity = float(line_[12:line_.find('-')].strip())
         elif("NUM_FRAMES=" in line_):
             num_frames= float(line_[11:line_.find('-')].strip())
+        elif("START_FREQ=" in line_):
+            start_freq = float(line_[11:line_.find('-')].strip()) * 1e9
+        elif("IDLE_TIME=" in line_):
+            idle_time = float(line_[10:line_.find('-')].strip()) * 1e-6
+        elif("ADC_START_TIME=" in line_):
+            adc_start_time = float(line_[15:line_.find('-')].strip()) * 1e-6
+        elif("RAMP_END_TIME=" in line_):
+            ramp_end_time = float(line_[14:line_.find('-')].strip()) * 1e-6
 
     data_rate = int(1 / (periodicity * 0.001) / 2)
     freq_plot_len = data_rate  // 2
@@ -49,6 +63,10 @@ def read_radar_params(lua_script):
     chirp_dict['sample_rate'] = sample_rate
     chirp_dict['slope'] = slope
     chirp_dict['range_res'] = range_res
+    chirp_dict['start_freq'] = start_freq
+    chirp_dict['idle_time'] = idle_time
+    chirp_dict['adc_start_time'] = adc_start_time
+    chirp_dict['ramp_end_time'] = ramp_end_time
     return chirp_dict 
 
 